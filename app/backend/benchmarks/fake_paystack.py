@@ -0,0 +1,68 @@
+"""Local stand-in for the Paystack transaction API.
+
+Implements just enough of /transaction/initialize and
+/transaction/verify/{reference} for the payment client. Point the backend
+at it with PAYSTACK_BASE_URL=http://localhost:8010 and any non-empty
+PAYSTACK_SECRET_KEY.
+
+Usage:
+    uvicorn benchmarks.fake_paystack:app --port 8010
+    FAKE_PAYSTACK_LATENCY_MS=150 FAKE_PAYSTACK_FAILURE_RATE=0.1 uvicorn benchmarks.fake_paystack:app --port 8010
+"""
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+LATENCY_MS = float(os.environ.get("FAKE_PAYSTACK_LATENCY_MS", "0"))
+FAILURE_RATE = float(os.environ.get("FAKE_PAYSTACK_FAILURE_RATE", "0"))
+
+app = FastAPI(title="Fake Paystack")
+transactions: dict = {}
+
+
+@app.middleware("http")
+async def simulate_gateway(request: Request, call_next):
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+    if random.random() < FAILURE_RATE:
+        return JSONResponse({"status": False, "message": "Simulated gateway error"}, status_code=502)
+    return await call_next(request)
+
+
+def check_auth(authorization: str) -> None:
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid key")
+
+
+@app.post("/transaction/initialize")
+async def initialize(request: Request, authorization: str = Header(None)):
+    check_auth(authorization)
+    body = await request.json()
+    reference = body["reference"]
+    transactions[reference] = {
+        "reference": reference,
+        "amount": body["amount"],
+        "status": "success",
+        "metadata": body.get("metadata", {}),
+    }
+    return {
+        "status": True,
+        "message": "Authorization URL created",
+        "data": {
+            "authorization_url": f"http://localhost/fake-checkout/{reference}",
+            "access_code": f"access_{reference}",
+            "reference": reference,
+        },
+    }
+
+
+@app.get("/transaction/verify/{reference}")
+async def verify(reference: str, authorization: str = Header(None)):
+    check_auth(authorization)
+    transaction = transactions.get(reference)
+    if transaction is None:
+        return JSONResponse({"status": False, "message": "Transaction reference not found"}, status_code=400)
+    return {"status": True, "message": "Verification successful", "data": transaction}
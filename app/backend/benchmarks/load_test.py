@@ -0,0 +1,307 @@
+"""Load test the API's hot paths and compare against a saved baseline.
+
+Seeds a dedicated MongoDB database with users, parts, orders and
+notifications, then drives the real FastAPI app in-process (through httpx's
+ASGI transport, with its startup and shutdown hooks running) across these
+scenarios:
+
+    browse, search, login, create_order, orders_client, orders_vendor,
+    orders_dispatcher, orders_admin, location_ping, admin_stats
+
+Throughput and p50/p95/p99 latency are reported per scenario. With
+--baseline the run fails (exit code 1) when a scenario's p95 latency rises
+or its throughput falls by more than --tolerance against the baseline file.
+--save-baseline writes this run's results in the same format.
+
+The database named by --db is dropped and reseeded on every run.
+
+Usage:
+    python benchmarks/load_test.py --requests 500 --concurrency 20
+    python benchmarks/load_test.py --save-baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --baseline benchmarks/baseline.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from notifications import rebuild_unread_counters  # noqa: E402
+from vendor_orders import build_vendor_orders  # noqa: E402
+
+CATEGORIES = ["Brakes", "Engine", "Suspension", "Electrical", "Filters", "Transmission", "Cooling", "Exhaust"]
+BRANDS = ["Bosch", "Denso", "Toyota Genuine", "Mobil", "NGK", "Brembo", "Monroe", "Valeo"]
+VEHICLES = ["Toyota Camry", "Toyota Corolla", "Honda Accord", "Lexus RX350", "Hyundai Elantra", "Ford Focus"]
+PARTS = ["Brake Pad", "Oil Filter", "Spark Plug", "Shock Absorber", "Alternator", "Radiator", "Clutch Kit", "Muffler"]
+SEARCH_TERMS = ["brake", "filter", "spark plug", "bosch", "camry", "radiator"]
+STATUSES = ["pending", "paid", "assigned", "in_transit", "delivered", "cancelled"]
+PASSWORD = "benchmark-password"
+
+
+def iso(moment: datetime) -> str:
+    return moment.isoformat()
+
+
+def make_user(role: str, index: int, password_hash: str, created_at: datetime) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "email": f"{role}{index}@bench.example.com",
+        "full_name": f"Bench {role.title()} {index}",
+        "phone": f"0803{index:07d}",
+        "role": role,
+        "business_name": f"Bench Motors {index}" if role == "vendor" else None,
+        "address": "Trans-Amadi, Port Harcourt",
+        "password_hash": password_hash,
+        "is_active": True,
+        "created_at": iso(created_at),
+    }
+
+
+async def seed(db, args, password_hash: str) -> dict:
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+
+    def ago() -> datetime:
+        return now - timedelta(seconds=rng.randint(0, 180 * 24 * 3600))
+
+    users = {role: [make_user(role, i, password_hash, ago()) for i in range(count)] for role, count in [
+        ("client", args.clients), ("vendor", args.vendors), ("dispatcher", args.dispatchers), ("admin", 1),
+    ]}
+    await db.users.insert_many([u for group in users.values() for u in group])
+
+    parts = []
+    for i in range(args.parts):
+        vendor = rng.choice(users["vendor"])
+        name = rng.choice(PARTS)
+        brand = rng.choice(BRANDS)
+        parts.append({
+            "id": str(uuid.uuid4()),
+            "name": f"{brand} {name}",
+            "description": f"{name} for {rng.choice(VEHICLES)}, OEM quality",
+            "category": rng.choice(CATEGORIES),
+            "price": round(rng.uniform(2000, 250000), 2),
+            "quantity": 1_000_000,
+            "sku": f"SKU-{i:07d}",
+            "brand": brand,
+            "image_url": None,
+            "vehicle_compatibility": rng.sample(VEHICLES, 2),
+            "vendor_id": vendor["id"],
+            "vendor_name": vendor["business_name"],
+            "is_available": True,
+            "created_at": iso(ago()),
+        })
+    await db.spare_parts.insert_many(parts)
+
+    batch = []
+    for _ in range(args.orders):
+        client = rng.choice(users["client"])
+        lines = rng.sample(parts, rng.randint(1, 3))
+        items = [{
+            "part_id": p["id"], "part_name": p["name"], "part_sku": p["sku"], "quantity": 1,
+            "unit_price": p["price"], "total_price": p["price"],
+            "vendor_id": p["vendor_id"], "vendor_name": p["vendor_name"],
+        } for p in lines]
+        status = rng.choice(STATUSES)
+        dispatcher = rng.choice(users["dispatcher"]) if status in ("assigned", "in_transit", "delivered") else None
+        created = iso(ago())
+        batch.append({
+            "id": str(uuid.uuid4()),
+            "client_id": client["id"],
+            "client_name": client["full_name"],
+            "items": items,
+            "total_amount": sum(i["total_price"] for i in items),
+            "status": status,
+            "delivery_address": client["address"],
+            "delivery_phone": client["phone"],
+            "notes": None,
+            "dispatcher_id": dispatcher["id"] if dispatcher else None,
+            "dispatcher_name": dispatcher["full_name"] if dispatcher else None,
+            "created_at": created,
+            "updated_at": created,
+            "payment_reference": None,
+            "payment_status": "success" if status not in ("pending", "cancelled") else "pending",
+        })
+        if len(batch) >= 1000:
+            await db.orders.insert_many(batch)
+            await db.vendor_orders.insert_many([doc for order in batch for doc in build_vendor_orders(order)])
+            batch = []
+    if batch:
+        await db.orders.insert_many(batch)
+        await db.vendor_orders.insert_many([doc for order in batch for doc in build_vendor_orders(order)])
+
+    batch = []
+    for _ in range(args.notifications):
+        batch.append({
+            "id": str(uuid.uuid4()),
+            "user_id": rng.choice(users["client"])["id"],
+            "title": "Order update",
+            "message": "Your order status changed",
+            "type": "order",
+            "is_read": rng.random() < 0.7,
+            "created_at": iso(ago()),
+        })
+        if len(batch) >= 1000:
+            await db.notifications.insert_many(batch)
+            batch = []
+    if batch:
+        await db.notifications.insert_many(batch)
+    await rebuild_unread_counters(db)
+
+    return {"users": users, "parts": parts}
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[math.ceil(len(sorted_values) * fraction) - 1]
+
+
+async def run_scenario(call, requests: int, concurrency: int) -> dict:
+    latencies: list = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            start = time.perf_counter()
+            try:
+                response = await call(i)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50": round(statistics.median(latencies), 2),
+        "p95": round(percentile(latencies, 0.95), 2),
+        "p99": round(percentile(latencies, 0.99), 2),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if current["p95"] > base["p95"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95']}ms vs baseline {base['p95']}ms")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['rps']} req/s vs baseline {base['rps']} req/s")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {base['errors']}")
+    return regressions
+
+
+async def main(args) -> int:
+    # server reads its configuration at import time
+    os.environ["DB_NAME"] = args.db
+    import httpx
+    from motor.motor_asyncio import AsyncIOMotorClient
+    import server
+
+    # Seed through a separate client; the app creates its own in its lifespan handler
+    mongo = AsyncIOMotorClient(server.mongo_url)
+    await mongo.drop_database(args.db)
+    password_hash = server.pwd_context.hash(PASSWORD)
+    print(f"Seeding {args.db}...")
+    data = await seed(mongo[args.db], args, password_hash)
+    users = data["users"]
+    rng = random.Random(args.seed + 1)
+
+    def token(user: dict) -> dict:
+        return {"Authorization": f"Bearer {server.create_access_token({'sub': user['id']})}"}
+
+    client_headers = [token(u) for u in users["client"][:50]]
+    vendor_headers = [token(u) for u in users["vendor"]]
+    dispatcher_headers = [token(u) for u in users["dispatcher"]]
+    admin_headers = token(users["admin"][0])
+    part_ids = [p["id"] for p in data["parts"]]
+
+    results = {}
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            scenarios = {
+                "browse": lambda i: http.get("/api/parts", params={
+                    "category": rng.choice(CATEGORIES), "max_price": rng.choice([50000, 100000, 250000]), "limit": 50,
+                }),
+                "search": lambda i: http.get("/api/parts", params={"search": rng.choice(SEARCH_TERMS), "limit": 50}),
+                "login": lambda i: http.post("/api/auth/login", json={
+                    "email": rng.choice(users["client"])["email"], "password": PASSWORD,
+                }),
+                "create_order": lambda i: http.post("/api/orders", headers=rng.choice(client_headers), json={
+                    "items": [{"part_id": pid, "quantity": 1} for pid in rng.sample(part_ids, 2)],
+                    "delivery_address": "Rumuola, Port Harcourt",
+                    "delivery_phone": "08030000000",
+                }),
+                "orders_client": lambda i: http.get("/api/orders", headers=rng.choice(client_headers)),
+                "orders_vendor": lambda i: http.get("/api/orders", headers=rng.choice(vendor_headers)),
+                "orders_dispatcher": lambda i: http.get("/api/orders", headers=rng.choice(dispatcher_headers)),
+                "orders_admin": lambda i: http.get("/api/orders", headers=admin_headers),
+                "location_ping": lambda i: http.put("/api/location", headers=rng.choice(dispatcher_headers), json={
+                    "latitude": 4.8156 + rng.uniform(-0.1, 0.1), "longitude": 7.0498 + rng.uniform(-0.1, 0.1),
+                }),
+                "admin_stats": lambda i: http.get("/api/admin/stats", headers=admin_headers),
+            }
+            selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+            for name in selected:
+                requests = max(1, args.requests // 10) if name == "login" else args.requests
+                results[name] = await run_scenario(scenarios[name], requests, args.concurrency)
+                r = results[name]
+                print(f"{name:<18} {r['requests']:6d} req {r['errors']:4d} err {r['rps']:9.1f} req/s "
+                      f"p50={r['p50']:8.2f}ms p95={r['p95']:8.2f}ms p99={r['p99']:8.2f}ms")
+
+    if not args.keep:
+        await mongo.drop_database(args.db)
+    mongo.close()
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="spareparts_loadtest")
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--vendors", type=int, default=100)
+    parser.add_argument("--dispatchers", type=int, default=50)
+    parser.add_argument("--parts", type=int, default=20000)
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--notifications", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario (login runs a tenth)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenarios", help="comma-separated subset of scenarios to run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", help="fail if results regress against this file")
+    parser.add_argument("--save-baseline", help="write results to this file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded database afterwards")
+    sys.exit(asyncio.run(main(parser.parse_args())))
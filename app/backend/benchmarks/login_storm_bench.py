@@ -0,0 +1,80 @@
+"""Measure event-loop latency for unrelated work during a login storm.
+
+A probe coroutine stands in for an unrelated route: it repeatedly sleeps
+for a few milliseconds and records how late it wakes up. Meanwhile a burst
+of concurrent bcrypt verifications runs, first inline on the event loop
+(the old behaviour) and then through PasswordHasher.
+
+Usage:
+    python benchmarks/login_storm_bench.py --logins 50 --rounds 12
+"""
+import argparse
+import asyncio
+import math
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from passlib.context import CryptContext
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from password_hasher import PasswordHasher, PasswordHasherBusy  # noqa: E402
+
+PROBE_INTERVAL = 0.005
+
+
+async def probe(stop: asyncio.Event, lags: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+
+async def storm(logins: int, verify) -> tuple:
+    stop = asyncio.Event()
+    lags: list = []
+    probe_task = asyncio.create_task(probe(stop, lags))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(verify() for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    shed = sum(isinstance(r, PasswordHasherBusy) for r in results)
+    return lags, elapsed, shed
+
+
+def summarize(label: str, lags: list, elapsed: float, shed: int) -> None:
+    lags = sorted(lags) or [0.0]
+    p99 = lags[math.ceil(len(lags) * 0.99) - 1]
+    print(f"{label:<9} storm={elapsed:6.2f}s probes={len(lags):5d} "
+          f"lag p50={statistics.median(lags):8.2f}ms p99={p99:8.2f}ms max={lags[-1]:8.2f}ms shed={shed}")
+
+
+async def main(args) -> None:
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=args.rounds)
+    hashed = context.hash("correct horse battery staple")
+
+    async def inline_verify():
+        return context.verify("correct horse battery staple", hashed)
+
+    hasher = PasswordHasher(context, max_workers=args.workers, max_queue=args.queue)
+
+    async def offloaded_verify():
+        return await hasher.verify_and_update("correct horse battery staple", hashed)
+
+    print(f"{args.logins} concurrent logins, bcrypt rounds={args.rounds}")
+    summarize("inline", *await storm(args.logins, inline_verify))
+    summarize("executor", *await storm(args.logins, offloaded_verify))
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue", type=int, default=64)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,69 @@
+"""Prove that concurrent order placement never oversells a part.
+
+Seeds parts with limited stock, fires many concurrent multi-line
+reservations at them and checks that every unit sold is accounted for,
+no stock goes negative and no reservation tags are left behind.
+
+Usage:
+    python benchmarks/order_concurrency_check.py --buyers 500 --stock 40
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import uuid
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from indexes import ensure_indexes  # noqa: E402
+from inventory import InsufficientStock, clear_holds, reserve_stock  # noqa: E402
+
+
+async def buy(db, part_ids, sold):
+    order_id = str(uuid.uuid4())
+    quantities = {part_id: random.randint(1, 3) for part_id in random.sample(part_ids, 2)}
+    try:
+        await reserve_stock(db, order_id, quantities)
+    except InsufficientStock:
+        return
+    await clear_holds(db, order_id)
+    for part_id, quantity in quantities.items():
+        sold[part_id] += quantity
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"), maxPoolSize=100)
+    db = client[args.db]
+    await db.spare_parts.drop()
+    await ensure_indexes(db)
+
+    part_ids = [str(uuid.uuid4()) for _ in range(args.parts)]
+    await db.spare_parts.insert_many([{"id": part_id, "quantity": args.stock} for part_id in part_ids])
+    sold = {part_id: 0 for part_id in part_ids}
+
+    await asyncio.gather(*(buy(db, part_ids, sold) for _ in range(args.buyers)))
+
+    failures = 0
+    for part in await db.spare_parts.find({}, {"_id": 0}).to_list(None):
+        expected = args.stock - sold[part["id"]]
+        if part["quantity"] != expected or part["quantity"] < 0 or part.get("stock_holds"):
+            failures += 1
+            print(f"FAIL {part['id']}: quantity={part['quantity']} expected={expected} holds={part.get('stock_holds')}")
+    print(f"{args.buyers} buyers, {sum(sold.values())} units sold, {failures} inconsistent parts")
+
+    await client.drop_database(args.db)
+    client.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--buyers", type=int, default=500)
+    parser.add_argument("--parts", type=int, default=5)
+    parser.add_argument("--stock", type=int, default=40)
+    parser.add_argument("--db", default="spareparts_bench")
+    sys.exit(asyncio.run(main(parser.parse_args())))
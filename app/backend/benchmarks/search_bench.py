@@ -0,0 +1,100 @@
+"""Compare the legacy unanchored $regex part search with the ranked text search.
+
+Seeds a throwaway database with synthetic parts and times both paths.
+
+Usage:
+    python benchmarks/search_bench.py --parts 50000 --runs 200
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from indexes import ensure_indexes  # noqa: E402
+from search import search_parts  # noqa: E402
+
+BRANDS = ["Toyota", "Honda", "Bosch", "Denso", "Mobil", "Brembo", "NGK", "Mann"]
+PARTS = ["brake pad", "oil filter", "spark plug", "air filter", "alternator", "radiator", "clutch kit", "headlamp"]
+VEHICLES = ["Corolla", "Camry", "Civic", "Accord", "Sienna", "Hilux", "Lexus RX"]
+TERMS = ["brake", "filter", "spark plug", "bosch", "corolla", "radiator hose", "clutch"]
+
+
+def make_part(i: int) -> dict:
+    name = random.choice(PARTS)
+    brand = random.choice(BRANDS)
+    return {
+        "id": str(uuid.uuid4()),
+        "vendor_id": str(uuid.uuid4()),
+        "vendor_name": "Bench Vendor",
+        "name": f"{brand} {name}",
+        "description": f"Genuine {name} by {brand}, part number {i}",
+        "category": name.split()[-1],
+        "price": round(random.uniform(1000, 90000), 2),
+        "quantity": random.randint(0, 50),
+        "sku": f"SKU-{i:07d}",
+        "brand": brand,
+        "vehicle_compatibility": random.sample(VEHICLES, 2),
+        "is_available": True,
+        "created_at": "2024-01-01T00:00:00+00:00",
+    }
+
+
+def legacy_query(search: str) -> dict:
+    return {"$or": [
+        {"name": {"$regex": search, "$options": "i"}},
+        {"description": {"$regex": search, "$options": "i"}},
+        {"sku": {"$regex": search, "$options": "i"}},
+    ], "is_available": True, "quantity": {"$gt": 0}}
+
+
+async def time_runs(runs: int, fn) -> list:
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        await fn(TERMS[i % len(TERMS)])
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(label: str, samples: list) -> None:
+    samples = sorted(samples)
+    p95 = samples[math.ceil(len(samples) * 0.95) - 1]
+    print(f"{label:<8} mean={statistics.mean(samples):7.2f}ms p50={statistics.median(samples):7.2f}ms p95={p95:7.2f}ms")
+
+
+async def main(args) -> None:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[args.db]
+    await db.spare_parts.drop()
+    for start in range(0, args.parts, 5000):
+        await db.spare_parts.insert_many([make_part(i) for i in range(start, min(start + 5000, args.parts))])
+    await ensure_indexes(db)
+
+    base = {"is_available": True, "quantity": {"$gt": 0}}
+    regex = await time_runs(args.runs, lambda s: db.spare_parts.find(legacy_query(s), {"_id": 0}).to_list(100))
+    text = await time_runs(args.runs, lambda s: search_parts(db, dict(base), s, limit=100))
+
+    print(f"{args.parts} parts, {args.runs} searches")
+    summarize("regex", regex)
+    summarize("text", text)
+
+    await client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parts", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--db", default="spareparts_bench")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+"""Microbenchmark of list response serialization, before and after.
+
+"before" mirrors the old handlers: build a response model per document,
+let FastAPI validate the list again against response_model, then encode
+with the stdlib json module. "after" is the single-pass path used now:
+validate the raw documents once and encode with orjson.
+
+Usage:
+    python benchmarks/serialization_bench.py --items 100 --runs 500
+"""
+import argparse
+import json
+import statistics
+import sys
+import timeit
+from pathlib import Path
+from typing import List
+
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server import OrderResponse, SparePartResponse  # noqa: E402
+from serialization import render_list  # noqa: E402
+
+
+def make_part(i: int) -> dict:
+    return {
+        "id": f"part-{i}", "vendor_id": "vendor-1", "vendor_name": "Lagos Auto Parts",
+        "name": f"Brake pad set {i}", "description": "Front axle ceramic brake pads",
+        "category": "Brakes", "price": 18500.0, "quantity": 12, "sku": f"BP-{i:05d}",
+        "image_url": None, "brand": "Bosch", "vehicle_compatibility": ["Corolla", "Camry"],
+        "created_at": "2024-05-01T10:00:00+00:00", "is_available": True,
+    }
+
+
+def make_order(i: int) -> dict:
+    item = {
+        "part_id": "part-1", "part_name": "Brake pad set", "part_sku": "BP-00001", "quantity": 2,
+        "unit_price": 18500.0, "total_price": 37000.0, "vendor_id": "vendor-1", "vendor_name": "Lagos Auto Parts",
+    }
+    return {
+        "id": f"order-{i}", "client_id": "client-1", "client_name": "Ada Obi", "items": [item] * 3,
+        "total_amount": 111000.0, "status": "paid", "delivery_address": "12 Allen Avenue, Ikeja",
+        "delivery_phone": "+2348012345678", "notes": None, "dispatcher_id": None, "dispatcher_name": None,
+        "created_at": "2024-05-01T10:00:00+00:00", "updated_at": "2024-05-01T10:05:00+00:00",
+        "payment_reference": "order_abc", "payment_status": "success",
+    }
+
+
+def before(model, adapter, docs) -> bytes:
+    models = [model(**doc) for doc in docs]
+    content = adapter.dump_python(adapter.validate_python(models), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def after(model, adapter, docs) -> bytes:
+    return render_list(adapter, docs)
+
+
+def main(args) -> None:
+    for label, model, factory in [("parts", SparePartResponse, make_part), ("orders", OrderResponse, make_order)]:
+        adapter = TypeAdapter(List[model])
+        docs = [factory(i) for i in range(args.items)]
+        for name, fn in [("before", before), ("after", after)]:
+            samples = [t / args.runs * 1000 for t in timeit.repeat(
+                lambda: fn(model, adapter, docs), number=args.runs, repeat=5)]
+            print(f"{label:<7} {name:<7} {statistics.median(samples):7.3f} ms per {args.items}-item list")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=500)
+    main(parser.parse_args())
@@ -0,0 +1,123 @@
+"""Measure how API throughput scales from 1 to N gunicorn workers.
+
+For each worker count, starts `gunicorn -c gunicorn.conf.py server:app`
+with WEB_CONCURRENCY set, waits for /api/health, then drives the given
+paths from several load generator processes for a fixed duration. The
+server is stopped with SIGTERM after each run. Reports throughput, speedup
+over one worker, and p50/p99 latency.
+
+Run against a seeded database (e.g. `load_test.py --keep`) so the paths
+return real data, and keep the generator processes on spare cores, or
+they will compete with the workers.
+
+Usage:
+    DB_NAME=spareparts_loadtest python benchmarks/worker_scaling_bench.py --max-workers 4 --duration 15
+"""
+import argparse
+import asyncio
+import math
+import multiprocessing
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def wait_until_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+async def generate(base_url: str, paths: list, connections: int, duration: float) -> list:
+    latencies: list = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+        async def worker(offset: int):
+            i = offset
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await http.get(paths[i % len(paths)])
+                    if response.status_code < 400:
+                        latencies.append((time.perf_counter() - start) * 1000)
+                except httpx.HTTPError:
+                    pass
+                i += 1
+        await asyncio.gather(*(worker(n) for n in range(connections)))
+    return latencies
+
+
+def generator_process(args: tuple) -> list:
+    return asyncio.run(generate(*args))
+
+
+def run(workers: int, args) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "PORT": str(args.port)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(base_url)
+        # Warm caches and connection pools before measuring
+        asyncio.run(generate(base_url, args.paths, args.connections, 2))
+
+        per_generator = max(1, args.connections // args.generators)
+        with multiprocessing.Pool(args.generators) as pool:
+            started = time.perf_counter()
+            results = pool.map(generator_process, [
+                (base_url, args.paths, per_generator, args.duration) for _ in range(args.generators)
+            ])
+            elapsed = time.perf_counter() - started
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=120)
+
+    latencies = sorted(latency for result in results for latency in result)
+    if not latencies:
+        raise RuntimeError("No successful requests; is MongoDB running and seeded?")
+    return {
+        "workers": workers,
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[math.ceil(len(latencies) * 0.99) - 1],
+    }
+
+
+def main(args) -> None:
+    baseline = None
+    print(f"{'workers':>7} {'req/s':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for workers in range(1, args.max_workers + 1):
+        result = run(workers, args)
+        baseline = baseline or result["rps"]
+        print(f"{workers:7d} {result['rps']:10.1f} {result['rps'] / baseline:7.2f}x "
+              f"{result['p50']:8.2f} {result['p99']:8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--connections", type=int, default=64, help="concurrent requests across all generators")
+    parser.add_argument("--generators", type=int, default=2, help="load generator processes")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--paths", nargs="+", default=[
+        "/api/parts?limit=20", "/api/parts?category=Brakes&limit=20", "/api/categories",
+    ])
+    main(parser.parse_args())
@@ -0,0 +1,115 @@
+"""HTTP caching for catalog reads.
+
+Every change to the catalog bumps a version number kept in the `counters`
+collection. Each worker holds the current version in memory: its own writes
+update it at once, and a background refresh picks up other workers' writes
+within `refresh_interval` seconds. Catalog responses carry a strong ETag
+built from the version and the normalized request, so a matching
+If-None-Match is answered with 304 without touching Mongo. Rendered bodies
+are also kept in a small LRU keyed by the normalized request and are only
+reused while the version is unchanged.
+"""
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+VERSION_ID = "catalog_version"
+
+
+def normalize_query(path: str, params) -> str:
+    """Canonical cache key for a request: path plus sorted query parameters."""
+    items = sorted((k, v) for k, v in params.multi_items() if v != "")
+    return path + "?" + "&".join(f"{k}={v}" for k, v in items)
+
+
+def make_etag(version: int, key: str) -> str:
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return f'"v{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class CatalogVersion:
+    def __init__(self, db, refresh_interval: float = 2.0):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.value = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def bump(self) -> int:
+        try:
+            doc = await self.db.counters.find_one_and_update(
+                {"_id": VERSION_ID}, {"$inc": {"version": 1}},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+            self.value = max(self.value + 1, doc["version"])
+        except Exception as e:
+            # Still invalidate this worker's cache; others catch up on refresh
+            logger.error(f"Failed to bump catalog version: {e}")
+            self.value += 1
+        return self.value
+
+    async def refresh(self) -> None:
+        doc = await self.db.counters.find_one({"_id": VERSION_ID})
+        if doc and doc["version"] > self.value:
+            self.value = doc["version"]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Catalog version refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[int, bytes, Dict[str, str]]]" = OrderedDict()
+
+    def get(self, key: str, version: int) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, key: str, version: int, body: bytes, headers: Dict[str, str]) -> None:
+        self._entries[key] = (version, body, headers)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
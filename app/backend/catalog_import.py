@@ -0,0 +1,206 @@
+"""Streaming bulk catalog import for vendors.
+
+The upload is spooled to a temporary file as it arrives, then a background
+job reads it row by row, validates each row against SparePartCreate and
+upserts valid rows by (vendor_id, sku) with batched bulk_write calls.
+Parsing and validation run in a worker thread a batch at a time, so large
+files do not stall the event loop. Memory use depends on the batch size,
+not the file size. Progress and a per-row error report are kept in the
+`import_jobs` collection for the vendor to poll.
+
+The upsert relies on the unique `vendor_sku` index: two imports racing on
+the same SKU cannot both insert it. dedupe_vendor_skus() removes the
+duplicates an older release may have created, so that index can be built.
+
+CSV files need a header row. Multi-valued vehicle_compatibility cells are
+separated with "|". NDJSON files hold one JSON object per line.
+"""
+import asyncio
+import csv
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, ValidationError
+from pymongo import DeleteMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+MAX_REPORTED_ERRORS = 1000
+DUPLICATE_KEY = 11000
+
+
+def parse_rows(path: str, fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield (row_number, raw_row) from an uploaded file; raw_row is an Exception for unparsable lines."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            for number, row in enumerate(csv.DictReader(f), start=2):
+                row = {key.strip(): value.strip() for key, value in row.items() if key and value not in (None, "")}
+                if "vehicle_compatibility" in row:
+                    row["vehicle_compatibility"] = [v.strip() for v in row["vehicle_compatibility"].split("|") if v.strip()]
+                yield number, row
+        else:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    yield number, e
+
+
+async def dedupe_vendor_skus(db) -> int:
+    """Keep the oldest part per (vendor_id, sku) and delete the rest; returns how many were deleted."""
+    ops = []
+    async for group in db.spare_parts.aggregate([
+        {"$sort": {"created_at": 1, "id": 1}},
+        {"$group": {"_id": {"vendor_id": "$vendor_id", "sku": "$sku"}, "ids": {"$push": "$id"}}},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ], allowDiskUse=True):
+        duplicates = group["ids"][1:]
+        logger.warning(f"Removing duplicate parts {duplicates} for {group['_id']}, keeping {group['ids'][0]}")
+        ops.append(DeleteMany({"id": {"$in": duplicates}}))
+    if not ops:
+        return 0
+    result = await db.spare_parts.bulk_write(ops, ordered=False)
+    return result.deleted_count
+
+
+class CatalogImporter:
+    def __init__(
+        self,
+        db,
+        part_model: BaseModel,
+        batch_size: int = 500,
+        on_complete: Optional[Callable[[dict], Awaitable[None]]] = None,
+    ):
+        self.db = db
+        self.part_model = part_model
+        self.batch_size = batch_size
+        self.on_complete = on_complete
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def create_job(self, vendor: dict, fmt: str) -> dict:
+        job = {
+            "id": str(uuid.uuid4()),
+            "vendor_id": vendor["id"],
+            "format": fmt,
+            "status": "queued",
+            "processed": 0,
+            "inserted": 0,
+            "updated": 0,
+            "failed": 0,
+            "errors": [],
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "finished_at": None,
+        }
+        await self.db.import_jobs.insert_one(dict(job))
+        return job
+
+    def start(self, job: dict, vendor: dict, path: str) -> None:
+        task = asyncio.create_task(self._run(job, vendor, path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, job_id: str, ops: list, errors: list, processed: int) -> dict:
+        inserted = updated = 0
+        if ops:
+            try:
+                result = await self.db.spare_parts.bulk_write(ops, ordered=False)
+                inserted, updated = result.upserted_count, result.matched_count
+            except BulkWriteError as e:
+                write_errors = e.details.get("writeErrors", [])
+                if any(error["code"] != DUPLICATE_KEY for error in write_errors):
+                    raise
+                inserted, updated = e.details["nUpserted"], e.details["nMatched"]
+                # Another upsert of the same SKU (a concurrent import, or a repeat in
+                # this batch) inserted first; replayed in order these now update it
+                retry = [ops[error["index"]] for error in write_errors]
+                result = await self.db.spare_parts.bulk_write(retry, ordered=True)
+                inserted += result.upserted_count
+                updated += result.matched_count
+        await self.db.import_jobs.update_one(
+            {"id": job_id},
+            {
+                "$inc": {"processed": processed, "inserted": inserted, "updated": updated, "failed": len(errors)},
+                "$push": {"errors": {"$each": errors, "$slice": MAX_REPORTED_ERRORS}},
+            }
+        )
+        return {"inserted": inserted, "updated": updated}
+
+    def _upsert(self, vendor: dict, part) -> UpdateOne:
+        fields = part.model_dump()
+        return UpdateOne(
+            {"vendor_id": vendor["id"], "sku": fields["sku"]},
+            {
+                "$set": fields,
+                "$setOnInsert": {
+                    "id": str(uuid.uuid4()),
+                    "vendor_id": vendor["id"],
+                    "vendor_name": vendor.get("business_name") or vendor["full_name"],
+                    "is_available": True,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                },
+            },
+            upsert=True
+        )
+
+    def _next_batch(self, rows: Iterator[Tuple[int, object]], vendor: dict) -> Tuple[List[UpdateOne], List[dict], int]:
+        """Parse and validate rows until a batch is full or the file ends; runs in a thread."""
+        ops, errors, processed = [], [], 0
+        for number, raw in rows:
+            processed += 1
+            if isinstance(raw, Exception):
+                errors.append({"row": number, "error": f"Invalid JSON: {raw}"})
+            elif not isinstance(raw, dict):
+                errors.append({"row": number, "error": "Row must be an object"})
+            else:
+                try:
+                    ops.append(self._upsert(vendor, self.part_model(**raw)))
+                except ValidationError as e:
+                    errors.append({"row": number, "error": "; ".join(
+                        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+                    )})
+            if len(ops) >= self.batch_size or len(errors) >= self.batch_size:
+                break
+        return ops, errors, processed
+
+    async def _run(self, job: dict, vendor: dict, path: str) -> None:
+        job_id = job["id"]
+        totals = {"inserted": 0, "updated": 0}
+        try:
+            await self.db.import_jobs.update_one({"id": job_id}, {"$set": {"status": "running"}})
+            rows = parse_rows(path, job["format"])
+            while True:
+                ops, errors, processed = await asyncio.to_thread(self._next_batch, rows, vendor)
+                if not processed:
+                    break
+                counts = await self._flush(job_id, ops, errors, processed)
+                totals = {k: totals[k] + counts[k] for k in totals}
+            status = "completed"
+        except asyncio.CancelledError:
+            status = "interrupted"
+        except Exception as e:
+            logger.error(f"Catalog import {job_id} failed: {e}")
+            status = "failed"
+        finally:
+            os.unlink(path)
+        await self.db.import_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": status, "finished_at": datetime.now(timezone.utc).isoformat()}}
+        )
+        if self.on_complete is not None and (totals["inserted"] or totals["updated"]):
+            try:
+                await self.on_complete(totals)
+            except Exception as e:
+                logger.error(f"Catalog import {job_id} completion hook failed: {e}")
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,106 @@
+"""Streaming NDJSON and CSV exports.
+
+Documents are read from a Motor cursor in batches of `batch_size` and
+encoded into chunks of roughly `chunk_bytes`. A chunk is only produced
+after the previous one has been sent to the client, so a slow reader slows
+the cursor down instead of piling rows up in memory. Exports can be pointed
+at secondaries so they stay off the primary serving live traffic.
+"""
+import csv
+import io
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
+
+import orjson
+from fastapi.responses import StreamingResponse
+from pymongo import ASCENDING
+from pymongo.read_preferences import ReadPreference
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_SORT = [("created_at", ASCENDING), ("id", ASCENDING)]
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+def export_timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Normalize a query datetime to the ISO UTC strings stored in created_at."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def created_between(start: Optional[datetime], end: Optional[datetime]) -> dict:
+    bounds = {}
+    if start is not None:
+        bounds["$gte"] = export_timestamp(start)
+    if end is not None:
+        bounds["$lt"] = export_timestamp(end)
+    return {"created_at": bounds} if bounds else {}
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, list) and all(isinstance(v, str) for v in value):
+        # Same separator the catalog import expects
+        return "|".join(value)
+    if isinstance(value, (list, dict)):
+        return orjson.dumps(value).decode()
+    return value
+
+
+async def encode_rows(cursor, fmt: str, fields: List[str], chunk_bytes: int = 64 * 1024) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(fields)
+    chunk = bytearray(buffer.getvalue().encode())
+    buffer.seek(0)
+    buffer.truncate()
+
+    try:
+        async for doc in cursor:
+            if writer is not None:
+                writer.writerow([_csv_cell(doc.get(field)) for field in fields])
+                chunk += buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                chunk += orjson.dumps(doc) + b"\n"
+            if len(chunk) >= chunk_bytes:
+                yield bytes(chunk)
+                chunk.clear()
+        if chunk:
+            yield bytes(chunk)
+    finally:
+        # Release the server-side cursor if the client disconnects mid-export
+        await cursor.close()
+
+
+def export_response(
+    collection,
+    query: dict,
+    fields: List[str],
+    fmt: str,
+    name: str,
+    read_preference: str = "secondaryPreferred",
+    batch_size: int = 500,
+) -> StreamingResponse:
+    source = collection.with_options(
+        read_preference=READ_PREFERENCES.get(read_preference, ReadPreference.PRIMARY)
+    )
+    cursor = source.find(query, {"_id": 0, **{field: 1 for field in fields}}).sort(EXPORT_SORT).batch_size(batch_size)
+    filename = f"{name}-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.{fmt}"
+    return StreamingResponse(
+        encode_rows(cursor, fmt, fields),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
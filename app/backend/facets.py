@@ -0,0 +1,132 @@
+"""In-memory category and brand facets for the storefront sidebar.
+
+Facet reads never touch Mongo. Part writes in this process update the
+counts incrementally through apply(), and a periodic rebuild recomputes
+everything with one aggregation, which also picks up writes made by other
+workers and corrects any drift.
+
+Price ranges only widen between rebuilds: removing the cheapest or most
+expensive part of a category leaves the range as it was until the next
+rebuild.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Aggregation expression mirroring is_listed()
+LISTED_EXPR = {"$and": [{"$ne": ["$is_available", False]}, {"$gt": ["$quantity", 0]}]}
+
+
+def is_listed(part: Optional[dict]) -> bool:
+    """Whether a part shows up in the default (available only) storefront listing."""
+    return bool(part) and part.get("is_available", True) and part.get("quantity", 0) > 0
+
+
+class CatalogFacets:
+    def __init__(self, db, rebuild_interval: float = 300.0):
+        self.db = db
+        self.rebuild_interval = rebuild_interval
+        self.categories: Dict[str, dict] = {}
+        self.brands: Dict[str, int] = {}
+        self.rebuilt_at: Optional[str] = None
+        self._snapshot: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _category(self, name: str) -> dict:
+        return self.categories.setdefault(name, {"total": 0, "available": 0, "min_price": None, "max_price": None})
+
+    def _add(self, part: dict, sign: int) -> None:
+        category = self._category(part.get("category"))
+        category["total"] += sign
+        if not is_listed(part):
+            return
+        category["available"] += sign
+        brand = part.get("brand")
+        if brand:
+            self.brands[brand] = self.brands.get(brand, 0) + sign
+            if self.brands[brand] <= 0:
+                del self.brands[brand]
+        if sign > 0:
+            price = part.get("price")
+            if price is not None:
+                if category["min_price"] is None or price < category["min_price"]:
+                    category["min_price"] = price
+                if category["max_price"] is None or price > category["max_price"]:
+                    category["max_price"] = price
+
+    def apply(self, old: Optional[dict], new: Optional[dict]) -> None:
+        """Account for a part changing from `old` to `new` (None for create/delete)."""
+        if old:
+            self._add(old, -1)
+        if new:
+            self._add(new, 1)
+        for name in [name for name, c in self.categories.items() if c["total"] <= 0]:
+            del self.categories[name]
+        self._snapshot = None
+
+    async def rebuild(self) -> None:
+        rows = await self.db.spare_parts.aggregate([
+            {"$group": {
+                "_id": "$category",
+                "total": {"$sum": 1},
+                "available": {"$sum": {"$cond": [LISTED_EXPR, 1, 0]}},
+                "min_price": {"$min": {"$cond": [LISTED_EXPR, "$price", None]}},
+                "max_price": {"$max": {"$cond": [LISTED_EXPR, "$price", None]}},
+            }}
+        ]).to_list(None)
+        brand_rows = await self.db.spare_parts.aggregate([
+            {"$match": {"is_available": {"$ne": False}, "quantity": {"$gt": 0}, "brand": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$brand", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        self.categories = {
+            row["_id"]: {
+                "total": row["total"],
+                "available": row["available"],
+                "min_price": row["min_price"],
+                "max_price": row["max_price"],
+            }
+            for row in rows
+        }
+        self.brands = {row["_id"]: row["count"] for row in brand_rows}
+        self.rebuilt_at = datetime.now(timezone.utc).isoformat()
+        self._snapshot = None
+
+    def snapshot(self) -> dict:
+        """Current facets; rebuilt only after a change, so repeated reads are free."""
+        if self._snapshot is None:
+            self._snapshot = self._build_snapshot()
+        return self._snapshot
+
+    def _build_snapshot(self) -> dict:
+        return {
+            "categories": sorted(name for name in self.categories if name is not None),
+            "facets": {name: dict(c) for name, c in self.categories.items() if name is not None},
+            "brands": dict(self.brands),
+            "rebuilt_at": self.rebuilt_at,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.rebuild()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Catalog facet rebuild failed: {e}")
+            await asyncio.sleep(self.rebuild_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
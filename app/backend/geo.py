@@ -0,0 +1,155 @@
+"""Geospatial helpers for dispatcher lookups.
+
+SpatialGrid buckets points into fixed-size latitude/longitude cells, so a
+nearest-neighbour query only inspects the cells around the target, ring by
+ring, instead of every dispatcher in the city. Distances are great-circle
+distances in kilometres.
+"""
+import math
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def valid_point(latitude: float, longitude: float) -> bool:
+    """Finite and within [-90, 90] x [-180, 180], as the 2dsphere index requires."""
+    return (
+        math.isfinite(latitude) and math.isfinite(longitude)
+        and -90 <= latitude <= 90 and -180 <= longitude <= 180
+    )
+
+
+def geojson_point(latitude: float, longitude: float) -> dict:
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+class SpatialGrid:
+    def __init__(self, cell_degrees: float = 0.01):
+        self.cell_degrees = cell_degrees
+        # Columns wrap at the antimeridian
+        self._columns = round(360 / cell_degrees)
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._points: Dict[str, Tuple[float, float, Tuple[int, int]]] = {}
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(longitude / self.cell_degrees) % self._columns,
+        )
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def upsert(self, key: str, latitude: float, longitude: float) -> None:
+        cell = self._cell(latitude, longitude)
+        previous = self._points.get(key)
+        if previous is not None and previous[2] != cell:
+            self._discard(key, previous[2])
+        self._points[key] = (latitude, longitude, cell)
+        self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        previous = self._points.pop(key, None)
+        if previous is not None:
+            self._discard(key, previous[2])
+
+    def _discard(self, key: str, cell: Tuple[int, int]) -> None:
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self._cells[cell]
+
+    def _row_bound_km(self, rows: int) -> float:
+        """Lower bound on the distance to any cell more than `rows` rows away."""
+        return EARTH_RADIUS_KM * math.radians(rows * self.cell_degrees)
+
+    def _column_bound_km(self, latitude: float, columns: int) -> float:
+        """Lower bound on the distance from `latitude` to any cell more than `columns` columns away.
+
+        The distance from a point to a meridian `d` degrees away is
+        asin(cos(latitude) * sin(d)), which shrinks to nothing at the poles.
+        """
+        degrees = min(columns * self.cell_degrees, 90.0)
+        reach = math.cos(math.radians(latitude)) * math.sin(math.radians(degrees))
+        return EARTH_RADIUS_KM * math.asin(min(1.0, max(0.0, reach)))
+
+    def _extent(self, latitude: float, radius_km: float) -> Tuple[int, int]:
+        """Rows and columns either side of the centre that can hold points within `radius_km`."""
+        angle = radius_km / EARTH_RADIUS_KM
+        rows = int(math.ceil(math.degrees(angle) / self.cell_degrees)) + 1
+        half_circle = self._columns // 2
+        cos_lat = math.cos(math.radians(latitude))
+        if angle >= math.pi / 2 or cos_lat <= math.sin(angle):
+            # The circle reaches a pole: every longitude is in range
+            return rows, half_circle
+        degrees = math.degrees(math.asin(math.sin(angle) / cos_lat))
+        return rows, min(int(math.ceil(degrees / self.cell_degrees)) + 1, half_circle)
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        radius_km: float,
+        accept: Optional[Callable[[str], bool]] = None,
+    ) -> List[Tuple[str, float]]:
+        """Return up to `k` (key, distance_km) pairs within `radius_km`, nearest first.
+
+        Cells are visited ring by ring; when the cells in range outnumber the
+        points (large radii, high latitudes) every point is checked instead.
+        """
+        max_rows, max_columns = self._extent(latitude, radius_km)
+        found: List[Tuple[str, float]] = []
+
+        def visit(keys) -> None:
+            for key in keys:
+                point_lat, point_lng, _ = self._points[key]
+                distance = haversine_km(latitude, longitude, point_lat, point_lng)
+                if distance <= radius_km and (accept is None or accept(key)):
+                    found.append((key, distance))
+
+        if (2 * max_rows + 1) * (2 * max_columns + 1) > len(self._points):
+            visit(list(self._points))
+        else:
+            row, column = self._cell(latitude, longitude)
+            seen: Set[Tuple[int, int]] = set()
+            for ring in range(max(max_rows, max_columns) + 1):
+                rows, columns = min(ring, max_rows), min(ring, max_columns)
+                for dr, dc in self._ring_offsets(rows, columns, min(ring - 1, max_rows), min(ring - 1, max_columns)):
+                    cell = (row + dr, (column + dc) % self._columns)
+                    if cell not in seen:
+                        seen.add(cell)
+                        visit(self._cells.get(cell, ()))
+                # Unvisited cells in range lie beyond the visited rows or columns
+                if len(found) >= k:
+                    found.sort(key=lambda item: item[1])
+                    bound = min(
+                        self._row_bound_km(rows) if rows < max_rows else math.inf,
+                        self._column_bound_km(latitude, columns) if columns < max_columns else math.inf,
+                    )
+                    if found[k - 1][1] <= bound:
+                        break
+        found.sort(key=lambda item: item[1])
+        return found[:k]
+
+    @staticmethod
+    def _ring_offsets(rows: int, columns: int, inner_rows: int, inner_columns: int):
+        """Offsets within rows x columns of the centre but outside inner_rows x inner_columns."""
+        for dr in range(-rows, rows + 1):
+            if abs(dr) > inner_rows:
+                for dc in range(-columns, columns + 1):
+                    yield dr, dc
+            elif columns > inner_columns:
+                yield dr, -columns
+                if columns:
+                    yield dr, columns
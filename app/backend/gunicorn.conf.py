@@ -0,0 +1,66 @@
+"""Gunicorn settings for running the API on several uvicorn worker processes.
+
+    gunicorn -c gunicorn.conf.py server:app
+
+WEB_CONCURRENCY sets the number of workers. It defaults to one per CPU
+only with NOTIFICATION_PUBSUB=mongo and to a single worker otherwise (see
+below); note that inside a container cpu_count() is the host's CPU count,
+so set WEB_CONCURRENCY explicitly there. Each worker builds its own Mongo
+client, payment client, caches and background tasks in the app's lifespan
+handler. server.py divides MONGO_MAX_CONNECTIONS between the workers, so
+the total pool stays within the cluster's budget. The periodic sweepers
+(archiving, stock holds, lease expiry, stats reconciliation) run in every
+worker; each is safe to run concurrently.
+
+On SIGTERM gunicorn stops accepting connections and gives each worker
+`graceful_timeout` seconds to finish in-flight requests. Event streams end
+on their own within SSE_MAX_STREAM_SECONDS and clients reconnect to another
+worker. The lifespan shutdown then flushes buffered location pings,
+notifications and stats before the clients close.
+
+With more than one worker, set NOTIFICATION_PUBSUB=mongo so notifications
+published on one worker reach streams held open by another, and so user
+changes (e.g. deactivation) evict the cached user in every worker rather
+than after USER_CACHE_TTL_SECONDS. Without it, the in-process backend
+only reaches streams on the publishing worker, so several workers with the
+default backend is a misconfiguration and is logged as an error at boot.
+
+Metrics, pool saturation and hasher queue depth are kept per worker. Each
+sample in /api/metrics is labelled with the worker pid, and /api/health
+names the worker that answered. Set METRICS_DIR to a directory shared by
+the workers (local disk is enough) and every scrape reports all workers,
+not just the one that happened to serve it.
+"""
+import multiprocessing
+import os
+
+SHARED_PUBSUB = os.environ.get("NOTIFICATION_PUBSUB", "local") == "mongo"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() if SHARED_PUBSUB else 1))
+# Read by server.py in each worker to size per-process pools
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# The app opens no sockets or threads at import, so it is safe to load before forking
+preload_app = True
+
+graceful_timeout = int(os.environ.get(
+    "GRACEFUL_TIMEOUT", str(int(float(os.environ.get("SSE_MAX_STREAM_SECONDS", "60"))) + 30)
+))
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+keepalive = 5
+
+# Recycle workers occasionally; jitter keeps them from restarting together
+max_requests = int(os.environ.get("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-" if os.environ.get("ACCESS_LOG") else None
+
+
+def on_starting(server):
+    if workers > 1 and not SHARED_PUBSUB:
+        server.log.error(
+            f"{workers} workers with NOTIFICATION_PUBSUB=local: notifications and user cache "
+            "evictions will not reach other workers. Set NOTIFICATION_PUBSUB=mongo or WEB_CONCURRENCY=1"
+        )
@@ -0,0 +1,212 @@
+"""MongoDB index registry and query plan auditing.
+
+Every index the API relies on is declared in INDEX_REGISTRY and applied by
+ensure_indexes(), in a background task after startup or from
+tools/ensure_indexes.py. Index creation is additive only: indexes are
+never dropped here, and a failure on one index (for example an options
+conflict with an index built by an older release) is logged and skipped so
+a rolling deploy never takes the app down.
+
+QUERY_SHAPES mirrors the real filters and sorts issued by the route
+handlers so the admin query plan audit can flag any that fall back to a
+collection scan.
+"""
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from notifications import READ_RETENTION_SECONDS
+from search import TEXT_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING)], name="role"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_id"),
+    ],
+    "spare_parts": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Also serves vendor_id-only filters. Catalog imports upsert on (vendor_id, sku);
+        # an existing non-unique vendor_sku is replaced by tools/dedupe_vendor_skus.py
+        IndexModel([("vendor_id", ASCENDING), ("sku", ASCENDING)], name="vendor_sku", unique=True),
+        IndexModel([("category", ASCENDING)], name="category"),
+        IndexModel([("sku", ASCENDING)], name="sku"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_id"),
+        # Holds are {order_id, quantity, held_at}; the old "stock_holds" index is unused and can be dropped
+        IndexModel([("stock_holds.order_id", ASCENDING)], name="stock_holds_order", sparse=True),
+        IndexModel([("stock_holds.held_at", ASCENDING)], name="stock_holds_age", sparse=True),
+        IndexModel(
+            [(field, TEXT) for field in TEXT_WEIGHTS],
+            name="parts_text", weights=TEXT_WEIGHTS, default_language="english",
+        ),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_id"),
+        IndexModel([("client_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="client_created"),
+        IndexModel([("items.vendor_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="vendor_created"),
+        IndexModel([("dispatcher_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="dispatcher_created"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created"),
+        IndexModel([("payment_reference", ASCENDING)], name="payment_reference"),
+        # Job board lease expiry; only assigned orders are ever released
+        IndexModel(
+            [("lease_expires_at", ASCENDING)],
+            name="assigned_lease", partialFilterExpression={"status": "assigned"},
+        ),
+    ],
+    "vendor_orders": [
+        IndexModel([("id", ASCENDING), ("vendor_id", ASCENDING)], name="order_vendor_unique", unique=True),
+        IndexModel([("vendor_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="vendor_created"),
+        IndexModel(
+            [("vendor_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="vendor_status_created",
+        ),
+    ],
+    "notifications": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_created"),
+        IndexModel([("user_id", ASCENDING), ("is_read", ASCENDING)], name="user_unread"),
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+        # read_at is only set when a notification is read, so unread ones never expire
+        IndexModel([("read_at", ASCENDING)], name="read_ttl", expireAfterSeconds=READ_RETENTION_SECONDS),
+    ],
+    "notification_counters": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "notifications_archive": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+    ],
+    "locations": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        IndexModel([("written_at", ASCENDING)], name="written_at"),
+        IndexModel([("location", GEOSPHERE)], name="location_2dsphere"),
+    ],
+    "location_tracks": [
+        IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING)], name="user_updated"),
+    ],
+    "payment_events": [
+        IndexModel([("event_id", ASCENDING)], name="event_id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("received_at", ASCENDING)], name="status_received"),
+    ],
+    "import_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+}
+
+NEWEST_FIRST = [("created_at", DESCENDING), ("id", DESCENDING)]
+EXPORT_SORT = [("created_at", ASCENDING), ("id", ASCENDING)]
+
+# Route name -> representative query issued by that route.
+QUERY_SHAPES: Dict[str, dict] = {
+    "get_current_user": {"collection": "users", "filter": {"id": "x"}},
+    "login": {"collection": "users", "filter": {"email": "x@example.com"}},
+    "get_part": {"collection": "spare_parts", "filter": {"id": "x"}},
+    "get_parts_by_vendor": {"collection": "spare_parts", "filter": {"vendor_id": "x"}},
+    "import_parts": {"collection": "spare_parts", "filter": {"vendor_id": "x", "sku": "x"}},
+    "get_parts": {
+        "collection": "spare_parts", "filter": {"is_available": True, "quantity": {"$gt": 0}},
+        "sort": NEWEST_FIRST,
+    },
+    "get_parts_by_category": {"collection": "spare_parts", "filter": {"category": "x"}},
+    "search_parts": {"collection": "spare_parts", "filter": {"$text": {"$search": "brake pad"}}},
+    "search_parts_sku": {"collection": "spare_parts", "filter": {"sku": {"$in": ["x"]}}},
+    "clear_holds": {"collection": "spare_parts", "filter": {"stock_holds.order_id": "x"}},
+    "sweep_stock_holds": {"collection": "spare_parts", "filter": {"stock_holds.held_at": {"$lt": "x"}}},
+    "get_order": {"collection": "orders", "filter": {"id": "x"}},
+    "get_orders_client": {
+        "collection": "orders", "filter": {"client_id": "x"}, "sort": NEWEST_FIRST,
+    },
+    "get_orders_vendor": {
+        "collection": "vendor_orders", "filter": {"vendor_id": "x"}, "sort": NEWEST_FIRST,
+    },
+    "get_orders_dispatcher": {
+        "collection": "orders", "filter": {"dispatcher_id": "x"}, "sort": NEWEST_FIRST,
+    },
+    "claim_next_job": {
+        "collection": "orders", "filter": {"status": "paid", "dispatcher_id": None}, "sort": EXPORT_SORT,
+    },
+    "release_expired_leases": {
+        "collection": "orders", "filter": {"status": "assigned", "lease_expires_at": {"$lt": "x"}},
+    },
+    "verify_payment": {"collection": "orders", "filter": {"payment_reference": "x"}},
+    "get_notifications": {
+        "collection": "notifications", "filter": {"user_id": "x"}, "sort": NEWEST_FIRST,
+    },
+    "get_unread_count": {"collection": "notification_counters", "filter": {"user_id": "x"}},
+    "mark_all_notifications_read": {"collection": "notifications", "filter": {"user_id": "x", "is_read": False}},
+    "archive_notifications": {
+        "collection": "notifications", "filter": {"created_at": {"$lt": "x"}}, "sort": [("created_at", ASCENDING)],
+    },
+    "mark_notification_read": {"collection": "notifications", "filter": {"id": "x", "user_id": "x"}},
+    "get_all_users": {
+        "collection": "users", "filter": {}, "sort": NEWEST_FIRST,
+    },
+    "get_user_location": {"collection": "locations", "filter": {"user_id": "x"}},
+    "export_orders": {
+        "collection": "orders", "filter": {"created_at": {"$gte": "x"}}, "sort": EXPORT_SORT,
+    },
+    "export_orders_vendor": {
+        "collection": "vendor_orders", "filter": {"vendor_id": "x"}, "sort": EXPORT_SORT,
+    },
+}
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every registered index, returning the names created per collection.
+
+    Failures are logged per index and never raised.
+    """
+    created: Dict[str, List[str]] = {}
+    for collection, models in INDEX_REGISTRY.items():
+        created[collection] = []
+        for model in models:
+            try:
+                names = await db[collection].create_indexes([model])
+                created[collection].extend(names)
+            except OperationFailure as e:
+                logger.warning(f"Skipping index {model.document['name']} on {collection}: {e}")
+            except Exception as e:
+                logger.error(f"Failed to create index {model.document['name']} on {collection}: {e}")
+    return created
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    """Flatten a winning plan tree into the list of stage names it uses."""
+    stages = []
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    if "queryPlan" in plan:
+        stages.extend(_plan_stages(plan["queryPlan"]))
+    if "inputStage" in plan:
+        stages.extend(_plan_stages(plan["inputStage"]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def audit_query_plans(db) -> List[dict]:
+    """Run explain() on every registered query shape and flag collection scans."""
+    report = []
+    for route, shape in QUERY_SHAPES.items():
+        cursor = db[shape["collection"]].find(shape["filter"])
+        if shape.get("sort"):
+            cursor = cursor.sort(shape["sort"])
+        try:
+            explain = await cursor.explain()
+        except Exception as e:
+            report.append({"route": route, "collection": shape["collection"], "error": str(e)})
+            continue
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        report.append({
+            "route": route,
+            "collection": shape["collection"],
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return report
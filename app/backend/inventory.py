@@ -0,0 +1,165 @@
+"""Batched, race-free stock reservation for order placement.
+
+Every cart line is decremented with a conditional update guarded on
+`quantity >= n`, all in one bulk_write, so two buyers can never both take
+the last unit. Each successful decrement also tags the part with the order
+id, quantity and time in `stock_holds`; if any line fails the tagged
+parts are restored and untagged, leaving stock exactly as it was. Once the
+order document is written the tags are cleared.
+
+A worker that dies between reserving and committing leaves its holds
+behind. StockHoldSweeper finds holds older than `max_age_minutes`: when no
+order with that id exists the quantity goes back on the shelf, otherwise
+only the tag is dropped. Each restore is a conditional update on the hold
+itself, so it cannot race release_stock() into returning stock twice.
+
+The number of round trips is constant in the size of the cart.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, part_ids: List[str]):
+        super().__init__(f"Insufficient stock for parts: {', '.join(part_ids)}")
+        self.part_ids = part_ids
+
+
+def merge_lines(lines: List[tuple]) -> Dict[str, int]:
+    """Sum quantities of (part_id, quantity) lines that refer to the same part."""
+    merged: Dict[str, int] = {}
+    for part_id, quantity in lines:
+        merged[part_id] = merged.get(part_id, 0) + quantity
+    return merged
+
+
+async def reserve_stock(db, order_id: str, quantities: Dict[str, int]) -> None:
+    """Atomically take `quantities` of each part or nothing at all.
+
+    Raises InsufficientStock naming the parts that could not be reserved.
+    """
+    held_at = datetime.now(timezone.utc).isoformat()
+    ops = [
+        UpdateOne(
+            {"id": part_id, "quantity": {"$gte": quantity}},
+            {
+                "$inc": {"quantity": -quantity},
+                "$push": {"stock_holds": {"order_id": order_id, "quantity": quantity, "held_at": held_at}},
+            }
+        )
+        for part_id, quantity in quantities.items()
+    ]
+    result = await db.spare_parts.bulk_write(ops, ordered=False)
+    if result.modified_count == len(ops):
+        return
+
+    held = await db.spare_parts.find(
+        {"id": {"$in": list(quantities)}, "stock_holds.order_id": order_id}, {"_id": 0, "id": 1}
+    ).to_list(len(quantities))
+    held_ids = {p["id"] for p in held}
+    await release_stock(db, order_id, quantities)
+    raise InsufficientStock([part_id for part_id in quantities if part_id not in held_ids])
+
+
+async def release_stock(db, order_id: str, quantities: Dict[str, int]) -> None:
+    """Give back stock reserved by `order_id`; parts it never reserved are untouched."""
+    await db.spare_parts.bulk_write([
+        UpdateOne(
+            {"id": part_id, "stock_holds.order_id": order_id},
+            {"$inc": {"quantity": quantity}, "$pull": {"stock_holds": {"order_id": order_id}}}
+        )
+        for part_id, quantity in quantities.items()
+    ], ordered=False)
+
+
+async def clear_holds(db, order_id: str) -> None:
+    """Drop the reservation tags once the order has been committed."""
+    await db.spare_parts.update_many(
+        {"stock_holds.order_id": order_id}, {"$pull": {"stock_holds": {"order_id": order_id}}}
+    )
+
+
+class StockHoldSweeper:
+    def __init__(self, db, max_age_minutes: float = 15, interval: float = 300.0, batch_size: int = 500):
+        self.db = db
+        self.max_age_minutes = max_age_minutes
+        self.interval = interval
+        self.batch_size = batch_size
+        self.restored = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep_batch(self, cutoff: str) -> int:
+        """Settle up to batch_size parts with holds taken before `cutoff`; returns how many parts."""
+        parts = await self.db.spare_parts.find(
+            {"stock_holds.held_at": {"$lt": cutoff}}, {"_id": 0, "id": 1, "stock_holds": 1}
+        ).to_list(self.batch_size)
+        if not parts:
+            return 0
+        stale = [
+            (part["id"], hold) for part in parts for hold in part["stock_holds"]
+            if isinstance(hold, dict) and hold["held_at"] < cutoff
+        ]
+        order_ids = list({hold["order_id"] for _, hold in stale})
+        committed = await self.db.orders.find({"id": {"$in": order_ids}}, {"_id": 0, "id": 1}).to_list(len(order_ids))
+        committed_ids = {order["id"] for order in committed}
+
+        ops = []
+        restored = 0
+        for part_id, hold in stale:
+            pull = {"$pull": {"stock_holds": {"order_id": hold["order_id"]}}}
+            if hold["order_id"] in committed_ids:
+                ops.append(UpdateOne({"id": part_id, "stock_holds.order_id": hold["order_id"]}, pull))
+                continue
+            restored += 1
+            ops.append(UpdateOne(
+                {"id": part_id, "stock_holds": {"$elemMatch": {"order_id": hold["order_id"], "held_at": hold["held_at"]}}},
+                {"$inc": {"quantity": hold["quantity"]}, **pull}
+            ))
+        if ops:
+            await self.db.spare_parts.bulk_write(ops, ordered=False)
+        if restored:
+            self.restored += restored
+            logger.warning(f"Restored {restored} stock holds from orders that were never placed: {order_ids}")
+        return len(parts)
+
+    async def run_once(self) -> int:
+        cutoff = (datetime.now(timezone.utc) - timedelta(minutes=self.max_age_minutes)).isoformat()
+        total = 0
+        while True:
+            swept = await self.sweep_batch(cutoff)
+            total += swept
+            if swept < self.batch_size:
+                break
+        return total
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Stock hold sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"restored": self.restored}
@@ -0,0 +1,178 @@
+"""Dispatcher job board: claimable paid orders, claimed atomically.
+
+The queue is the set of orders with status "paid" and no dispatcher,
+served oldest first from the orders `status_created` index. claim_next()
+takes the head of the queue with a single find_one_and_update, so two
+dispatchers can never receive the same job and nobody races on a
+specific order id.
+
+wait_for_job() is the long-poll side. A dispatcher with nothing to do
+parks on an in-process event instead of re-querying. notify() wakes
+every parked dispatcher when this worker makes a job available (an order
+is paid or a lease expires). While anyone is parked, one background check
+per `check_interval` catches jobs made available by other workers. Waiting
+dispatchers therefore cost one indexed query per worker per interval,
+however many of them there are, and nothing at all when nobody waits.
+
+A claim may carry a lease. If the dispatcher has not picked the order up
+when the lease runs out, the background loop puts it back in the queue
+and `on_release` is called with the order as it was before.
+"""
+import asyncio
+import logging
+import math
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from pymongo import ASCENDING, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+CLAIMABLE = {"status": "paid", "dispatcher_id": None}
+QUEUE_ORDER = [("created_at", ASCENDING), ("id", ASCENDING)]
+# Releases handled per background cycle, so a backlog cannot stall the loop
+MAX_RELEASES_PER_CYCLE = 100
+# Longest lease a claim can carry, whatever the caller asks for
+MAX_LEASE_SECONDS = 24 * 3600
+
+
+def lease_deadline(lease_seconds: float) -> Optional[str]:
+    if not lease_seconds or not lease_seconds > 0:
+        return None
+    lease_seconds = min(lease_seconds, MAX_LEASE_SECONDS)
+    return (datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)).isoformat()
+
+
+class JobBoard:
+    def __init__(
+        self,
+        db,
+        lease_seconds: float = 0.0,
+        check_interval: float = 5.0,
+        on_release: Optional[Callable[[dict], Awaitable[None]]] = None,
+    ):
+        self.db = db
+        self.lease_seconds = lease_seconds
+        self.check_interval = check_interval
+        self.on_release = on_release
+        self.claimed = 0
+        self.released = 0
+        self.waiting = 0
+        self._closed = False
+        self._available = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        """Wake dispatchers parked in this worker; they retry claim_next()."""
+        available, self._available = self._available, asyncio.Event()
+        available.set()
+
+    async def list_open(self, limit: int, projection: Optional[dict] = None) -> List[dict]:
+        cursor = self.db.orders.find(CLAIMABLE, projection or {"_id": 0}).sort(QUEUE_ORDER).limit(limit)
+        return await cursor.to_list(limit)
+
+    async def claim_next(self, dispatcher: dict, lease_seconds: Optional[float] = None) -> Optional[Tuple[dict, dict]]:
+        """Assign the oldest open job to `dispatcher`, returning (before, after) or None."""
+        lease_seconds = self.lease_seconds if lease_seconds is None else lease_seconds
+        update = {
+            "status": "assigned",
+            "dispatcher_id": dispatcher["id"],
+            "dispatcher_name": dispatcher["full_name"],
+            "lease_expires_at": lease_deadline(lease_seconds),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        before = await self.db.orders.find_one_and_update(
+            CLAIMABLE,
+            {"$set": update},
+            sort=QUEUE_ORDER,
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            return None
+        self.claimed += 1
+        return before, {**before, **update}
+
+    async def wait_for_job(self, dispatcher: dict, timeout: float,
+                           lease_seconds: Optional[float] = None) -> Optional[Tuple[dict, dict]]:
+        """claim_next(), waiting up to `timeout` seconds for a job to appear."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        self.waiting += 1
+        try:
+            while True:
+                # Take the event before querying so a notify() in between is not lost
+                available = self._available
+                claim = await self.claim_next(dispatcher, lease_seconds)
+                remaining = deadline - loop.time()
+                if claim is not None or remaining <= 0 or self._closed:
+                    return claim
+                try:
+                    await asyncio.wait_for(available.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.waiting -= 1
+
+    async def release_expired(self) -> int:
+        """Return jobs whose lease ran out before pickup to the queue."""
+        released = 0
+        while released < MAX_RELEASES_PER_CYCLE:
+            now = datetime.now(timezone.utc).isoformat()
+            order = await self.db.orders.find_one_and_update(
+                {"status": "assigned", "lease_expires_at": {"$lt": now}},
+                {
+                    "$set": {"status": "paid", "dispatcher_id": None, "dispatcher_name": None, "updated_at": now},
+                    "$unset": {"lease_expires_at": ""},
+                },
+                projection={"_id": 0},
+                return_document=ReturnDocument.BEFORE
+            )
+            if order is None:
+                break
+            released += 1
+            logger.info(f"Lease on order {order['id']} expired; returned to the job board")
+            if self.on_release is not None:
+                try:
+                    await self.on_release(order)
+                except Exception as e:
+                    logger.error(f"Job release callback failed for {order['id']}: {e}")
+        if released:
+            self.released += released
+            self.notify()
+        return released
+
+    async def _has_open_job(self) -> bool:
+        return await self.db.orders.find_one(CLAIMABLE, {"_id": 0, "id": 1}) is not None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.release_expired()
+                if self.waiting and await self._has_open_job():
+                    self.notify()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job board cycle failed: {e}")
+
+    def start(self) -> None:
+        self._closed = False
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Parked long-polls return empty instead of holding up shutdown
+        self._closed = True
+        self.notify()
+
+    def stats(self) -> dict:
+        return {"waiting": self.waiting, "claimed": self.claimed, "released": self.released}
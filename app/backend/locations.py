@@ -0,0 +1,227 @@
+"""In-memory latest-position store for dispatcher GPS pings.
+
+Dispatchers report their position every few seconds and almost every write
+is superseded moments later, so pings only update memory. A background
+loop flushes the latest position of every dispatcher that moved since the
+last flush in one bulk_write. The same loop also pulls positions flushed by
+other workers, so reads can be served from memory everywhere. Flushed
+documents carry a server-side `written_at` date and syncs follow that,
+re-reading one flush interval back, because a worker may flush an older
+ping after another worker's newer one. When
+`track_interval` is set, a downsampled history (at most one point per
+dispatcher per interval) is appended to the `location_tracks` collection.
+
+Live subscribers for a dispatcher receive every accepted ping as it arrives
+in this worker. Positions are also kept in a SpatialGrid for
+nearest-dispatcher queries, and stored in Mongo with a GeoJSON `location`
+field backed by a 2dsphere index for the database fallback.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional, Set
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from geo import SpatialGrid, geojson_point, valid_point
+from pubsub import Subscription
+
+logger = logging.getLogger(__name__)
+
+# Write errors that will recur for the same document (bad value, failed
+# validation, unindexable geo point): retrying them would fail forever
+PERMANENT_WRITE_ERRORS = {2, 121, 16755}
+
+
+class LocationStore:
+    def __init__(self, db, flush_interval: float = 2.0, track_interval: float = 0.0, subscriber_queue_size: int = 50):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.track_interval = track_interval
+        self.subscriber_queue_size = subscriber_queue_size
+        self.pings = 0
+        self.flushed = 0
+        self._latest: Dict[str, dict] = {}
+        self._grid = SpatialGrid()
+        self._dirty: Set[str] = set()
+        self._track_batch: List[dict] = []
+        self._last_tracked: Dict[str, float] = {}
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._synced_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, user_id: str, user_name: str, latitude: float, longitude: float) -> dict:
+        # Checked before any state changes, so a bad ping leaves nothing behind
+        if not valid_point(latitude, longitude):
+            raise ValueError(f"Invalid coordinates: {latitude}, {longitude}")
+        now = datetime.now(timezone.utc)
+        location = {
+            "user_id": user_id,
+            "user_name": user_name,
+            "latitude": latitude,
+            "longitude": longitude,
+            "location": geojson_point(latitude, longitude),
+            "updated_at": now.isoformat(),
+        }
+        self._remember(location)
+        self._dirty.add(user_id)
+        self.pings += 1
+
+        if self.track_interval:
+            ts = now.timestamp()
+            if ts - self._last_tracked.get(user_id, 0) >= self.track_interval:
+                self._last_tracked[user_id] = ts
+                self._track_batch.append(dict(location))
+
+        self._publish(location)
+        return location
+
+    def _publish(self, location: dict) -> None:
+        for subscription in list(self._subscribers.get(location["user_id"], ())):
+            try:
+                subscription.queue.put_nowait(location)
+            except asyncio.QueueFull:
+                # Slow consumer: skip this ping, the next one supersedes it anyway
+                pass
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        location = self._latest.get(user_id)
+        if location is None:
+            location = await self.db.locations.find_one({"user_id": user_id}, {"_id": 0, "written_at": 0})
+            if location is not None:
+                self._remember(location)
+        return location
+
+    def _remember(self, location: dict) -> None:
+        # Grid first: it rejects points it cannot bucket before _latest is touched
+        self._grid.upsert(location["user_id"], location["latitude"], location["longitude"])
+        self._latest[location["user_id"]] = location
+
+    def nearest(self, latitude: float, longitude: float, k: int, radius_km: float,
+                max_age_seconds: Optional[float] = None) -> List[dict]:
+        """Up to `k` dispatchers within `radius_km`, nearest first, with `distance_km` set."""
+        cutoff = None
+        if max_age_seconds:
+            cutoff = (datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)).isoformat()
+
+        def fresh(user_id: str) -> bool:
+            return cutoff is None or self._latest[user_id]["updated_at"] >= cutoff
+
+        return [
+            {**self._latest[user_id], "distance_km": round(distance, 3)}
+            for user_id, distance in self._grid.nearest(latitude, longitude, k, radius_km, fresh)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def all(self) -> List[dict]:
+        return list(self._latest.values())
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(user_id, self.subscriber_queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+
+    async def flush(self) -> None:
+        dirty, self._dirty = self._dirty, set()
+        tracks, self._track_batch = self._track_batch, []
+        if dirty:
+            user_ids = list(dirty)
+            ops = [
+                UpdateOne(
+                    {"user_id": user_id},
+                    {"$set": self._latest[user_id], "$currentDate": {"written_at": True}},
+                    upsert=True
+                )
+                for user_id in user_ids
+            ]
+            try:
+                await self.db.locations.bulk_write(ops, ordered=False)
+                self.flushed += len(ops)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                self.flushed += len(ops) - len(errors)
+                for error in errors:
+                    user_id = user_ids[error["index"]]
+                    if error["code"] in PERMANENT_WRITE_ERRORS:
+                        logger.error(f"Dropping unwritable location for {user_id}: {error.get('errmsg')}")
+                    else:
+                        self._dirty.add(user_id)
+                logger.error(f"Failed to flush {len(errors)} of {len(ops)} locations")
+            except Exception as e:
+                logger.error(f"Failed to flush {len(ops)} locations: {e}")
+                # Retry next cycle unless a newer ping already re-dirtied them
+                self._dirty |= dirty
+        if tracks:
+            try:
+                await self.db.location_tracks.insert_many(tracks, ordered=False)
+            except Exception as e:
+                logger.error(f"Failed to write {len(tracks)} track points: {e}")
+
+    async def sync(self) -> None:
+        """Load positions flushed since the last sync, e.g. by other workers."""
+        query = {}
+        if self._synced_at is not None:
+            # Overlap the window: writes may become visible out of written_at order
+            query = {"written_at": {"$gt": self._synced_at - timedelta(seconds=self.flush_interval)}}
+        async for location in self.db.locations.find(query, {"_id": 0}):
+            written_at = location.pop("written_at", None)
+            if written_at is not None and (self._synced_at is None or written_at > self._synced_at):
+                self._synced_at = written_at
+            if not valid_point(location["latitude"], location["longitude"]):
+                continue
+            current = self._latest.get(location["user_id"])
+            if current is None or current["updated_at"] < location["updated_at"]:
+                self._remember(location)
+                # Pings handled by other workers reach this worker's streams here
+                self._publish(location)
+        if self._synced_at is None:
+            # Nothing written by this release yet; start the window from now
+            self._synced_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Location store cycle failed: {e}")
+
+    async def start(self) -> None:
+        try:
+            await self.sync()
+        except Exception as e:
+            logger.error(f"Failed to load dispatcher locations: {e}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self._latest),
+            "dirty": len(self._dirty),
+            "pings": self.pings,
+            "flushed": self.flushed,
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+        }
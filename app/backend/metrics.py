@@ -0,0 +1,391 @@
+"""Request and MongoDB metrics in the Prometheus text format.
+
+RequestMetrics is a plain ASGI middleware that times every request and
+labels it with the matched route template (e.g. /api/orders/{order_id}), so
+label cardinality stays bounded. MongoCommandMetrics and MongoPoolMetrics
+are pymongo event listeners passed to the client at construction. They
+record per-collection command latency, log slow commands and track
+connection pool usage. pymongo calls listeners from its worker threads,
+so every metric takes a lock when updated.
+
+Only the exposition format is implemented, which avoids pulling in
+prometheus_client for a handful of counters and histograms.
+
+Metrics live in each worker process, and every sample carries a `worker`
+label (the pid). Without a shared directory, a scrape only sees the worker
+that answered it. When `snapshot_dir` is set, MetricsSnapshotter writes each
+worker's samples there every few seconds and render() merges the fresh
+snapshots of all workers, so a scrape of any worker covers the whole server.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Labels = Tuple[str, ...]
+# [sample name, {label: value}, value]
+Sample = list
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in labels.items()]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+    def family(self) -> dict:
+        return {"name": self.name, "help": self.documentation, "type": self.kind, "samples": self.samples()}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        return [[self.name, dict(zip(self.labelnames, labels)), value] for labels, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels: Labels, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def get(self, labels: Labels = ()) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def max(self) -> float:
+        with self._lock:
+            return max(self._values.values(), default=0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = (), buckets=REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts, then sum and count
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        samples = []
+        for labels, series in items:
+            named = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += series[i]
+                samples.append([f"{self.name}_bucket", {**named, "le": _format_value(bound)}, cumulative])
+            samples.append([f"{self.name}_sum", named, series[-2]])
+            samples.append([f"{self.name}_count", named, series[-1]])
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "spareparts", snapshot_dir: Optional[str] = None, snapshot_ttl: float = 30.0):
+        self.prefix = prefix
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self.snapshot_ttl = snapshot_ttl
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add `metric`, or return the one already registered under its name."""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Labels = ()) -> Counter:
+        return self.register(Counter(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Labels = ()) -> Gauge:
+        return self.register(Gauge(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Labels = (), buckets=REQUEST_BUCKETS) -> Histogram:
+        return self.register(Histogram(f"{self.prefix}_{name}", documentation, labelnames, buckets))
+
+    def families(self, components: Optional[Dict[str, dict]] = None) -> List[dict]:
+        """This worker's metrics plus numeric fields of component stats() dicts."""
+        families = [metric.family() for metric in self._metrics.values()]
+        for component, stats in (components or {}).items():
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{self.prefix}_{component}_{key}"
+                families.append({"name": name, "help": f"{component} {key}", "type": "gauge",
+                                 "samples": [[name, {}, value]]})
+        worker = str(os.getpid())
+        for family in families:
+            for sample in family["samples"]:
+                sample[1] = {**sample[1], "worker": worker}
+        return families
+
+    def _snapshot_path(self, pid: int) -> Path:
+        return self.snapshot_dir / f"{pid}.json"
+
+    def write_snapshot(self, components: Optional[Dict[str, dict]] = None) -> None:
+        path = self._snapshot_path(os.getpid())
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.families(components)))
+        os.replace(tmp, path)
+
+    def remove_snapshot(self) -> None:
+        self._snapshot_path(os.getpid()).unlink(missing_ok=True)
+
+    def _other_workers(self) -> List[dict]:
+        families: List[dict] = []
+        own = self._snapshot_path(os.getpid())
+        cutoff = time.time() - self.snapshot_ttl
+        for path in self.snapshot_dir.glob("*.json"):
+            try:
+                # Stale files belong to workers that exited without cleaning up
+                if path == own or path.stat().st_mtime < cutoff:
+                    continue
+                families.extend(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return families
+
+    def render(self, components: Optional[Dict[str, dict]] = None) -> str:
+        """Exposition text for this worker, merged with other workers' snapshots if enabled."""
+        families = self.families(components)
+        if self.snapshot_dir is not None:
+            families.extend(self._other_workers())
+        merged: Dict[str, dict] = {}
+        for family in families:
+            target = merged.setdefault(family["name"], {**family, "samples": []})
+            target["samples"].extend(family["samples"])
+        lines: List[str] = []
+        for family in merged.values():
+            lines.append(f"# HELP {family['name']} {family['help']}")
+            lines.append(f"# TYPE {family['name']} {family['type']}")
+            for name, labels, value in family["samples"]:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsSnapshotter:
+    """Periodically publishes this worker's metrics to the registry's snapshot_dir."""
+
+    def __init__(self, registry: MetricsRegistry, components: Callable[[], Dict[str, dict]], interval: float = 5.0):
+        self.registry = registry
+        self.components = components
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.registry.write_snapshot(self.components())
+            except Exception as e:
+                logger.error(f"Failed to write metrics snapshot: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.registry.snapshot_dir is None or self._task is not None:
+            return
+        self.registry.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self.registry.remove_snapshot()
+
+
+class RequestMetrics:
+    """ASGI middleware recording request latency per method, route and status."""
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.latency = registry.histogram(
+            "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+        )
+        self.in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_flight.dec()
+            route = scope.get("route")
+            self.latency.observe(
+                (scope["method"], getattr(route, "path", "unmatched"), str(status)),
+                time.perf_counter() - start
+            )
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self, registry: MetricsRegistry, slow_ms: float = 100.0):
+        self.slow_ms = slow_ms
+        self.latency = registry.histogram(
+            "mongo_command_duration_seconds", "MongoDB command latency by collection and command",
+            ("collection", "command"), buckets=MONGO_BUCKETS
+        )
+        self.failures = registry.counter(
+            "mongo_command_failures_total", "Failed MongoDB commands", ("collection", "command")
+        )
+        self.slow = registry.counter(
+            "mongo_slow_commands_total", "MongoDB commands slower than the slow query threshold", ("collection", "command")
+        )
+        self._pending: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event) -> Tuple:
+        return (event.request_id, event.connection_id, event.operation_id)
+
+    def started(self, event) -> None:
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        with self._lock:
+            self._pending[self._key(event)] = collection
+
+    def _finish(self, event, failed: bool) -> None:
+        with self._lock:
+            collection = self._pending.pop(self._key(event), "")
+        labels = (collection, event.command_name)
+        seconds = event.duration_micros / 1_000_000
+        self.latency.observe(labels, seconds)
+        if failed:
+            self.failures.inc(labels)
+        if seconds * 1000 >= self.slow_ms:
+            self.slow.inc(labels)
+            logger.warning(f"Slow MongoDB command: {event.command_name} on {collection or event.database_name} took {seconds * 1000:.1f}ms")
+
+    def succeeded(self, event) -> None:
+        self._finish(event, failed=False)
+
+    def failed(self, event) -> None:
+        self._finish(event, failed=True)
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self, registry: MetricsRegistry, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self.open = registry.gauge("mongo_pool_connections", "Open MongoDB connections", ("address",))
+        self.in_use = registry.gauge("mongo_pool_checked_out", "MongoDB connections checked out", ("address",))
+        self.checkout_failures = registry.counter(
+            "mongo_pool_checkout_failures_total", "Failed MongoDB connection checkouts", ("address", "reason")
+        )
+        registry.gauge("mongo_pool_max_size", "Configured maxPoolSize per server").set((), max_pool_size)
+
+    @staticmethod
+    def _address(event) -> Labels:
+        host, port = event.address
+        return (f"{host}:{port}",)
+
+    def saturation(self) -> float:
+        """Busiest server's checked-out connections as a fraction of maxPoolSize."""
+        return self.in_use.max() / self.max_pool_size if self.max_pool_size else 0.0
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        self.open.set(self._address(event), 0)
+        self.in_use.set(self._address(event), 0)
+
+    def connection_created(self, event) -> None:
+        self.open.inc(self._address(event))
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        self.open.dec(self._address(event))
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event) -> None:
+        self.checkout_failures.inc(self._address(event) + (str(event.reason),))
+
+    def connection_checked_out(self, event) -> None:
+        self.in_use.inc(self._address(event))
+
+    def connection_checked_in(self, event) -> None:
+        self.in_use.dec(self._address(event))
@@ -0,0 +1,110 @@
+"""Moves old notifications out of the live collection.
+
+Read notifications expire through the `read_ttl` index. Unread ones never
+do, so a user who ignores them would keep them forever. NotificationArchiver
+copies every notification older than `archive_after_days` into
+`notifications_archive` and deletes it from `notifications`. The live
+collection, and with it the unread set that "mark all read" touches, is
+then bounded by the archive age.
+
+Archiving is idempotent and safe to run on every worker at once. Archive
+copies keep their _id, so a repeated copy is a duplicate key and is
+skipped. Unread documents are deleted per user with an `is_read: False`
+filter, and the unread counter goes down by exactly the number deleted.
+Racing archivers and a concurrent "mark read" can therefore never
+decrement it twice.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+
+from notifications import adjust_unread
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class NotificationArchiver:
+    def __init__(self, db, archive_after_days: float = 90, interval: float = 3600.0, batch_size: int = 1000):
+        self.db = db
+        self.archive_after_days = archive_after_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archived = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _copy(self, docs: List[dict]) -> None:
+        archived_at = datetime.now(timezone.utc).isoformat()
+        try:
+            await self.db.notifications_archive.insert_many(
+                [{**doc, "archived_at": archived_at} for doc in docs], ordered=False
+            )
+        except BulkWriteError as e:
+            if any(error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+
+    async def archive_batch(self, cutoff: str) -> int:
+        """Archive up to batch_size notifications created before `cutoff`; returns how many."""
+        docs = await self.db.notifications.find(
+            {"created_at": {"$lt": cutoff}}
+        ).sort([("created_at", ASCENDING)]).limit(self.batch_size).to_list(self.batch_size)
+        if not docs:
+            return 0
+        await self._copy(docs)
+
+        unread: Dict[str, List] = {}
+        for doc in docs:
+            if not doc.get("is_read"):
+                unread.setdefault(doc["user_id"], []).append(doc["_id"])
+        deltas = {}
+        for user_id, ids in unread.items():
+            result = await self.db.notifications.delete_many({"_id": {"$in": ids}, "is_read": False})
+            deltas[user_id] = -result.deleted_count
+        await adjust_unread(self.db, deltas)
+        # Whatever is left of the batch was read, possibly just now
+        await self.db.notifications.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        return len(docs)
+
+    async def run_once(self) -> int:
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.archive_after_days)).isoformat()
+        total = 0
+        while True:
+            archived = await self.archive_batch(cutoff)
+            total += archived
+            if archived < self.batch_size:
+                break
+        if total:
+            self.archived += total
+            logger.info(f"Archived {total} notifications older than {self.archive_after_days} days")
+        return total
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification archiving failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"archived": self.archived}
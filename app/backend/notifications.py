@@ -0,0 +1,163 @@
+"""Out-of-band, batched notification writes.
+
+Request handlers hand notification documents to the NotificationDispatcher
+and return without waiting for Mongo. A background task drains the
+in-process queue and writes whatever has accumulated with one insert_many.
+The queue is bounded: when it is full the caller writes its batch directly,
+which slows that request down instead of dropping notifications. stop()
+flushes everything still queued, so a graceful shutdown loses nothing.
+`on_written` is called with each batch once it is stored, so live pushes
+never announce a notification the API cannot find yet.
+
+Each user's unread count is kept in `notification_counters`, so reading it
+never counts documents. Written notifications increment it, and the read
+endpoints decrement it by the number of documents they actually flipped.
+Read notifications get a `read_at` date and are removed by a TTL index
+READ_RETENTION_SECONDS later.
+"""
+import asyncio
+import logging
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# Read notifications are deleted by the `read_ttl` index this long after being read
+READ_RETENTION_SECONDS = 30 * 24 * 3600
+
+
+def build_notification(user_id: str, title: str, message: str, notif_type: str = "info") -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "title": title,
+        "message": message,
+        "type": notif_type,
+        "is_read": False,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+def unread_deltas(docs: Iterable[dict]) -> Dict[str, int]:
+    return dict(Counter(doc["user_id"] for doc in docs if not doc.get("is_read")))
+
+
+async def adjust_unread(db, deltas: Dict[str, int]) -> None:
+    """Apply per-user changes to the unread counters."""
+    ops = [
+        UpdateOne({"user_id": user_id}, {"$inc": {"unread": delta}}, upsert=True)
+        for user_id, delta in deltas.items() if delta
+    ]
+    if not ops:
+        return
+    try:
+        await db.notification_counters.bulk_write(ops, ordered=False)
+    except Exception as e:
+        # rebuild_unread_counters() repairs any drift
+        logger.error(f"Failed to update unread counters for {len(ops)} users: {e}")
+
+
+async def unread_count(db, user_id: str) -> int:
+    counter = await db.notification_counters.find_one({"user_id": user_id}, {"_id": 0, "unread": 1})
+    return max(0, counter["unread"]) if counter else 0
+
+
+async def rebuild_unread_counters(db) -> int:
+    """Recount every user's unread notifications; returns the number of counters written."""
+    ops = []
+    async for row in db.notifications.aggregate([
+        {"$match": {"is_read": False}},
+        {"$group": {"_id": "$user_id", "unread": {"$sum": 1}}},
+    ]):
+        ops.append(UpdateOne({"user_id": row["_id"]}, {"$set": {"unread": row["unread"]}}, upsert=True))
+    # Users with nothing unread have no group above
+    await db.notification_counters.update_many({}, {"$set": {"unread": 0}})
+    if ops:
+        await db.notification_counters.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+class NotificationDispatcher:
+    def __init__(self, db, max_queue: int = 10000, batch_size: int = 500,
+                 on_written: Optional[Callable[[List[dict]], None]] = None):
+        self.db = db
+        self.batch_size = batch_size
+        self.on_written = on_written
+        self.written = 0
+        self.overflowed = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, docs: List[dict]) -> None:
+        """Queue `docs` for writing, or write them now if the queue is full."""
+        if self._task is None:
+            await self._write(docs)
+            return
+        for i, doc in enumerate(docs):
+            try:
+                self._queue.put_nowait(doc)
+            except asyncio.QueueFull:
+                self.overflowed += len(docs) - i
+                await self._write(docs[i:])
+                return
+
+    async def _write(self, docs: List[dict]) -> None:
+        if not docs:
+            return
+        try:
+            # insert_many adds _id to the dicts; copy so callers' docs stay clean
+            await self.db.notifications.insert_many([dict(doc) for doc in docs], ordered=False)
+            inserted = docs
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            inserted = [doc for i, doc in enumerate(docs) if i not in failed]
+            logger.error(f"Failed to write {len(failed)} of {len(docs)} notifications: {e}")
+        except Exception as e:
+            logger.error(f"Failed to write {len(docs)} notifications: {e}")
+            return
+        self.written += len(inserted)
+        await adjust_unread(self.db, unread_deltas(inserted))
+        if self.on_written is not None and inserted:
+            try:
+                self.on_written(inserted)
+            except Exception as e:
+                logger.error(f"Notification publish failed: {e}")
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            item = await self._queue.get()
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+            await self._write(batch)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Write everything still queued, then stop the background task."""
+        if self._task is not None:
+            task, self._task = self._task, None
+            await self._queue.put(_STOP)
+            await task
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "written": self.written, "overflowed": self.overflowed}
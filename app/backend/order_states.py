@@ -0,0 +1,219 @@
+"""Declarative order state machine.
+
+TRANSITIONS lists, for every target status, which roles may move an order
+there and from which statuses. A transition is applied with a single
+find_one_and_update whose filter pins the allowed current statuses and the
+caller's relationship to the order. Two racing writers therefore cannot
+both succeed, and an allowed change needs one round trip. The follow-up
+read that explains a refusal only happens on failure.
+
+Payments move orders to "paid" through mark_order_paid, not through here,
+but only from PAYABLE_STATUSES, the same statuses an admin may mark paid.
+
+An order can hold lines from several vendors, and no vendor decides for
+the others. A vendor's confirmation is recorded in `confirmed_vendor_ids`,
+and the order only becomes "confirmed" once every vendor on it has
+confirmed. Vendors may only cancel orders that contain nothing but their
+own lines; a multi-vendor order is cancelled by the client or an admin.
+
+"assigned" is not in TRANSITIONS: an order only becomes assigned together
+with the dispatcher it is assigned to, through the assignment route, which
+passes dispatcher_id in `changes`. ASSIGNMENT_SOURCES governs that move.
+"""
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from pymongo import ReturnDocument
+
+CLIENT, VENDOR, DISPATCHER, ADMIN = "client", "vendor", "dispatcher", "admin"
+
+# Statuses a successful payment may move to "paid"
+PAYABLE_STATUSES = {"pending", "confirmed"}
+
+# target status -> role -> statuses the order may be moved from
+TRANSITIONS: Dict[str, Dict[str, Set[str]]] = {
+    "confirmed": {
+        VENDOR: {"pending"},
+        ADMIN: {"pending"},
+    },
+    "paid": {
+        ADMIN: PAYABLE_STATUSES,
+    },
+    "picked_up": {
+        DISPATCHER: {"assigned"},
+        ADMIN: {"assigned"},
+    },
+    "in_transit": {
+        DISPATCHER: {"picked_up"},
+        ADMIN: {"assigned", "picked_up"},
+    },
+    "delivered": {
+        DISPATCHER: {"in_transit"},
+        ADMIN: {"picked_up", "in_transit"},
+    },
+    "cancelled": {
+        CLIENT: {"pending", "confirmed"},
+        VENDOR: {"pending", "confirmed"},
+        ADMIN: {"pending", "confirmed", "paid", "assigned", "picked_up", "in_transit"},
+    },
+}
+
+# role -> statuses an order may be assigned (or, for admins, reassigned) from
+ASSIGNMENT_SOURCES: Dict[str, Set[str]] = {
+    DISPATCHER: {"paid"},
+    ADMIN: {"paid", "assigned"},
+}
+
+ORDER_STATUSES = {"pending", "assigned"} | set(TRANSITIONS)
+
+# Statuses a vendor may only set on orders holding no other vendor's lines
+SOLE_VENDOR_STATUSES = {"cancelled"}
+
+
+class OrderNotFound(Exception):
+    pass
+
+
+class TransitionForbidden(Exception):
+    pass
+
+
+class TransitionConflict(Exception):
+    def __init__(self, message: str, current_status: Optional[str] = None):
+        super().__init__(message)
+        self.current_status = current_status
+
+
+def allowed_sources(new_status: str, role: str) -> Set[str]:
+    if new_status == "assigned":
+        return ASSIGNMENT_SOURCES.get(role, set())
+    return TRANSITIONS.get(new_status, {}).get(role, set())
+
+
+def ownership_filter(user: dict) -> dict:
+    """Restrict a transition to orders the user takes part in."""
+    if user["role"] == CLIENT:
+        return {"client_id": user["id"]}
+    if user["role"] == VENDOR:
+        return {"items.vendor_id": user["id"]}
+    if user["role"] == DISPATCHER:
+        return {"dispatcher_id": user["id"]}
+    return {}
+
+
+def vendor_ids(order: dict) -> Set[str]:
+    return {item["vendor_id"] for item in order.get("items", [])}
+
+
+def sole_vendor_filter(vendor_id: str) -> dict:
+    """Match orders with no line from a vendor other than `vendor_id`."""
+    return {"items": {"$not": {"$elemMatch": {"vendor_id": {"$ne": vendor_id}}}}}
+
+
+def _matches(order: dict, conditions: dict) -> bool:
+    for key, expected in conditions.items():
+        if key == "items.vendor_id":
+            if not any(item.get("vendor_id") == expected for item in order.get("items", [])):
+                return False
+        elif key == "items":
+            # sole_vendor_filter: checked separately to give a clearer refusal
+            continue
+        elif order.get(key) != expected:
+            return False
+    return True
+
+
+async def apply_transition(
+    db,
+    order_id: str,
+    new_status: str,
+    user: dict,
+    changes: Optional[dict] = None,
+    owner: Optional[dict] = None,
+    precondition: Optional[dict] = None,
+) -> Tuple[dict, dict]:
+    """Move an order to `new_status` if `user` may, returning (before, after).
+
+    `changes` are extra fields set with the status. `owner` replaces the
+    default ownership filter (e.g. an unassigned order for a dispatcher
+    claiming it). `precondition` adds conditions whose failure is a conflict
+    rather than a permission error.
+    """
+    if new_status == "assigned" and not (changes or {}).get("dispatcher_id"):
+        raise TransitionForbidden("Orders are assigned through the dispatcher assignment route")
+    sources = allowed_sources(new_status, user["role"])
+    if not sources:
+        raise TransitionForbidden(f"A {user['role']} cannot set an order to {new_status}")
+
+    owner = ownership_filter(user) if owner is None else owner
+    if user["role"] == VENDOR:
+        if new_status == "confirmed":
+            return await _confirm_as_vendor(db, order_id, user, sources, owner)
+        if new_status in SOLE_VENDOR_STATUSES:
+            owner = {**owner, **sole_vendor_filter(user["id"])}
+    precondition = precondition or {}
+    update = {
+        "status": new_status,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        **(changes or {}),
+    }
+    before = await db.orders.find_one_and_update(
+        {"id": order_id, "status": {"$in": sorted(sources)}, **owner, **precondition},
+        {"$set": update},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is not None:
+        return before, {**before, **update}
+    await _explain_refusal(db, order_id, new_status, user, sources, owner)
+
+
+async def _confirm_as_vendor(db, order_id: str, user: dict, sources: Set[str], owner: dict) -> Tuple[dict, dict]:
+    """Record one vendor's confirmation; the order moves once every vendor has confirmed.
+
+    Returns (before, after). When this call does not move the order, because
+    other vendors have yet to confirm or a concurrent confirmation moved it
+    first, before["status"] == after["status"].
+    """
+    recorded = await db.orders.find_one_and_update(
+        {"id": order_id, "status": {"$in": sorted(sources)}, **owner},
+        {"$addToSet": {"confirmed_vendor_ids": user["id"]}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if recorded is None:
+        await _explain_refusal(db, order_id, "confirmed", user, sources, owner)
+    if vendor_ids(recorded) - set(recorded["confirmed_vendor_ids"]):
+        return recorded, recorded
+
+    update = {"status": "confirmed", "updated_at": datetime.now(timezone.utc).isoformat()}
+    before = await db.orders.find_one_and_update(
+        {"id": order_id, "status": {"$in": sorted(sources)},
+         "confirmed_vendor_ids": {"$all": sorted(vendor_ids(recorded))}},
+        {"$set": update},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is not None:
+        return before, {**before, **update}
+    current = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    if current is not None and current["status"] == "confirmed" and user["id"] in current.get("confirmed_vendor_ids", []):
+        # Another vendor's confirmation completed the set and moved the order first
+        return current, current
+    raise TransitionConflict("Order was changed by someone else, please retry", current and current["status"])
+
+
+async def _explain_refusal(db, order_id: str, new_status: str, user: dict, sources: Set[str], owner: dict):
+    """Raise the error explaining why a conditional update matched nothing."""
+    current = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    if current is None:
+        raise OrderNotFound(order_id)
+    if not _matches(current, owner):
+        raise TransitionForbidden("Not authorized to update this order")
+    if "items" in owner and vendor_ids(current) - {user["id"]}:
+        raise TransitionForbidden("Orders with other vendors' items can only be cancelled by the client or an admin")
+    if current["status"] not in sources:
+        raise TransitionConflict(
+            f"Cannot change order from {current['status']} to {new_status}", current["status"]
+        )
+    raise TransitionConflict("Order was changed by someone else, please retry", current["status"])
@@ -0,0 +1,63 @@
+"""Opaque keyset (cursor) pagination for list endpoints.
+
+Lists are sorted newest first on (created_at, id). The cursor handed to the
+client encodes the sort key of the last item on a page, and the next page
+is fetched with a range filter on that key, so every page costs one index
+seek no matter how deep the client has scrolled. The cursor for the next
+page is returned in the X-Next-Cursor response header, which keeps list
+response bodies unchanged.
+"""
+import base64
+import json
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 200
+
+KEYSET_SORT = [("created_at", -1), ("id", -1)]
+
+
+def encode_cursor(doc: dict) -> str:
+    raw = json.dumps([doc["created_at"], doc["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return str(created_at), str(doc_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_cursor(query: dict, cursor: Optional[str], newer: bool = False) -> dict:
+    """Restrict `query` to documents strictly after `cursor` in KEYSET_SORT order.
+
+    With `newer`, restrict to documents strictly before it instead, i.e. ones
+    created since the cursor was issued.
+    """
+    if not cursor:
+        return query
+    created_at, doc_id = decode_cursor(cursor)
+    op = "$gt" if newer else "$lt"
+    after = {"$or": [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "id": {op: doc_id}},
+    ]}
+    if not query:
+        return after
+    return {"$and": [query, after]}
+
+
+async def fetch_page(collection, query: dict, projection: dict, limit: int,
+                     cursor: Optional[str], response: Response) -> List[dict]:
+    """Fetch one page of `collection`, setting the next cursor header if more remain."""
+    docs = await collection.find(apply_cursor(query, cursor), projection) \
+        .sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1])
+    return docs
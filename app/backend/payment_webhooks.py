@@ -0,0 +1,134 @@
+"""Durable inbox for Paystack webhook events.
+
+The webhook endpoint only checks the signature and records the event in
+the `payment_events` collection, keyed on a unique event id, so redelivered
+events are acknowledged without being applied twice. A background worker
+drains the inbox and hands each event to the application's handler. Events
+are claimed atomically, so several workers can share one inbox, and events
+whose worker died mid-processing, or whose handler raised, are retried
+after `claim_timeout` seconds, up to `max_attempts` times.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, Callable, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """Check Paystack's x-paystack-signature header (HMAC-SHA512 of the raw body)."""
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def event_id(event: dict) -> str:
+    data = event.get("data") or {}
+    return f"{event.get('event')}:{data.get('id') or data.get('reference')}"
+
+
+class PaymentEventInbox:
+    def __init__(
+        self,
+        db,
+        handler: Callable[[dict], Awaitable[None]],
+        poll_interval: float = 5.0,
+        claim_timeout: float = 60.0,
+        max_attempts: int = 5,
+    ):
+        self.db = db
+        self.handler = handler
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self.max_attempts = max_attempts
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def record(self, event: dict) -> bool:
+        """Store a verified event; returns False if it was already received."""
+        try:
+            await self.db.payment_events.insert_one({
+                "event_id": event_id(event),
+                "event": event,
+                "status": "pending",
+                "attempts": 0,
+                "received_at": datetime.now(timezone.utc).isoformat(),
+                "claimed_at": None,
+            })
+        except DuplicateKeyError:
+            return False
+        self._wakeup.set()
+        return True
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        stale = (now - timedelta(seconds=self.claim_timeout)).isoformat()
+        return await self.db.payment_events.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "pending"},
+                    {"status": "processing", "claimed_at": {"$lt": stale}},
+                ],
+                "attempts": {"$lt": self.max_attempts},
+            },
+            {"$set": {"status": "processing", "claimed_at": now.isoformat()}, "$inc": {"attempts": 1}},
+            sort=[("received_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def drain(self) -> int:
+        """Process every claimable event, returning how many were handled."""
+        handled = 0
+        while True:
+            doc = await self._claim()
+            if doc is None:
+                return handled
+            try:
+                await self.handler(doc["event"])
+            except Exception as e:
+                logger.error(f"Payment event {doc['event_id']} failed (attempt {doc['attempts']}): {e}")
+                # Left in "processing" the event is retried once its claim times out
+                update = {"error": str(e)}
+                if doc["attempts"] >= self.max_attempts:
+                    update["status"] = "failed"
+                await self.db.payment_events.update_one({"_id": doc["_id"]}, {"$set": update})
+                continue
+            await self.db.payment_events.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {"status": "processed", "processed_at": datetime.now(timezone.utc).isoformat()}}
+            )
+            handled += 1
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Payment event inbox error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
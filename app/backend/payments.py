@@ -0,0 +1,163 @@
+"""Payment gateway client.
+
+The API talks to Paystack through a single application-lifetime
+PaystackGateway that reuses pooled keep-alive connections, applies explicit
+timeouts, retries idempotent verify calls with jittered exponential
+backoff, and stops calling the gateway for a while once it keeps failing
+(circuit breaker).
+
+Anything implementing PaymentGateway can be swapped in. Pointing
+PAYSTACK_BASE_URL at benchmarks/fake_paystack.py runs the real client
+against a local stand-in for tests and load benchmarks.
+"""
+import asyncio
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+PAYSTACK_BASE_URL = "https://api.paystack.co"
+
+
+class PaymentGatewayError(Exception):
+    pass
+
+
+class PaymentGatewayUnavailable(PaymentGatewayError):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures for `reset_timeout` seconds.
+
+    Once the timeout passes a single trial call is let through (half-open);
+    its outcome closes or re-opens the circuit. Callers record one outcome
+    per logical call, not per retry. before_call() returns True for the call
+    that took the trial slot, and only that call may release() it, however
+    it ends; a call started before the circuit opened cannot free it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raise if the call may not go ahead; returns True if it is the half-open trial."""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            raise PaymentGatewayUnavailable("Payment gateway temporarily unavailable")
+        if state == "half_open":
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """Free the trial slot; only for the call before_call() returned True to."""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            logger.warning(f"Payment gateway circuit opened after {self.failures} failures")
+
+
+class PaymentGateway(ABC):
+    @abstractmethod
+    async def initialize(self, email: str, amount: int, reference: str, metadata: dict) -> dict:
+        ...
+
+    @abstractmethod
+    async def verify(self, reference: str) -> dict:
+        ...
+
+    async def aclose(self) -> None:
+        pass
+
+
+class PaystackGateway(PaymentGateway):
+    def __init__(
+        self,
+        secret_key: str,
+        base_url: str = PAYSTACK_BASE_URL,
+        timeout: float = 10.0,
+        connect_timeout: float = 3.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.2,
+        max_connections: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.breaker = breaker or CircuitBreaker()
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {secret_key}"},
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def _request(self, method: str, path: str, idempotent: bool, **kwargs) -> dict:
+        trial = self.breaker.before_call()
+        try:
+            result = await self._attempt(method, path, idempotent, **kwargs)
+        except PaymentGatewayError:
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+            return result
+        finally:
+            # Whatever the outcome, including cancellation, the trial slot is this call's to free
+            if trial:
+                self.breaker.release()
+
+    async def _attempt(self, method: str, path: str, idempotent: bool, **kwargs) -> dict:
+        attempt = 0
+        while True:
+            try:
+                response = await self._client.request(method, path, **kwargs)
+                if response.status_code >= 500 or response.status_code == 429:
+                    raise PaymentGatewayError(f"Gateway returned {response.status_code}")
+                return response.json()
+            except (httpx.HTTPError, PaymentGatewayError, ValueError) as e:
+                # A non-idempotent call may only be retried if it never reached the gateway
+                retryable = idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if not retryable or attempt >= self.max_retries:
+                    raise PaymentGatewayError(f"{method} {path} failed: {e}") from e
+                attempt += 1
+                delay = random.uniform(0, self.backoff_base * 2 ** attempt)
+                logger.warning(f"{method} {path} failed ({e}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def initialize(self, email: str, amount: int, reference: str, metadata: dict) -> dict:
+        return await self._request(
+            "POST", "/transaction/initialize", idempotent=False,
+            json={"email": email, "amount": amount, "reference": reference, "metadata": metadata},
+        )
+
+    async def verify(self, reference: str) -> dict:
+        return await self._request("GET", f"/transaction/verify/{reference}", idempotent=True)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
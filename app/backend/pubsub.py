@@ -0,0 +1,135 @@
+"""In-process pub/sub hub for pushing notifications to connected clients.
+
+NotificationHub keeps one bounded queue per open stream and delivers each
+published notification to the queues of its recipient. The hub only knows
+about clients connected to this process. How publications travel between
+processes is up to the backend:
+
+- InProcessBackend delivers straight to local subscribers (single worker).
+- ChangeStreamBackend ignores local publishes and instead tails inserts
+  into the notifications collection with a Mongo change stream, so every
+  worker sees every notification (requires a replica set).
+
+A subscriber that falls too far behind is dropped; its stream ends and the
+client reconnects with its last event id to catch up from the database.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, user_id: str, maxsize: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.closed = False
+
+
+class InProcessBackend:
+    def __init__(self):
+        self._deliver: Optional[Callable[[dict], None]] = None
+
+    async def start(self, deliver: Callable[[dict], None]) -> None:
+        self._deliver = deliver
+
+    def publish(self, notification: dict) -> None:
+        if self._deliver is not None:
+            self._deliver(notification)
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+
+class ChangeStreamBackend:
+    def __init__(self, db):
+        self.db = db
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[dict], None]) -> None:
+        self._task = asyncio.create_task(self._watch(deliver))
+
+    def publish(self, notification: dict) -> None:
+        # The insert into the notifications collection is the publication
+        pass
+
+    async def _watch(self, deliver: Callable[[dict], None]) -> None:
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with self.db.notifications.watch(pipeline) as stream:
+                    async for change in stream:
+                        doc = dict(change["fullDocument"])
+                        doc.pop("_id", None)
+                        deliver(doc)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification change stream failed, retrying: {e}")
+                await asyncio.sleep(5)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class NotificationHub:
+    def __init__(self, backend=None, queue_size: int = 100):
+        self.backend = backend or InProcessBackend()
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+
+    async def start(self) -> None:
+        await self.backend.start(self._deliver)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+        for subscriptions in list(self._subscribers.values()):
+            for subscription in list(subscriptions):
+                self._close(subscription)
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+
+    def publish(self, notification: dict) -> None:
+        self.backend.publish(notification)
+
+    def _deliver(self, notification: dict) -> None:
+        for subscription in list(self._subscribers.get(notification["user_id"], ())):
+            try:
+                subscription.queue.put_nowait(notification)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._close(subscription)
+
+    def _close(self, subscription: Subscription) -> None:
+        subscription.closed = True
+        self.unsubscribe(subscription)
+        # Wake the stream so it notices it was closed
+        while True:
+            try:
+                subscription.queue.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                subscription.queue.get_nowait()
+
+    @property
+    def connections(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
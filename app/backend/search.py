@@ -0,0 +1,68 @@
+"""Ranked full-text search over the spare parts catalog.
+
+Searches are served by the weighted `parts_text` index declared in
+indexes.py. A search that exactly matches a SKU short-circuits to that
+part. User input never reaches Mongo as a regex: $text parses it as plain
+terms, and the fallback used when the text index is unavailable escapes it
+and anchors it to the start of the field.
+"""
+import logging
+import re
+from typing import List, Optional
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+MAX_SEARCH_LENGTH = 100
+
+# Relative weights for the parts_text index
+TEXT_WEIGHTS = {
+    "sku": 10,
+    "name": 8,
+    "brand": 5,
+    "vehicle_compatibility": 3,
+    "description": 1,
+}
+
+
+def normalize_search(search: str) -> str:
+    """Collapse whitespace and cap the length of a search string."""
+    return " ".join(search.split())[:MAX_SEARCH_LENGTH]
+
+
+def regex_fallback_query(search: str) -> dict:
+    """Escaped, prefix-anchored regex clauses used when $text is unavailable."""
+    pattern = "^" + re.escape(search)
+    return {"$or": [
+        {"name": {"$regex": pattern, "$options": "i"}},
+        {"brand": {"$regex": pattern, "$options": "i"}},
+        {"sku": {"$regex": pattern, "$options": "i"}},
+    ]}
+
+
+async def search_parts(db, query: dict, search: str, limit: int = 100,
+                       projection: Optional[dict] = None) -> List[dict]:
+    """Return parts matching `search` and the base `query`, best match first."""
+    projection = projection or {"_id": 0}
+    search = normalize_search(search)
+    if not search:
+        return await db.spare_parts.find(query, projection).to_list(limit)
+
+    # Exact SKU lookups skip ranking entirely
+    sku_matches = await db.spare_parts.find(
+        {**query, "sku": {"$in": list({search, search.upper()})}}, projection
+    ).to_list(limit)
+    if sku_matches:
+        return sku_matches
+
+    try:
+        return await db.spare_parts.find(
+            {**query, "$text": {"$search": search}},
+            {**projection, "score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})]).to_list(limit)
+    except OperationFailure as e:
+        logger.warning(f"Text search unavailable, falling back to prefix match: {e}")
+        return await db.spare_parts.find(
+            {**query, **regex_fallback_query(search)}, projection
+        ).to_list(limit)
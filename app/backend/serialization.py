@@ -0,0 +1,29 @@
+"""Single-pass validation and orjson encoding for list responses.
+
+Building a response model per document and then letting FastAPI validate
+the list again against response_model doubles the work on every list
+endpoint. Handlers instead fetch only the response fields from Mongo,
+validate the raw documents once with a TypeAdapter and return an
+ORJSONResponse, which FastAPI passes through untouched.
+"""
+from typing import Dict, List, Optional, Type
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+
+def response_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """Mongo projection returning exactly the fields of `model`."""
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+
+def render_list(adapter: TypeAdapter, docs: List[dict]) -> bytes:
+    return orjson.dumps(adapter.dump_python(adapter.validate_python(docs)))
+
+
+def list_response(adapter: TypeAdapter, docs: List[dict], response: Optional[Response] = None) -> ORJSONResponse:
+    """Validate `docs` once and encode them, keeping headers set on `response`."""
+    headers = dict(response.headers) if response is not None else None
+    return ORJSONResponse(adapter.dump_python(adapter.validate_python(docs)), headers=headers)
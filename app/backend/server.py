@@ -1,23 +1,54 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import hmac
+import json
+import asyncio
+import tempfile
+import time
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, Field, EmailStr, TypeAdapter
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-import httpx
+from indexes import ensure_indexes, audit_query_plans
+from search import search_parts
+from pagination import fetch_page, apply_cursor, encode_cursor, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from inventory import InsufficientStock, StockHoldSweeper, merge_lines, reserve_stock, release_stock, clear_holds
+from user_cache import UserCache, UserCacheInvalidator
+from password_hasher import PasswordHasher, PasswordHasherBusy
+from payments import PaystackGateway, PaymentGatewayError, PaymentGatewayUnavailable, PAYSTACK_BASE_URL
+from payment_webhooks import PaymentEventInbox, verify_signature
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from stats import StatsCounters, status_change_deltas
+from notifications import NotificationDispatcher, adjust_unread, build_notification, unread_count
+from notification_retention import NotificationArchiver
+from pubsub import NotificationHub, InProcessBackend, ChangeStreamBackend
+from locations import LocationStore
+from geo import geojson_point
+from facets import CatalogFacets
+from catalog_cache import CatalogVersion, ResponseCache, etag_matches, make_etag, normalize_query
+from serialization import list_response, render_list, response_projection
+from catalog_import import CatalogImporter
+from exports import created_between, export_response
+from vendor_orders import build_vendor_orders, sync_vendor_orders, vendor_view
+from job_board import JobBoard, MAX_LEASE_SECONDS, lease_deadline
+from order_states import ORDER_STATUSES, PAYABLE_STATUSES, OrderNotFound, TransitionConflict, TransitionForbidden, apply_transition
+from metrics import MetricsRegistry, MetricsSnapshotter, MongoCommandMetrics, MongoPoolMetrics, RequestMetrics
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Configure logging FIRST
+# Configure logging once, at import
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -29,39 +60,74 @@ logger = logging.getLogger(__name__)
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 db_name = os.environ.get('DB_NAME', 'spareparts_hub')
 
-# Initialize MongoDB client with connection pooling
-client = AsyncIOMotorClient(
-    mongo_url,
-    serverSelectionTimeoutMS=5000,
-    connectTimeoutMS=5000,
-    socketTimeoutMS=5000,
-    maxPoolSize=50,
-    minPoolSize=10
-)
-db = client[db_name]
-logger.info(f"MongoDB client initialized. URL: {mongo_url}, Database: {db_name}")
+# Worker processes split the Mongo connection budget; WEB_CONCURRENCY is set by gunicorn.conf.py.
+# The total across workers is at most MONGO_MAX_CONNECTIONS (at least one connection per worker).
+WEB_CONCURRENCY = max(1, int(os.environ.get('WEB_CONCURRENCY', '1')))
+MONGO_MAX_CONNECTIONS = int(os.environ.get('MONGO_MAX_CONNECTIONS', '50'))
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', str(max(1, MONGO_MAX_CONNECTIONS // WEB_CONCURRENCY))))
+# "mongo" fans notifications and user cache evictions out to every worker over a change stream
+NOTIFICATION_PUBSUB = os.environ.get('NOTIFICATION_PUBSUB', 'local')
+MONGO_MIN_POOL_SIZE = min(10, MONGO_MAX_POOL_SIZE)
+
+# Prometheus metrics; the Mongo listeners must be attached when the client is created.
+# Each worker keeps its own; with METRICS_DIR set, /api/metrics merges all workers.
+metrics_registry = MetricsRegistry(snapshot_dir=os.environ.get('METRICS_DIR') or None)
+mongo_command_metrics = MongoCommandMetrics(metrics_registry, slow_ms=float(os.environ.get('MONGO_SLOW_QUERY_MS', '100')))
+mongo_pool_metrics = MongoPoolMetrics(metrics_registry, max_pool_size=MONGO_MAX_POOL_SIZE)
+# Scrapers authenticate with this bearer token; without it only admins can read /api/metrics
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
 
 # JWT Configuration
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
+# EventSource can only authenticate in the query string, where URLs get logged; streams
+# take a short-lived token that is good for nothing else
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.environ.get('STREAM_TOKEN_EXPIRE_SECONDS', '300'))
+STREAM_SCOPE = "stream"
 
 # Paystack Configuration
 PAYSTACK_SECRET_KEY = os.environ.get('PAYSTACK_SECRET_KEY', '')
 PAYSTACK_PUBLIC_KEY = os.environ.get('PAYSTACK_PUBLIC_KEY', '')
 
+SSE_HEARTBEAT_SECONDS = 15
+# Streams end after this long so workers can drain; EventSource reconnects and resumes
+SSE_MAX_STREAM_SECONDS = float(os.environ.get('SSE_MAX_STREAM_SECONDS', '60'))
+
+CATALOG_CACHE_CONTROL = f"public, max-age={os.environ.get('CATALOG_MAX_AGE_SECONDS', '15')}"
+
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Raising BCRYPT_ROUNDS transparently rehashes existing passwords on next login
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 security = HTTPBearer()
 
-app = FastAPI(title="SpareParts Hub API")
 api_router = APIRouter(prefix="/api")
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-# Initialize logger before MongoDB connection
+# ============= PER-PROCESS RESOURCES =============
+# Clients, caches, thread pools and background tasks are created by
+# init_resources() inside the lifespan handler, so they are never shared
+# across a fork; importing this module opens no sockets or threads.
+
+client: Optional[AsyncIOMotorClient] = None
+db = None
+payment_gateway: Optional[PaystackGateway] = None
+user_cache: Optional[UserCache] = None
+user_cache_invalidator: Optional[UserCacheInvalidator] = None
+metrics_snapshotter: Optional[MetricsSnapshotter] = None
+stats_counters: Optional[StatsCounters] = None
+notification_dispatcher: Optional[NotificationDispatcher] = None
+notification_hub: Optional[NotificationHub] = None
+notification_archiver: Optional[NotificationArchiver] = None
+stock_hold_sweeper: Optional[StockHoldSweeper] = None
+location_store: Optional[LocationStore] = None
+catalog_facets: Optional[CatalogFacets] = None
+catalog_version: Optional[CatalogVersion] = None
+catalog_responses: Optional[ResponseCache] = None
+password_hasher: Optional[PasswordHasher] = None
+payment_inbox: Optional[PaymentEventInbox] = None
+catalog_importer: Optional[CatalogImporter] = None
+job_board: Optional[JobBoard] = None
 
 # ============= MODELS =============
 
@@ -133,9 +199,10 @@ class SparePartResponse(SparePartBase):
     created_at: str
     is_available: bool = True
 
+
 class CartItem(BaseModel):
     part_id: str
-    quantity: int
+    quantity: int = Field(..., gt=0)
 
 class OrderStatus:
     PENDING = "pending"
@@ -148,7 +215,7 @@ class OrderStatus:
     CANCELLED = "cancelled"
 
 class OrderCreate(BaseModel):
-    items: List[CartItem]
+    items: List[CartItem] = Field(..., min_length=1)
     delivery_address: str
     delivery_phone: str
     notes: Optional[str] = None
@@ -165,14 +232,21 @@ class OrderResponse(BaseModel):
     notes: Optional[str] = None
     dispatcher_id: Optional[str] = None
     dispatcher_name: Optional[str] = None
+    lease_expires_at: Optional[str] = None
     created_at: str
     updated_at: str
     payment_reference: Optional[str] = None
     payment_status: str = "pending"
 
+# Single-pass validators and Mongo projections for list endpoints
+SPARE_PART_LIST = TypeAdapter(List[SparePartResponse])
+SPARE_PART_FIELDS = response_projection(SparePartResponse)
+ORDER_LIST = TypeAdapter(List[OrderResponse])
+ORDER_FIELDS = response_projection(OrderResponse)
+
 class LocationUpdate(BaseModel):
-    latitude: float
-    longitude: float
+    latitude: float = Field(..., ge=-90, le=90, allow_inf_nan=False)
+    longitude: float = Field(..., ge=-180, le=180, allow_inf_nan=False)
 
 class NotificationCreate(BaseModel):
     user_id: str
@@ -189,6 +263,11 @@ class NotificationResponse(BaseModel):
     is_read: bool = False
     created_at: str
 
+NOTIFICATION_LIST = TypeAdapter(List[NotificationResponse])
+NOTIFICATION_FIELDS = response_projection(NotificationResponse)
+USER_LIST = TypeAdapter(List[UserResponse])
+USER_FIELDS = response_projection(UserResponse)
+
 class PaymentInitialize(BaseModel):
     order_id: str
     email: str
@@ -196,11 +275,18 @@ class PaymentInitialize(BaseModel):
 
 # ============= AUTH HELPERS =============
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> tuple:
+    """Return (is_valid, new_hash); new_hash is set when the stored hash should be upgraded."""
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server is busy. Please try again.", headers={"Retry-After": "1"})
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def get_password_hash(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server is busy. Please try again.", headers={"Retry-After": "1"})
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -208,20 +294,40 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+async def load_user(user_id: str) -> Optional[dict]:
+    return await db.users.find_one({"id": user_id}, {"_id": 0})
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await get_user_from_token(credentials.credentials)
+
+async def get_user_from_token(token: str, scope: Optional[str] = None) -> dict:
+    """Resolve a JWT to its user; `scope` must match the token's ("stream" or none)."""
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("scope") != scope:
             raise HTTPException(status_code=401, detail="Invalid token")
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        user = await user_cache.get(user_id, load_user)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         return user
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_stream_user(request: Request, token: Optional[str]) -> dict:
+    """Authenticate a streaming request from its Authorization header or `token`.
+
+    EventSource cannot send an Authorization header, so streams also accept
+    a stream token from POST /auth/stream-token as a query parameter. The
+    access token itself is never accepted there.
+    """
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        return await get_user_from_token(auth[7:])
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return await get_user_from_token(token, scope=STREAM_SCOPE)
+
 def require_roles(allowed_roles: List[str]):
     async def role_checker(current_user: dict = Depends(get_current_user)):
         if current_user["role"] not in allowed_roles:
@@ -273,7 +379,7 @@ async def register(user_data: UserCreate):
             "role": user_data.role,
             "business_name": user_data.business_name.strip() if user_data.business_name else None,
             "address": user_data.address.strip() if user_data.address else None,
-            "password_hash": get_password_hash(user_data.password),
+            "password_hash": await get_password_hash(user_data.password),
             "is_active": True,
             "created_at": datetime.now(timezone.utc).isoformat(),
         }
@@ -283,6 +389,7 @@ async def register(user_data: UserCreate):
         except Exception as e:
             logger.error(f"Database error inserting user: {e}")
             raise HTTPException(status_code=500, detail="Failed to create user. Please try again.")
+        await stats_counters.increment({"total_users": 1, f"users_by_role.{user_doc['role']}": 1})
         
         access_token = create_access_token(data={"sub": user_id})
         user_response = UserResponse(
@@ -311,8 +418,12 @@ async def login(credentials: UserLogin):
         raise HTTPException(status_code=403, detail="Account is deactivated. Please contact support.")
     
     # Verify password
-    if not verify_password(credentials.password, user["password_hash"]):
+    is_valid, new_hash = await verify_password(credentials.password, user["password_hash"])
+    if not is_valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        await db.users.update_one({"id": user["id"]}, {"$set": {"password_hash": new_hash}})
+        user_cache.invalidate(user["id"])
     
     access_token = create_access_token(data={"sub": user["id"]})
     user_response = UserResponse(
@@ -330,45 +441,85 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         address=current_user.get("address"), created_at=current_user["created_at"], is_active=current_user.get("is_active", True)
     )
 
+@api_router.post("/auth/stream-token")
+async def create_stream_token(current_user: dict = Depends(get_current_user)):
+    """A token for the `token` query parameter of event streams; expires in minutes."""
+    token = create_access_token(
+        data={"sub": current_user["id"], "scope": STREAM_SCOPE},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+    return {"token": token, "expires_in": STREAM_TOKEN_EXPIRE_SECONDS}
+
 # ============= SPARE PARTS ROUTES =============
 
+async def serve_catalog(request: Request, render) -> Response:
+    """Serve a catalog read with ETag revalidation and the in-process response cache.
+
+    `render` returns the JSON body and any extra headers; it only runs when
+    neither the client nor the cache holds the current version.
+    """
+    version = catalog_version.value
+    key = normalize_query(request.url.path, request.query_params)
+    headers = {"ETag": make_etag(version, key), "Cache-Control": CATALOG_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    cached = catalog_responses.get(key, version)
+    if cached is None:
+        body, extra_headers = await render()
+        catalog_responses.put(key, version, body, extra_headers)
+    else:
+        body, extra_headers = cached
+    return Response(content=body, media_type="application/json", headers={**headers, **extra_headers})
+
 @api_router.get("/parts", response_model=List[SparePartResponse])
 async def get_parts(
+    request: Request,
     category: Optional[str] = None,
     search: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     vendor_id: Optional[str] = None,
-    available_only: bool = True
+    available_only: bool = True,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)
 ):
-    query = {}
-    if category:
-        query["category"] = category
-    if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}},
-            {"sku": {"$regex": search, "$options": "i"}},
-        ]
-    if min_price is not None:
-        query["price"] = {"$gte": min_price}
-    if max_price is not None:
-        query.setdefault("price", {})["$lte"] = max_price
-    if vendor_id:
-        query["vendor_id"] = vendor_id
-    if available_only:
-        query["is_available"] = True
-        query["quantity"] = {"$gt": 0}
+    async def render():
+        query = {}
+        if category:
+            query["category"] = category
+        if min_price is not None:
+            query["price"] = {"$gte": min_price}
+        if max_price is not None:
+            query.setdefault("price", {})["$lte"] = max_price
+        if vendor_id:
+            query["vendor_id"] = vendor_id
+        if available_only:
+            query["is_available"] = True
+            query["quantity"] = {"$gt": 0}
+        
+        page = Response()
+        if search:
+            # Ranked results are not keyset-paginated; limit caps the result set
+            parts = await search_parts(db, query, search, limit=limit, projection=SPARE_PART_FIELDS)
+        else:
+            parts = await fetch_page(db.spare_parts, query, SPARE_PART_FIELDS, limit, cursor, page)
+        extra_headers = {}
+        if NEXT_CURSOR_HEADER in page.headers:
+            extra_headers[NEXT_CURSOR_HEADER] = page.headers[NEXT_CURSOR_HEADER]
+        return render_list(SPARE_PART_LIST, parts), extra_headers
     
-    parts = await db.spare_parts.find(query, {"_id": 0}).to_list(100)
-    return [SparePartResponse(**part) for part in parts]
+    return await serve_catalog(request, render)
 
 @api_router.get("/parts/{part_id}", response_model=SparePartResponse)
-async def get_part(part_id: str):
-    part = await db.spare_parts.find_one({"id": part_id}, {"_id": 0})
-    if not part:
-        raise HTTPException(status_code=404, detail="Part not found")
-    return SparePartResponse(**part)
+async def get_part(part_id: str, request: Request):
+    async def render():
+        part = await db.spare_parts.find_one({"id": part_id}, SPARE_PART_FIELDS)
+        if not part:
+            raise HTTPException(status_code=404, detail="Part not found")
+        return SparePartResponse(**part).model_dump_json().encode(), {}
+    
+    return await serve_catalog(request, render)
 
 @api_router.post("/parts", response_model=SparePartResponse)
 async def create_part(
@@ -384,7 +535,13 @@ async def create_part(
         "created_at": datetime.now(timezone.utc).isoformat(),
         **part_data.model_dump()
     }
-    await db.spare_parts.insert_one(part_doc)
+    try:
+        await db.spare_parts.insert_one(part_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail=f"You already have a part with SKU {part_data.sku}")
+    await stats_counters.increment({"total_parts": 1})
+    catalog_facets.apply(None, part_doc)
+    await catalog_version.bump()
     return SparePartResponse(**part_doc)
 
 @api_router.put("/parts/{part_id}", response_model=SparePartResponse)
@@ -403,7 +560,10 @@ async def update_part(
     update_data = {k: v for k, v in part_data.model_dump().items() if v is not None}
     if update_data:
         await db.spare_parts.update_one({"id": part_id}, {"$set": update_data})
+        before = dict(part)
         part.update(update_data)
+        catalog_facets.apply(before, part)
+        await catalog_version.bump()
     
     return SparePartResponse(**part)
 
@@ -419,13 +579,72 @@ async def delete_part(
     if current_user["role"] != UserRole.ADMIN and part["vendor_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="Not authorized to delete this part")
     
-    await db.spare_parts.delete_one({"id": part_id})
+    result = await db.spare_parts.delete_one({"id": part_id})
+    await stats_counters.increment({"total_parts": -result.deleted_count})
+    if result.deleted_count:
+        catalog_facets.apply(part, None)
+        await catalog_version.bump()
     return {"message": "Part deleted successfully"}
 
+async def finish_catalog_import(totals: dict) -> None:
+    await stats_counters.increment({"total_parts": totals["inserted"]})
+    await catalog_version.bump()
+    await catalog_facets.rebuild()
+
+IMPORT_MAX_BYTES = int(os.environ.get('IMPORT_MAX_BYTES', str(50 * 1024 * 1024)))
+
+@api_router.post("/parts/import", status_code=202)
+async def import_parts(
+    request: Request,
+    file_format: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+    current_user: dict = Depends(require_roles([UserRole.VENDOR, UserRole.ADMIN]))
+):
+    fmt = file_format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+
+    # Spool the upload to disk as it arrives; the job reads it back row by row.
+    # Disk writes run in a thread so a slow disk never stalls the event loop.
+    size = 0
+    spool = await asyncio.to_thread(
+        tempfile.NamedTemporaryFile, prefix="parts-import-", suffix=f".{fmt}", delete=False
+    )
+    try:
+        try:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > IMPORT_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail="Import file too large")
+                await asyncio.to_thread(spool.write, chunk)
+        finally:
+            await asyncio.to_thread(spool.close)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Import file is empty")
+        job = await catalog_importer.create_job(current_user, fmt)
+    except BaseException:
+        await asyncio.to_thread(os.unlink, spool.name)
+        raise
+
+    catalog_importer.start(job, current_user, spool.name)
+    return {"job_id": job["id"], "status": job["status"]}
+
+@api_router.get("/parts/import/{job_id}")
+async def get_import_job(
+    job_id: str,
+    current_user: dict = Depends(require_roles([UserRole.VENDOR, UserRole.ADMIN]))
+):
+    job = await db.import_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+
+    if current_user["role"] != UserRole.ADMIN and job["vendor_id"] != current_user["id"]:
+        raise HTTPException(status_code=403, detail="Not authorized to view this import")
+
+    return job
+
 @api_router.get("/categories")
 async def get_categories():
-    categories = await db.spare_parts.distinct("category")
-    return {"categories": categories}
+    if catalog_facets.rebuilt_at is None:
+        await catalog_facets.rebuild()
+    return catalog_facets.snapshot()
 
 # ============= ORDER ROUTES =============
 
@@ -435,16 +654,21 @@ async def create_order(
     current_user: dict = Depends(get_current_user)
 ):
     order_id = str(uuid.uuid4())
-    items_with_details = []
-    total_amount = 0
+    quantities = merge_lines([(item.part_id, item.quantity) for item in order_data.items])
     
-    for item in order_data.items:
-        part = await db.spare_parts.find_one({"id": item.part_id}, {"_id": 0})
+    parts = await db.spare_parts.find({"id": {"$in": list(quantities)}}, {"_id": 0}).to_list(len(quantities))
+    parts_by_id = {part["id"]: part for part in parts}
+    for part_id, quantity in quantities.items():
+        part = parts_by_id.get(part_id)
         if not part:
-            raise HTTPException(status_code=400, detail=f"Part {item.part_id} not found")
-        if part["quantity"] < item.quantity:
+            raise HTTPException(status_code=400, detail=f"Part {part_id} not found")
+        if part["quantity"] < quantity:
             raise HTTPException(status_code=400, detail=f"Insufficient stock for {part['name']}")
-        
+    
+    items_with_details = []
+    total_amount = 0
+    for item in order_data.items:
+        part = parts_by_id[item.part_id]
         item_total = part["price"] * item.quantity
         total_amount += item_total
         items_with_details.append({
@@ -457,11 +681,12 @@ async def create_order(
             "vendor_id": part["vendor_id"],
             "vendor_name": part["vendor_name"],
         })
-        
-        await db.spare_parts.update_one(
-            {"id": item.part_id},
-            {"$inc": {"quantity": -item.quantity}}
-        )
+    
+    try:
+        await reserve_stock(db, order_id, quantities)
+    except InsufficientStock as e:
+        names = ", ".join(parts_by_id[part_id]["name"] for part_id in e.part_ids)
+        raise HTTPException(status_code=400, detail=f"Insufficient stock for {names}")
     
     now = datetime.now(timezone.utc).isoformat()
     order_doc = {
@@ -482,67 +707,106 @@ async def create_order(
         "payment_reference": None,
         "payment_status": "pending",
     }
-    await db.orders.insert_one(order_doc)
+    try:
+        await db.orders.insert_one(order_doc)
+        await db.vendor_orders.insert_many(build_vendor_orders(order_doc))
+    except Exception as e:
+        logger.error(f"Failed to insert order {order_id}, releasing stock: {e}")
+        await release_stock(db, order_id, quantities)
+        await db.orders.delete_one({"id": order_id})
+        await db.vendor_orders.delete_many({"id": order_id})
+        raise HTTPException(status_code=500, detail="Failed to place order. Please try again.")
+    await clear_holds(db, order_id)
+    for part_id, quantity in quantities.items():
+        part = parts_by_id[part_id]
+        catalog_facets.apply(part, {**part, "quantity": part["quantity"] - quantity})
+    await catalog_version.bump()
+    await stats_counters.increment({"total_orders": 1, "pending_orders": 1})
     
     # Create notification for vendors
     vendor_ids = list(set(item["vendor_id"] for item in items_with_details))
-    for vendor_id in vendor_ids:
-        await create_notification_internal(
-            vendor_id, "New Order", 
-            f"You have a new order #{order_id[:8]} from {current_user['full_name']}", 
+    await create_notifications_internal([
+        build_notification(
+            vendor_id, "New Order",
+            f"You have a new order #{order_id[:8]} from {current_user['full_name']}",
             "order"
         )
+        for vendor_id in vendor_ids
+    ])
     
     return OrderResponse(**order_doc)
 
 @api_router.get("/orders", response_model=List[OrderResponse])
 async def get_orders(
+    response: Response,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     query = {}
+    collection = db.orders
     
     if current_user["role"] == UserRole.CLIENT:
         query["client_id"] = current_user["id"]
     elif current_user["role"] == UserRole.VENDOR:
-        query["items.vendor_id"] = current_user["id"]
+        # Vendors page through their own lines only
+        collection = db.vendor_orders
+        query["vendor_id"] = current_user["id"]
     elif current_user["role"] == UserRole.DISPATCHER:
-        query["$or"] = [
-            {"dispatcher_id": current_user["id"]},
-            {"status": OrderStatus.PAID, "dispatcher_id": None}
-        ]
+        # Open jobs are listed and claimed through the job board
+        query["dispatcher_id"] = current_user["id"]
     
     if status:
         query["status"] = status
     
-    orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return [OrderResponse(**order) for order in orders]
+    orders = await fetch_page(collection, query, ORDER_FIELDS, limit, cursor, response)
+    return list_response(ORDER_LIST, orders, response)
 
 @api_router.get("/orders/{order_id}", response_model=OrderResponse)
 async def get_order(order_id: str, current_user: dict = Depends(get_current_user)):
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    if current_user["role"] == UserRole.VENDOR:
+        order = await db.vendor_orders.find_one({"id": order_id, "vendor_id": current_user["id"]}, {"_id": 0})
+    else:
+        order = await db.orders.find_one({"id": order_id}, {"_id": 0})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return OrderResponse(**order)
 
+async def transition_order(order_id: str, new_status: str, user: dict,
+                           conflict_detail: Optional[str] = None, **kwargs) -> tuple:
+    """apply_transition() with its refusals mapped to HTTP errors."""
+    try:
+        return await apply_transition(db, order_id, new_status, user, **kwargs)
+    except OrderNotFound:
+        raise HTTPException(status_code=404, detail="Order not found")
+    except TransitionForbidden as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except TransitionConflict as e:
+        raise HTTPException(status_code=409, detail=conflict_detail or str(e))
+
 @api_router.put("/orders/{order_id}/status")
 async def update_order_status(
     order_id: str,
     new_status: str,
     current_user: dict = Depends(get_current_user)
 ):
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    valid_statuses = [OrderStatus.PENDING, OrderStatus.CONFIRMED, OrderStatus.PAID, 
-                      OrderStatus.ASSIGNED, OrderStatus.PICKED_UP, OrderStatus.IN_TRANSIT, 
-                      OrderStatus.DELIVERED, OrderStatus.CANCELLED]
-    if new_status not in valid_statuses:
+    if new_status not in ORDER_STATUSES:
         raise HTTPException(status_code=400, detail="Invalid status")
     
-    update_data = {"status": new_status, "updated_at": datetime.now(timezone.utc).isoformat()}
-    await db.orders.update_one({"id": order_id}, {"$set": update_data})
+    order, updated = await transition_order(order_id, new_status, current_user)
+    # Vendors see their own lines only, as in GET /orders/{id}
+    view = vendor_view(updated, current_user["id"]) if current_user["role"] == UserRole.VENDOR else updated
+    if updated["status"] == order["status"]:
+        # A vendor's confirmation was recorded without moving the order: other vendors
+        # have yet to confirm, or a concurrent confirmation already moved it
+        message = ("Confirmation recorded" if updated["status"] == new_status
+                   else "Confirmation recorded; waiting for the other vendors")
+        return {"message": message, "status": updated["status"], "order": OrderResponse(**view)}
+    await sync_vendor_orders(db, order_id, updated)
+    await stats_counters.increment(status_change_deltas(order["status"], new_status))
+    if new_status == OrderStatus.PAID:
+        job_board.notify()
     
     # Notify client
     await create_notification_internal(
@@ -550,34 +814,77 @@ async def update_order_status(
         f"Your order #{order_id[:8]} status changed to {new_status}", "order"
     )
     
-    return {"message": "Order status updated", "status": new_status}
+    return {"message": "Order status updated", "status": new_status, "order": OrderResponse(**view)}
 
 @api_router.put("/orders/{order_id}/assign")
 async def assign_dispatcher(
     order_id: str,
     current_user: dict = Depends(require_roles([UserRole.DISPATCHER, UserRole.ADMIN]))
 ):
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order["dispatcher_id"] and current_user["role"] != UserRole.ADMIN:
-        raise HTTPException(status_code=400, detail="Order already assigned")
-    
-    update_data = {
-        "dispatcher_id": current_user["id"],
-        "dispatcher_name": current_user["full_name"],
-        "status": OrderStatus.ASSIGNED,
-        "updated_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.orders.update_one({"id": order_id}, {"$set": update_data})
+    # Dispatchers claim unassigned orders; admins may also reassign
+    is_admin = current_user["role"] == UserRole.ADMIN
+    order, updated = await transition_order(
+        order_id, OrderStatus.ASSIGNED, current_user,
+        conflict_detail="Order already assigned or not ready for dispatch",
+        changes={
+            "dispatcher_id": current_user["id"],
+            "dispatcher_name": current_user["full_name"],
+            "lease_expires_at": None if is_admin else lease_deadline(job_board.lease_seconds),
+        },
+        owner={},
+        precondition={} if is_admin else {"dispatcher_id": None}
+    )
+    await dispatcher_assigned(order, updated)
+    return {"message": "Dispatcher assigned successfully", "order": OrderResponse(**updated)}
+
+async def dispatcher_assigned(order: dict, updated: dict) -> None:
+    await sync_vendor_orders(db, order["id"], updated)
+    await stats_counters.increment(status_change_deltas(order["status"], OrderStatus.ASSIGNED))
     
     await create_notification_internal(
         order["client_id"], "Dispatcher Assigned",
-        f"Dispatcher {current_user['full_name']} has been assigned to your order #{order_id[:8]}", "order"
+        f"Dispatcher {updated['dispatcher_name']} has been assigned to your order #{order['id'][:8]}", "order"
+    )
+
+# ============= DISPATCH JOB BOARD ROUTES =============
+
+DISPATCH_MAX_WAIT_SECONDS = 30
+# Default claim lease; 0 disables leases. Dispatchers may ask for a shorter one
+DISPATCH_LEASE_SECONDS = min(float(os.environ.get('DISPATCH_LEASE_SECONDS', '900')), MAX_LEASE_SECONDS)
+
+async def release_job(order: dict) -> None:
+    """Called by the job board when a claim's lease runs out before pickup."""
+    released = {"status": OrderStatus.PAID, "dispatcher_id": None, "dispatcher_name": None,
+                "lease_expires_at": None, "updated_at": datetime.now(timezone.utc).isoformat()}
+    await sync_vendor_orders(db, order["id"], released)
+    await stats_counters.increment(status_change_deltas(order["status"], OrderStatus.PAID))
+    await create_notification_internal(
+        order["dispatcher_id"], "Job Released",
+        f"Order #{order['id'][:8]} was not picked up in time and went back to the job board", "order"
     )
-    
-    return {"message": "Dispatcher assigned successfully"}
+
+@api_router.get("/dispatch/jobs", response_model=List[OrderResponse])
+async def get_open_jobs(
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(require_roles([UserRole.DISPATCHER, UserRole.ADMIN]))
+):
+    """Paid orders waiting for a dispatcher, oldest first."""
+    jobs = await job_board.list_open(limit, ORDER_FIELDS)
+    return list_response(ORDER_LIST, jobs)
+
+@api_router.post("/dispatch/jobs/claim")
+async def claim_next_job(
+    wait: float = Query(0, ge=0, le=DISPATCH_MAX_WAIT_SECONDS),
+    lease_seconds: Optional[float] = Query(None, gt=0, le=DISPATCH_LEASE_SECONDS, allow_inf_nan=False),
+    current_user: dict = Depends(require_roles([UserRole.DISPATCHER]))
+):
+    """Claim the oldest open job, waiting up to `wait` seconds for one; 204 if none."""
+    claim = await job_board.wait_for_job(current_user, wait, lease_seconds)
+    if claim is None:
+        return Response(status_code=204)
+    order, updated = claim
+    await dispatcher_assigned(order, updated)
+    return {"message": "Job claimed", "order": OrderResponse(**updated)}
 
 # ============= LOCATION ROUTES =============
 
@@ -586,74 +893,273 @@ async def update_location(
     location: LocationUpdate,
     current_user: dict = Depends(require_roles([UserRole.DISPATCHER]))
 ):
-    location_doc = {
-        "user_id": current_user["id"],
-        "user_name": current_user["full_name"],
-        "latitude": location.latitude,
-        "longitude": location.longitude,
-        "updated_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.locations.update_one(
-        {"user_id": current_user["id"]},
-        {"$set": location_doc},
-        upsert=True
-    )
+    location_store.update(current_user["id"], current_user["full_name"], location.latitude, location.longitude)
     return {"message": "Location updated"}
 
 @api_router.get("/locations/dispatchers")
 async def get_dispatcher_locations(current_user: dict = Depends(get_current_user)):
-    locations = await db.locations.find({}, {"_id": 0}).to_list(100)
-    return {"locations": locations}
+    return {"locations": location_store.all()}
+
+@api_router.get("/locations/dispatchers/nearby")
+async def get_nearby_dispatchers(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5, gt=0, le=100),
+    limit: int = Query(10, ge=1, le=100),
+    max_age_seconds: int = Query(300, ge=0),
+    current_user: dict = Depends(require_roles([UserRole.DISPATCHER, UserRole.ADMIN, UserRole.VENDOR]))
+):
+    """Dispatchers within `radius_km` of a point, nearest first.
+
+    Served from the in-memory spatial grid; a worker that has not loaded any
+    positions yet falls back to a 2dsphere $geoNear query.
+    """
+    if len(location_store):
+        dispatchers = location_store.nearest(latitude, longitude, limit, radius_km, max_age_seconds)
+    else:
+        query = {}
+        if max_age_seconds:
+            cutoff = (datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)).isoformat()
+            query["updated_at"] = {"$gte": cutoff}
+        dispatchers = await db.locations.aggregate([
+            {"$geoNear": {
+                "near": geojson_point(latitude, longitude),
+                "distanceField": "distance_km",
+                "distanceMultiplier": 0.001,
+                "maxDistance": radius_km * 1000,
+                "query": query,
+                "spherical": True
+            }},
+            {"$limit": limit},
+            {"$project": {"_id": 0}}
+        ]).to_list(limit)
+    return {"dispatchers": dispatchers}
 
 @api_router.get("/location/{user_id}")
 async def get_user_location(user_id: str, current_user: dict = Depends(get_current_user)):
-    location = await db.locations.find_one({"user_id": user_id}, {"_id": 0})
+    location = await location_store.get(user_id)
     if not location:
         raise HTTPException(status_code=404, detail="Location not found")
     return location
 
+@api_router.get("/orders/{order_id}/dispatcher-location/stream")
+async def stream_dispatcher_location(order_id: str, request: Request, token: Optional[str] = None):
+    """Server-Sent Events stream of live positions for the order's dispatcher."""
+    user = await get_stream_user(request, token)
+    order = await db.orders.find_one({"id": order_id}, {"_id": 0, "client_id": 1, "dispatcher_id": 1})
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if user["role"] != UserRole.ADMIN and user["id"] not in (order["client_id"], order.get("dispatcher_id")):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if not order.get("dispatcher_id"):
+        raise HTTPException(status_code=409, detail="No dispatcher assigned yet")
+    
+    current = await location_store.get(order["dispatcher_id"])
+    subscription = location_store.subscribe(order["dispatcher_id"])
+    
+    async def event_stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SSE_MAX_STREAM_SECONDS
+        try:
+            yield "retry: 3000\n\n"
+            if current:
+                yield f"event: location\ndata: {json.dumps(current)}\n\n"
+            while loop.time() < deadline:
+                try:
+                    location = await asyncio.wait_for(
+                        subscription.queue.get(), min(SSE_HEARTBEAT_SECONDS, max(0, deadline - loop.time()))
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: location\ndata: {json.dumps(location)}\n\n"
+        finally:
+            location_store.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ============= NOTIFICATION ROUTES =============
 
+async def create_notifications_internal(notif_docs: List[dict]) -> List[dict]:
+    """Queue already-built notifications to be written after the response.
+
+    Streams are told once the dispatcher has written them (publish_notifications).
+    """
+    await notification_dispatcher.submit(notif_docs)
+    return notif_docs
+
+def publish_notifications(notif_docs: List[dict]) -> None:
+    for notif_doc in notif_docs:
+        notification_hub.publish(notif_doc)
+
 async def create_notification_internal(user_id: str, title: str, message: str, notif_type: str = "info"):
-    notif_doc = {
-        "id": str(uuid.uuid4()),
-        "user_id": user_id,
-        "title": title,
-        "message": message,
-        "type": notif_type,
-        "is_read": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.notifications.insert_one(notif_doc)
+    notif_doc = build_notification(user_id, title, message, notif_type)
+    await create_notifications_internal([notif_doc])
     return notif_doc
 
 @api_router.get("/notifications", response_model=List[NotificationResponse])
-async def get_notifications(current_user: dict = Depends(get_current_user)):
-    notifications = await db.notifications.find(
-        {"user_id": current_user["id"]}, {"_id": 0}
-    ).sort("created_at", -1).to_list(50)
-    return [NotificationResponse(**n) for n in notifications]
+async def get_notifications(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    notifications = await fetch_page(
+        db.notifications, {"user_id": current_user["id"]}, NOTIFICATION_FIELDS, limit, cursor, response
+    )
+    return list_response(NOTIFICATION_LIST, notifications, response)
+
+@api_router.get("/notifications/unread-count")
+async def get_unread_count(current_user: dict = Depends(get_current_user)):
+    return {"unread_count": await unread_count(db, current_user["id"])}
+
+def format_sse(notification: dict) -> str:
+    return f"id: {encode_cursor(notification)}\nevent: notification\ndata: {json.dumps(notification)}\n\n"
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    token: Optional[str] = None,
+    since: Optional[str] = None
+):
+    """Server-Sent Events stream of the caller's new notifications.
+
+    Reconnecting clients resume from `since` or the Last-Event-ID header and
+    first receive everything they missed.
+    """
+    user = await get_stream_user(request, token)
+    since = request.headers.get("last-event-id") or since
+    started_at = datetime.now(timezone.utc).isoformat()
+    
+    # Subscribe before the catch-up query so nothing falls in between
+    subscription = notification_hub.subscribe(user["id"])
+    missed = []
+    if since:
+        try:
+            missed = await db.notifications.find(
+                apply_cursor({"user_id": user["id"]}, since, newer=True), NOTIFICATION_FIELDS
+            ).sort([("created_at", 1), ("id", 1)]).to_list(MAX_PAGE_SIZE)
+        except Exception:
+            notification_hub.unsubscribe(subscription)
+            raise
+    
+    async def event_stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SSE_MAX_STREAM_SECONDS
+        sent = set()
+        try:
+            yield "retry: 3000\n\n"
+            for notification in missed:
+                sent.add(notification["id"])
+                yield format_sse(notification)
+            while not subscription.closed:
+                if loop.time() >= deadline:
+                    if not since and not sent:
+                        # Give the reconnect a resume point so nothing sent in between is lost
+                        yield f"id: {encode_cursor({'created_at': started_at, 'id': ''})}\n\n"
+                    break
+                try:
+                    notification = await asyncio.wait_for(
+                        subscription.queue.get(), min(SSE_HEARTBEAT_SECONDS, max(0, deadline - loop.time()))
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if notification is None:
+                    break
+                if notification["id"] not in sent:
+                    sent.add(notification["id"])
+                    yield format_sse(notification)
+        finally:
+            notification_hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.put("/notifications/{notif_id}/read")
 async def mark_notification_read(notif_id: str, current_user: dict = Depends(get_current_user)):
+    # read_at is a BSON date so the TTL index can expire the notification
     result = await db.notifications.update_one(
-        {"id": notif_id, "user_id": current_user["id"]},
-        {"$set": {"is_read": True}}
+        {"id": notif_id, "user_id": current_user["id"], "is_read": False},
+        {"$set": {"is_read": True, "read_at": datetime.now(timezone.utc)}}
     )
-    if result.modified_count == 0:
+    if result.modified_count:
+        await adjust_unread(db, {current_user["id"]: -1})
+    elif not await db.notifications.find_one({"id": notif_id, "user_id": current_user["id"]}, {"_id": 1}):
         raise HTTPException(status_code=404, detail="Notification not found")
     return {"message": "Notification marked as read"}
 
 @api_router.put("/notifications/read-all")
 async def mark_all_notifications_read(current_user: dict = Depends(get_current_user)):
-    await db.notifications.update_many(
-        {"user_id": current_user["id"]},
-        {"$set": {"is_read": True}}
+    # Only unread documents are rewritten; archiving keeps that set bounded
+    result = await db.notifications.update_many(
+        {"user_id": current_user["id"], "is_read": False},
+        {"$set": {"is_read": True, "read_at": datetime.now(timezone.utc)}}
     )
-    return {"message": "All notifications marked as read"}
+    await adjust_unread(db, {current_user["id"]: -result.modified_count})
+    return {"message": "All notifications marked as read", "updated": result.modified_count}
 
 # ============= PAYMENT ROUTES =============
 
+async def mark_order_paid(reference: str) -> Optional[dict]:
+    """Mark the order for `reference` paid exactly once and notify the client.
+
+    Only pending or confirmed orders move to "paid". A late or replayed
+    payment for an order that was cancelled or is already in delivery only
+    records payment_status, so the status and the stats stay consistent.
+
+    Returns the order as it was before the update, or None if its status was
+    not changed (already paid, not payable or missing).
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    update_data = {"payment_status": "success", "status": OrderStatus.PAID, "updated_at": now}
+    unpaid = {"payment_reference": reference, "payment_status": {"$ne": "success"}}
+    order = await db.orders.find_one_and_update(
+        {**unpaid, "status": {"$in": sorted(PAYABLE_STATUSES)}},
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if order is None:
+        payment_only = {"payment_status": "success", "updated_at": now}
+        late = await db.orders.find_one_and_update(
+            unpaid, {"$set": payment_only}, projection={"_id": 0, "id": 1, "status": 1}
+        )
+        if late:
+            logger.warning(f"Payment {reference} arrived for order {late['id']} in status {late['status']}; status left unchanged")
+            await sync_vendor_orders(db, late["id"], payment_only)
+            # paid_orders counts payment_status == "success", whatever the order status
+            await stats_counters.increment({"paid_orders": 1})
+    if order:
+        await sync_vendor_orders(db, order["id"], update_data)
+        await stats_counters.increment({
+            "paid_orders": 1, **status_change_deltas(order["status"], OrderStatus.PAID)
+        })
+        job_board.notify()
+        await create_notification_internal(
+            order["client_id"], "Payment Successful",
+            f"Your payment for order #{order['id'][:8]} was successful", "payment"
+        )
+    return order
+
+async def handle_payment_event(event: dict) -> None:
+    if event.get("event") != "charge.success":
+        return
+    reference = (event.get("data") or {}).get("reference")
+    if reference:
+        await mark_order_paid(reference)
+
 @api_router.post("/payments/initialize")
 async def initialize_payment(
     payment_data: PaymentInitialize,
@@ -673,6 +1179,7 @@ async def initialize_payment(
             {"id": payment_data.order_id},
             {"$set": {"payment_reference": reference}}
         )
+        await sync_vendor_orders(db, payment_data.order_id, {"payment_reference": reference})
         return {
             "status": True,
             "message": "Payment initialized (mock mode)",
@@ -683,26 +1190,27 @@ async def initialize_payment(
             }
         }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.paystack.co/transaction/initialize",
-            json={
-                "email": payment_data.email,
-                "amount": payment_data.amount,
-                "reference": f"order_{payment_data.order_id}_{str(uuid.uuid4())[:8]}",
-                "metadata": {"order_id": payment_data.order_id}
-            },
-            headers={"Authorization": f"Bearer {PAYSTACK_SECRET_KEY}"}
+    try:
+        result = await payment_gateway.initialize(
+            email=payment_data.email,
+            amount=payment_data.amount,
+            reference=f"order_{payment_data.order_id}_{str(uuid.uuid4())[:8]}",
+            metadata={"order_id": payment_data.order_id}
         )
-        result = response.json()
-        
-        if result.get("status"):
-            await db.orders.update_one(
-                {"id": payment_data.order_id},
-                {"$set": {"payment_reference": result["data"]["reference"]}}
-            )
-        
-        return result
+    except PaymentGatewayUnavailable:
+        raise HTTPException(status_code=503, detail="Payment service temporarily unavailable")
+    except PaymentGatewayError as e:
+        logger.error(f"Payment initialization failed: {e}")
+        raise HTTPException(status_code=502, detail="Payment service error. Please try again.")
+    
+    if result.get("status"):
+        await db.orders.update_one(
+            {"id": payment_data.order_id},
+            {"$set": {"payment_reference": result["data"]["reference"]}}
+        )
+        await sync_vendor_orders(db, payment_data.order_id, {"payment_reference": result["data"]["reference"]})
+    
+    return result
 
 @api_router.get("/payments/verify/{reference}")
 async def verify_payment(reference: str, current_user: dict = Depends(get_current_user)):
@@ -710,62 +1218,69 @@ async def verify_payment(reference: str, current_user: dict = Depends(get_curren
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    # Already confirmed (by webhook or an earlier verify): no gateway call needed
+    if order.get("payment_status") == "success":
+        return {"status": True, "data": {"status": "success", "reference": reference}}
+    
     if reference.startswith("mock_"):
         # Mock verification
-        await db.orders.update_one(
-            {"payment_reference": reference},
-            {"$set": {"payment_status": "success", "status": OrderStatus.PAID}}
-        )
+        await mark_order_paid(reference)
         return {"status": True, "data": {"status": "success"}}
     
     if not PAYSTACK_SECRET_KEY:
         raise HTTPException(status_code=500, detail="Payment not configured")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"https://api.paystack.co/transaction/verify/{reference}",
-            headers={"Authorization": f"Bearer {PAYSTACK_SECRET_KEY}"}
-        )
-        result = response.json()
-        
-        if result.get("status") and result["data"]["status"] == "success":
-            await db.orders.update_one(
-                {"payment_reference": reference},
-                {"$set": {"payment_status": "success", "status": OrderStatus.PAID}}
-            )
-            await create_notification_internal(
-                order["client_id"], "Payment Successful",
-                f"Your payment for order #{order['id'][:8]} was successful", "payment"
-            )
-        
-        return result
+    try:
+        result = await payment_gateway.verify(reference)
+    except PaymentGatewayUnavailable:
+        raise HTTPException(status_code=503, detail="Payment service temporarily unavailable")
+    except PaymentGatewayError as e:
+        logger.error(f"Payment verification failed: {e}")
+        raise HTTPException(status_code=502, detail="Payment service error. Please try again.")
+    
+    if result.get("status") and result["data"]["status"] == "success":
+        await mark_order_paid(reference)
+    
+    return result
+
+@api_router.post("/payments/webhook")
+async def payment_webhook(request: Request):
+    body = await request.body()
+    if not verify_signature(PAYSTACK_SECRET_KEY, body, request.headers.get("x-paystack-signature")):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    
+    # Acknowledge fast; the inbox worker applies the event
+    await payment_inbox.record(event)
+    return {"status": "received"}
 
 # ============= ADMIN ROUTES =============
 
 @api_router.get("/admin/users", response_model=List[UserResponse])
-async def get_all_users(current_user: dict = Depends(require_roles([UserRole.ADMIN]))):
-    users = await db.users.find({}, {"_id": 0, "password_hash": 0}).to_list(1000)
-    return [UserResponse(**u) for u in users]
+async def get_all_users(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(require_roles([UserRole.ADMIN]))
+):
+    users = await fetch_page(db.users, {}, USER_FIELDS, limit, cursor, response)
+    return list_response(USER_LIST, users, response)
 
 @api_router.get("/admin/stats")
 async def get_admin_stats(current_user: dict = Depends(require_roles([UserRole.ADMIN]))):
-    total_users = await db.users.count_documents({})
-    total_orders = await db.orders.count_documents({})
-    total_parts = await db.spare_parts.count_documents({})
-    pending_orders = await db.orders.count_documents({"status": OrderStatus.PENDING})
-    paid_orders = await db.orders.count_documents({"payment_status": "success"})
-    
-    role_counts = {}
-    for role in [UserRole.CLIENT, UserRole.VENDOR, UserRole.DISPATCHER, UserRole.ADMIN]:
-        role_counts[role] = await db.users.count_documents({"role": role})
-    
+    counters = await stats_counters.read()
     return {
-        "total_users": total_users,
-        "total_orders": total_orders,
-        "total_parts": total_parts,
-        "pending_orders": pending_orders,
-        "paid_orders": paid_orders,
-        "users_by_role": role_counts
+        "total_users": counters.get("total_users", 0),
+        "total_orders": counters.get("total_orders", 0),
+        "total_parts": counters.get("total_parts", 0),
+        "pending_orders": counters.get("pending_orders", 0),
+        "paid_orders": counters.get("paid_orders", 0),
+        "users_by_role": counters.get("users_by_role", {}),
+        "updated_at": counters.get("updated_at"),
+        "reconciled_at": counters.get("reconciled_at")
     }
 
 @api_router.put("/admin/users/{user_id}/status")
@@ -775,33 +1290,264 @@ async def toggle_user_status(
     current_user: dict = Depends(require_roles([UserRole.ADMIN]))
 ):
     result = await db.users.update_one({"id": user_id}, {"$set": {"is_active": is_active}})
+    # Other workers evict through UserCacheInvalidator, or after USER_CACHE_TTL_SECONDS without it
+    user_cache.invalidate(user_id)
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": f"User {'activated' if is_active else 'deactivated'}"}
 
+@api_router.get("/admin/query-plans")
+async def get_query_plans(current_user: dict = Depends(require_roles([UserRole.ADMIN]))):
+    report = await audit_query_plans(db)
+    return {
+        "plans": report,
+        "collscans": [r["route"] for r in report if r.get("collscan")]
+    }
+
+# ============= EXPORT ROUTES =============
+
+EXPORT_READ_PREFERENCE = os.environ.get('EXPORT_READ_PREFERENCE', 'secondaryPreferred')
+
+@api_router.get("/exports/orders")
+async def export_orders(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    vendor_id: Optional[str] = None,
+    status: Optional[str] = None,
+    current_user: dict = Depends(require_roles([UserRole.VENDOR, UserRole.ADMIN]))
+):
+    query = created_between(start, end)
+    collection = db.orders
+    if current_user["role"] == UserRole.VENDOR:
+        # Vendors export their own lines and subtotals only
+        collection = db.vendor_orders
+        query["vendor_id"] = current_user["id"]
+    elif vendor_id:
+        query["items.vendor_id"] = vendor_id
+    if status:
+        query["status"] = status
+
+    return export_response(
+        collection, query, list(OrderResponse.model_fields), format, "orders",
+        read_preference=EXPORT_READ_PREFERENCE
+    )
+
+@api_router.get("/exports/parts")
+async def export_parts(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    vendor_id: Optional[str] = None,
+    category: Optional[str] = None,
+    current_user: dict = Depends(require_roles([UserRole.VENDOR, UserRole.ADMIN]))
+):
+    query = {}
+    if current_user["role"] == UserRole.VENDOR:
+        vendor_id = current_user["id"]
+    if vendor_id:
+        query["vendor_id"] = vendor_id
+    if category:
+        query["category"] = category
+
+    return export_response(
+        db.spare_parts, query, list(SparePartResponse.model_fields), format, "parts",
+        read_preference=EXPORT_READ_PREFERENCE
+    )
+
 # ============= HEALTH CHECK =============
 
 @api_router.get("/")
 async def root():
     return {"message": "SpareParts Hub API", "version": "1.0.0"}
 
+@api_router.get("/metrics")
+async def metrics(request: Request):
+    """Prometheus metrics, for the METRICS_TOKEN bearer or a signed-in admin."""
+    auth = request.headers.get("authorization", "")
+    if not (METRICS_TOKEN and hmac.compare_digest(auth.encode(), f"Bearer {METRICS_TOKEN}".encode())):
+        if not auth.lower().startswith("bearer "):
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        user = await get_user_from_token(auth[7:])
+        if user["role"] != UserRole.ADMIN:
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+    body = metrics_registry.render(metrics_components())
+    return Response(content=body, media_type="text/plain; version=0.0.4")
+
+def metrics_components() -> dict:
+    return {
+        "user_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "notification_dispatcher": notification_dispatcher.stats(),
+        "notification_streams": {"connections": notification_hub.connections},
+        "notification_archiver": notification_archiver.stats(),
+        "stock_hold_sweeper": stock_hold_sweeper.stats(),
+        "location_store": location_store.stats(),
+        "catalog_cache": catalog_responses.stats(),
+        "job_board": job_board.stats(),
+        "payment_gateway": {"circuit_open": int(payment_gateway.breaker.state != "closed")},
+    }
+
+HEALTH_PING_TIMEOUT_SECONDS = 2
+POOL_SATURATION_WARNING = 0.9
+
 @api_router.get("/health")
 async def health():
-    return {"status": "healthy"}
+    """Readiness check: Mongo must answer a ping and the connection pool must not be exhausted.
 
-# Include router
-app.include_router(api_router)
+    Pool and hasher figures are those of the worker that answered, named in `worker`.
+    """
+    checks = {}
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(client.admin.command('ping'), HEALTH_PING_TIMEOUT_SECONDS)
+        checks["mongo"] = {"status": "up", "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+    except Exception as e:
+        checks["mongo"] = {"status": "down", "error": str(e) or type(e).__name__}
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    saturation = mongo_pool_metrics.saturation()
+    checks["mongo_pool"] = {
+        "checked_out": mongo_pool_metrics.in_use.max(),
+        "max_size": MONGO_MAX_POOL_SIZE,
+        "saturation": round(saturation, 2),
+    }
+    checks["password_hasher"] = {"queue_depth": password_hasher.queue_depth}
+
+    if checks["mongo"]["status"] != "up":
+        status = "unhealthy"
+    elif saturation >= POOL_SATURATION_WARNING:
+        status = "degraded"
+    else:
+        status = "healthy"
+    return ORJSONResponse({"status": status, "worker": os.getpid(), "checks": checks}, status_code=503 if status == "unhealthy" else 200)
+
+# ============= APP FACTORY =============
+
+def init_resources() -> None:
+    """Create this process's clients, caches and background workers."""
+    global client, db, payment_gateway, user_cache, stats_counters, notification_dispatcher, notification_hub
+    global notification_archiver, stock_hold_sweeper, user_cache_invalidator, metrics_snapshotter
+    global location_store, catalog_facets, catalog_version, catalog_responses, password_hasher
+    global payment_inbox, catalog_importer, job_board
+
+    # MongoDB client with connection pooling
+    client = AsyncIOMotorClient(
+        mongo_url,
+        serverSelectionTimeoutMS=5000,
+        connectTimeoutMS=5000,
+        socketTimeoutMS=5000,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        event_listeners=[mongo_command_metrics, mongo_pool_metrics]
+    )
+    db = client[db_name]
+    logger.info(f"MongoDB client initialized. URL: {mongo_url}, Database: {db_name}, pool: {MONGO_MAX_POOL_SIZE}")
+
+    # Shared payment client, reused across requests for connection pooling
+    payment_gateway = PaystackGateway(
+        PAYSTACK_SECRET_KEY,
+        base_url=os.environ.get('PAYSTACK_BASE_URL', PAYSTACK_BASE_URL),
+        timeout=float(os.environ.get('PAYSTACK_TIMEOUT_SECONDS', '10')),
+        max_retries=int(os.environ.get('PAYSTACK_MAX_RETRIES', '3'))
+    )
+
+    # Authenticated user cache
+    user_cache = UserCache(
+        maxsize=int(os.environ.get('USER_CACHE_MAX_SIZE', '10000')),
+        ttl=float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
+    )
+
+    # Cross-worker evictions share the change stream requirement of the mongo notification backend
+    user_cache_invalidator = (
+        UserCacheInvalidator(db, user_cache) if NOTIFICATION_PUBSUB == 'mongo' else None
+    )
+
+    metrics_snapshotter = MetricsSnapshotter(metrics_registry, metrics_components)
+
+    # Admin dashboard counters
+    stats_counters = StatsCounters(db, reconcile_interval=float(os.environ.get('STATS_RECONCILE_SECONDS', '600')))
+
+    # Background notification writer
+    notification_dispatcher = NotificationDispatcher(
+        db, max_queue=int(os.environ.get('NOTIFICATION_QUEUE_SIZE', '10000')),
+        on_written=publish_notifications
+    )
 
-@app.on_event("startup")
-async def startup_db_client():
+    # Live notification push; use the "mongo" backend when running several workers
+    notification_hub = NotificationHub(
+        ChangeStreamBackend(db) if NOTIFICATION_PUBSUB == 'mongo' else InProcessBackend()
+    )
+
+    # Moves notifications older than NOTIFICATION_ARCHIVE_DAYS to notifications_archive
+    notification_archiver = NotificationArchiver(
+        db,
+        archive_after_days=float(os.environ.get('NOTIFICATION_ARCHIVE_DAYS', '90')),
+        interval=float(os.environ.get('NOTIFICATION_ARCHIVE_INTERVAL_SECONDS', '3600'))
+    )
+
+    # Returns stock held by orders that were never written (a worker died mid-checkout)
+    stock_hold_sweeper = StockHoldSweeper(
+        db,
+        max_age_minutes=float(os.environ.get('STOCK_HOLD_MAX_AGE_MINUTES', '15')),
+        interval=float(os.environ.get('STOCK_HOLD_SWEEP_SECONDS', '300'))
+    )
+
+    # Dispatcher positions, coalesced in memory and flushed to Mongo in bulk
+    location_store = LocationStore(
+        db,
+        flush_interval=float(os.environ.get('LOCATION_FLUSH_SECONDS', '2')),
+        track_interval=float(os.environ.get('LOCATION_TRACK_SECONDS', '0'))
+    )
+
+    # Storefront category/brand facets, served from memory
+    catalog_facets = CatalogFacets(db, rebuild_interval=float(os.environ.get('FACETS_REBUILD_SECONDS', '300')))
+
+    # Catalog HTTP caching: ETags follow a version bumped on every catalog write
+    catalog_version = CatalogVersion(db, refresh_interval=float(os.environ.get('CATALOG_VERSION_REFRESH_SECONDS', '2')))
+    catalog_responses = ResponseCache(maxsize=int(os.environ.get('CATALOG_CACHE_SIZE', '512')))
+
+    password_hasher = PasswordHasher(
+        pwd_context,
+        max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', '2')),
+        max_queue=int(os.environ.get('PASSWORD_HASH_QUEUE', '32'))
+    )
+
+    payment_inbox = PaymentEventInbox(db, handle_payment_event)
+    catalog_importer = CatalogImporter(
+        db, SparePartCreate,
+        batch_size=int(os.environ.get('IMPORT_BATCH_SIZE', '500')),
+        on_complete=finish_catalog_import
+    )
+
+    # Dispatcher job queue; claims expire after DISPATCH_LEASE_SECONDS unless picked up (0 disables)
+    job_board = JobBoard(
+        db,
+        lease_seconds=DISPATCH_LEASE_SECONDS,
+        check_interval=float(os.environ.get('DISPATCH_CHECK_SECONDS', '5')),
+        on_release=release_job
+    )
+
+# "background" builds indexes after the worker starts serving; "off" leaves it to
+# tools/ensure_indexes.py run as a release step
+ENSURE_INDEXES = os.environ.get('ENSURE_INDEXES', 'background')
+
+async def build_indexes() -> None:
+    start = time.perf_counter()
+    created = await ensure_indexes(db)
+    logger.info(f"MongoDB indexes ensured in {time.perf_counter() - start:.1f}s: {created}")
+
+def start_index_build() -> Optional[asyncio.Task]:
+    """Build indexes in the background so large builds never hold up readiness during a rolling deploy."""
+    if ENSURE_INDEXES != 'background':
+        return None
+    return asyncio.create_task(build_indexes())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_resources()
+    if WEB_CONCURRENCY > 1 and NOTIFICATION_PUBSUB != 'mongo':
+        logger.error(
+            f"Running {WEB_CONCURRENCY} workers with NOTIFICATION_PUBSUB={NOTIFICATION_PUBSUB}: live notifications "
+            "and user cache evictions stay in the worker that produced them"
+        )
     try:
         # Test the connection
         await client.admin.command('ping')
@@ -809,8 +1555,60 @@ async def startup_db_client():
     except Exception as e:
         logger.error(f"MongoDB connection failed: {e}")
         logger.error("Please ensure MongoDB is running and MONGO_URL is correct")
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
+    index_build = start_index_build()
+    notification_dispatcher.start()
+    await notification_hub.start()
+    notification_archiver.start()
+    stock_hold_sweeper.start()
+    await location_store.start()
+    catalog_facets.start()
+    catalog_version.start()
+    payment_inbox.start()
+    stats_counters.start()
+    job_board.start()
+    if user_cache_invalidator is not None:
+        user_cache_invalidator.start()
+    metrics_snapshotter.start()
+
+    yield
+
+    # In-flight requests have finished; flush buffered writes before closing clients
+    if index_build is not None and not index_build.done():
+        # Builds continue on the server; the next start or the tool picks up the rest
+        index_build.cancel()
+        await asyncio.gather(index_build, return_exceptions=True)
+    await metrics_snapshotter.stop()
+    if user_cache_invalidator is not None:
+        await user_cache_invalidator.stop()
+    await catalog_importer.stop()
+    await job_board.stop()
+    await payment_inbox.stop()
+    await stats_counters.stop()
+    await notification_dispatcher.stop()
+    await notification_hub.stop()
+    await notification_archiver.stop()
+    await stock_hold_sweeper.stop()
+    await location_store.stop()
+    await catalog_facets.stop()
+    await catalog_version.stop()
     client.close()
     logger.info("MongoDB connection closed")
+    await payment_gateway.aclose()
+    password_hasher.shutdown()
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="SpareParts Hub API", default_response_class=ORJSONResponse, lifespan=lifespan)
+    app.include_router(api_router)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
+    )
+    app.add_middleware(RequestMetrics, registry=metrics_registry)
+    return app
+
+app = create_app()
@@ -0,0 +1,108 @@
+"""Incrementally maintained admin dashboard counters.
+
+A single document in the `counters` collection holds every number shown on
+the admin dashboard. Write paths adjust it with atomic $inc updates, so
+reading the stats is one primary-key lookup. Concurrent writers and
+partial failures can make the counters drift, so a background job
+periodically recomputes them from the source collections (one aggregation
+per collection) and overwrites the document.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STATS_ID = "admin_stats"
+ROLES = ["client", "vendor", "dispatcher", "admin"]
+
+
+def status_change_deltas(old_status: Optional[str], new_status: str) -> Dict[str, int]:
+    """Counter adjustments for an order moving from `old_status` to `new_status`."""
+    return {"pending_orders": (new_status == "pending") - (old_status == "pending")}
+
+
+class StatsCounters:
+    def __init__(self, db, reconcile_interval: float = 600.0):
+        self.db = db
+        self.reconcile_interval = reconcile_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def increment(self, deltas: Dict[str, int]) -> None:
+        """Apply `deltas` (dotted field -> amount) to the counters; never raises."""
+        deltas = {field: amount for field, amount in deltas.items() if amount}
+        if not deltas:
+            return
+        try:
+            await self.db.counters.update_one(
+                {"_id": STATS_ID},
+                {"$inc": deltas, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to update stats counters {deltas}: {e}")
+
+    async def recompute(self) -> dict:
+        """Rebuild the counters from the source collections."""
+        role_rows = await self.db.users.aggregate([
+            {"$group": {"_id": "$role", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        users_by_role = {role: 0 for role in ROLES}
+        users_by_role.update({row["_id"]: row["count"] for row in role_rows if row["_id"]})
+
+        order_rows = await self.db.orders.aggregate([
+            {"$facet": {
+                "total": [{"$count": "n"}],
+                "pending": [{"$match": {"status": "pending"}}, {"$count": "n"}],
+                "paid": [{"$match": {"payment_status": "success"}}, {"$count": "n"}],
+            }}
+        ]).to_list(1)
+        facets = order_rows[0] if order_rows else {}
+
+        def facet_count(name: str) -> int:
+            rows = facets.get(name) or []
+            return rows[0]["n"] if rows else 0
+
+        now = datetime.now(timezone.utc).isoformat()
+        counters = {
+            "total_users": sum(row["count"] for row in role_rows),
+            "total_orders": facet_count("total"),
+            "total_parts": await self.db.spare_parts.estimated_document_count(),
+            "pending_orders": facet_count("pending"),
+            "paid_orders": facet_count("paid"),
+            "users_by_role": users_by_role,
+            "updated_at": now,
+            "reconciled_at": now,
+        }
+        await self.db.counters.update_one({"_id": STATS_ID}, {"$set": counters}, upsert=True)
+        return counters
+
+    async def read(self) -> dict:
+        counters = await self.db.counters.find_one({"_id": STATS_ID}, {"_id": 0})
+        if counters is None or "reconciled_at" not in counters:
+            counters = await self.recompute()
+        return counters
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.recompute()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Stats reconciliation failed: {e}")
+            await asyncio.sleep(self.reconcile_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,329 @@
+"""In-memory stand-ins for Motor collections.
+
+FakeDB / FakeCollection implement only the query, update and aggregation
+operators the backend issues, with MongoDB's matching rules for dotted
+paths into arrays. They exist so the Mongo-facing logic can be tested
+without a server; anything they do not recognise raises NotImplementedError
+rather than silently matching.
+"""
+import copy
+from types import SimpleNamespace
+
+from pymongo import ReturnDocument
+
+_MISSING = object()
+
+
+def _resolve(doc, path):
+    """Every value `path` reaches in `doc`, descending through arrays."""
+    head, _, rest = path.partition(".")
+    if not isinstance(doc, dict):
+        return []
+    value = doc.get(head, _MISSING)
+    if not rest:
+        return [value]
+    items = value if isinstance(value, list) else [value]
+    return [v for item in items for v in _resolve(item, rest)]
+
+
+def _candidates(value):
+    # A query on an array field also matches its elements
+    return [value] + (value if isinstance(value, list) else [])
+
+
+def _compare(value, op, operand):
+    if value is _MISSING or value is None:
+        return False
+    try:
+        return {"$gt": value > operand, "$gte": value >= operand,
+                "$lt": value < operand, "$lte": value <= operand}[op]
+    except TypeError:
+        return False
+
+
+def _matches_operators(value, condition):
+    for op, operand in condition.items():
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            if not any(_compare(v, op, operand) for v in _candidates(value)):
+                return False
+        elif op == "$in":
+            if not any(_equals(value, item) for item in operand):
+                return False
+        elif op == "$nin":
+            if any(_equals(value, item) for item in operand):
+                return False
+        elif op == "$ne":
+            if _equals(value, operand):
+                return False
+        elif op == "$exists":
+            if (value is not _MISSING) != bool(operand):
+                return False
+        elif op == "$all":
+            if not isinstance(value, list) or not all(item in value for item in operand):
+                return False
+        elif op == "$elemMatch":
+            if not isinstance(value, list) or not any(
+                matches(item, operand) if isinstance(item, dict) else _matches_operators(item, operand)
+                for item in value
+            ):
+                return False
+        elif op == "$not":
+            if _matches_operators(value, operand):
+                return False
+        else:
+            raise NotImplementedError(op)
+    return True
+
+
+def _equals(value, expected):
+    if expected is None:
+        return value is _MISSING or value is None or (isinstance(value, list) and None in value)
+    return any(candidate == expected for candidate in _candidates(value) if candidate is not _MISSING)
+
+
+def _matches_path(doc, path, condition):
+    values = _resolve(doc, path)
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        negated = {"$ne", "$nin", "$not"}
+        if set(condition) <= negated:
+            # Negations hold only if no reachable value violates them
+            return all(_matches_operators(value, condition) for value in values)
+        return any(_matches_operators(value, condition) for value in values)
+    return any(_equals(value, condition) for value in values)
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, part) for part in condition):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(key)
+        elif not _matches_path(doc, key, condition):
+            return False
+    return True
+
+
+def _project(doc, projection):
+    doc = copy.deepcopy(doc)
+    if projection and projection.get("_id") == 0 or projection is None:
+        doc.pop("_id", None)
+    if projection:
+        included = [key for key, flag in projection.items() if flag and key != "_id"]
+        if included:
+            doc = {key: doc[key] for key in included if key in doc}
+        for key, flag in projection.items():
+            if not flag:
+                doc.pop(key, None)
+    return doc
+
+
+def _sort_key(fields):
+    def key(doc):
+        return tuple(_Ordered(doc.get(field), direction) for field, direction in fields)
+    return key
+
+
+class _Ordered:
+    def __init__(self, value, direction):
+        self.value, self.direction = value, direction
+
+    def __lt__(self, other):
+        if self.value == other.value:
+            return False
+        if self.value is None or other.value is None:
+            less = self.value is None
+        else:
+            less = self.value < other.value
+        return less if self.direction > 0 else not less
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _apply_update(doc, update):
+    for op, fields in update.items():
+        for field, value in fields.items():
+            if op == "$set":
+                doc[field] = copy.deepcopy(value)
+            elif op == "$unset":
+                doc.pop(field, None)
+            elif op == "$inc":
+                doc[field] = doc.get(field, 0) + value
+            elif op == "$push":
+                doc.setdefault(field, []).append(copy.deepcopy(value))
+            elif op == "$addToSet":
+                items = doc.setdefault(field, [])
+                if value not in items:
+                    items.append(copy.deepcopy(value))
+            elif op == "$pull":
+                doc[field] = [
+                    item for item in doc.get(field, [])
+                    if not (matches(item, value) if isinstance(value, dict) else item == value)
+                ]
+            else:
+                raise NotImplementedError(op)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, fields, direction=None):
+        if isinstance(fields, str):
+            fields = [(fields, direction or 1)]
+        self.docs = sorted(self.docs, key=_sort_key(fields))
+        return self
+
+    def limit(self, count):
+        if count:
+            self.docs = self.docs[:count]
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length):
+        return self.docs if length is None else self.docs[:length]
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = []
+        for doc in docs:
+            self._insert(doc)
+
+    def _insert(self, doc):
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", len(self.docs) + 1)
+        self.docs.append(doc)
+
+    def _matching(self, query, sort=None):
+        found = [doc for doc in self.docs if matches(doc, query)]
+        return sorted(found, key=_sort_key(sort)) if sort else found
+
+    def get(self, doc_id):
+        return _project(next(doc for doc in self.docs if doc.get("id") == doc_id), None)
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([_project(doc, projection) for doc in self._matching(query or {})])
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        found = self._matching(query or {}, sort)
+        return _project(found[0], projection) if found else None
+
+    async def count_documents(self, query):
+        return len(self._matching(query))
+
+    async def estimated_document_count(self):
+        return len(self.docs)
+
+    async def insert_one(self, doc):
+        self._insert(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            self._insert(doc)
+
+    async def _update(self, query, update, many, upsert=False):
+        found = self._matching(query)
+        for doc in found if many else found[:1]:
+            _apply_update(doc, update)
+        if not found and upsert:
+            doc = {key: value for key, value in query.items() if not key.startswith("$")}
+            _apply_update(doc, update)
+            self._insert(doc)
+        return SimpleNamespace(matched_count=len(found), modified_count=len(found) if many else min(len(found), 1))
+
+    async def update_one(self, query, update, upsert=False):
+        return await self._update(query, update, many=False, upsert=upsert)
+
+    async def update_many(self, query, update):
+        return await self._update(query, update, many=True)
+
+    async def find_one_and_update(self, query, update, projection=None, sort=None,
+                                  return_document=ReturnDocument.BEFORE, upsert=False):
+        found = self._matching(query, sort)
+        if not found:
+            return None
+        doc = found[0]
+        before = _project(doc, projection)
+        _apply_update(doc, update)
+        return _project(doc, projection) if return_document == ReturnDocument.AFTER else before
+
+    async def delete_many(self, query):
+        found = self._matching(query)
+        self.docs = [doc for doc in self.docs if doc not in found]
+        return SimpleNamespace(deleted_count=len(found))
+
+    async def bulk_write(self, ops, ordered=True):
+        modified = 0
+        for op in ops:
+            result = await self._update(op._filter, op._doc, many=False, upsert=op._upsert)
+            modified += result.modified_count
+        return SimpleNamespace(modified_count=modified)
+
+    def aggregate(self, pipeline):
+        docs = [copy.deepcopy(doc) for doc in self.docs]
+        for stage in pipeline:
+            docs = self._stage(docs, stage)
+        return FakeCursor(docs)
+
+    def _stage(self, docs, stage):
+        (op, spec), = stage.items()
+        if op == "$match":
+            return [doc for doc in docs if matches(doc, spec)]
+        if op == "$count":
+            return [{spec: len(docs)}] if docs else []
+        if op == "$facet":
+            return [{name: self._run(docs, stages) for name, stages in spec.items()}]
+        if op == "$group":
+            key = spec["_id"]
+            groups = {}
+            for doc in docs:
+                group = doc.get(key[1:]) if isinstance(key, str) else key
+                groups.setdefault(group, []).append(doc)
+            rows = []
+            for group, members in groups.items():
+                row = {"_id": group}
+                for field, accumulator in spec.items():
+                    if field != "_id":
+                        (acc, operand), = accumulator.items()
+                        if acc != "$sum" or operand != 1:
+                            raise NotImplementedError(accumulator)
+                        row[field] = len(members)
+                rows.append(row)
+            return rows
+        raise NotImplementedError(op)
+
+    def _run(self, docs, stages):
+        for stage in stages:
+            docs = self._stage(docs, stage)
+        return docs
+
+
+class FakeDB:
+    """Collections are created on first access, like Motor's."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        collection = FakeCollection()
+        setattr(self, name, collection)
+        return collection
+
+    def __getitem__(self, name):
+        return getattr(self, name)
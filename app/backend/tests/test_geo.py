@@ -0,0 +1,81 @@
+"""SpatialGrid.nearest against a brute-force search."""
+import random
+import time
+
+import pytest
+
+from geo import SpatialGrid, haversine_km
+
+
+def brute_force(points, latitude, longitude, k, radius_km):
+    found = [
+        (key, haversine_km(latitude, longitude, lat, lng)) for key, (lat, lng) in points.items()
+    ]
+    found = sorted((item for item in found if item[1] <= radius_km), key=lambda item: item[1])
+    return found[:k]
+
+
+def scatter(rng, count, latitude, longitude, spread):
+    points = {}
+    for i in range(count):
+        lat = min(90.0, max(-90.0, latitude + rng.uniform(-spread, spread)))
+        lng = (longitude + rng.uniform(-spread * 4, spread * 4) + 180) % 360 - 180
+        points[f"p{i}"] = (lat, lng)
+    return points
+
+
+def build(points):
+    grid = SpatialGrid()
+    for key, (lat, lng) in points.items():
+        grid.upsert(key, lat, lng)
+    return grid
+
+
+@pytest.mark.parametrize("latitude, longitude", [
+    (6.5, 3.4), (-33.9, 18.4), (60.0, 10.0), (85.0, 0.0), (88.0, 45.0), (90.0, 0.0), (-89.5, -120.0),
+    (1.0, 179.99), (-5.0, -179.995),
+])
+@pytest.mark.parametrize("radius_km", [0.5, 5.0, 100.0])
+def test_nearest_matches_brute_force(latitude, longitude, radius_km):
+    rng = random.Random(f"{latitude},{longitude},{radius_km}")
+    points = scatter(rng, 400, latitude, longitude, spread=max(radius_km / 111.0, 0.02) * 2)
+    grid = build(points)
+
+    for k in (1, 5, 1000):
+        expected = brute_force(points, latitude, longitude, k, radius_km)
+        actual = grid.nearest(latitude, longitude, k, radius_km)
+        assert [key for key, _ in actual] == [key for key, _ in expected]
+
+
+def test_sparse_grid_queries_stay_fast_near_the_poles():
+    rng = random.Random(7)
+    points = scatter(rng, 2000, 6.5, 3.4, spread=0.5)
+    points.update({f"north{i}": (88.0 + rng.uniform(-0.5, 0.5), rng.uniform(-180, 180)) for i in range(200)})
+    grid = build(points)
+
+    start = time.perf_counter()
+    for latitude in (6.5, 85.0, 88.0, 89.99, 90.0):
+        grid.nearest(latitude, 3.4, 10, 100.0)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_radius_boundary_is_inclusive():
+    grid = SpatialGrid()
+    grid.upsert("origin", 10.0, 20.0)
+    grid.upsert("edge", 10.05, 20.0)
+    edge = haversine_km(10.0, 20.0, 10.05, 20.0)
+
+    assert [key for key, _ in grid.nearest(10.0, 20.0, 5, edge)] == ["origin", "edge"]
+    assert [key for key, _ in grid.nearest(10.0, 20.0, 5, edge * 0.999)] == ["origin"]
+
+
+def test_accept_filters_candidates_and_updates_move_points():
+    grid = SpatialGrid()
+    grid.upsert("a", 0.0, 0.0)
+    grid.upsert("b", 0.0, 0.001)
+    grid.upsert("a", 0.5, 0.5)
+
+    assert [key for key, _ in grid.nearest(0.0, 0.0, 5, 1.0)] == ["b"]
+    assert grid.nearest(0.0, 0.0, 5, 1.0, accept=lambda key: key != "b") == []
+    grid.remove("b")
+    assert len(grid) == 1
@@ -0,0 +1,73 @@
+"""ensure_indexes log-and-skip, and index builds not blocking startup."""
+import asyncio
+
+from pymongo.errors import OperationFailure
+
+import server
+from indexes import INDEX_REGISTRY, QUERY_SHAPES, ensure_indexes
+
+
+class IndexCollection:
+    def __init__(self, fail=(), delay=0.0):
+        self.fail = fail
+        self.delay = delay
+        self.created = []
+
+    async def create_indexes(self, models):
+        await asyncio.sleep(self.delay)
+        name = models[0].document["name"]
+        if name in self.fail:
+            raise OperationFailure(f"Index with name: {name} already exists with different options")
+        self.created.append(name)
+        return [name]
+
+
+class IndexDB:
+    def __init__(self, **collections):
+        self.collections = collections
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, IndexCollection())
+
+
+def test_failed_indexes_are_skipped():
+    db = IndexDB(spare_parts=IndexCollection(fail={"vendor_sku"}))
+
+    created = asyncio.run(ensure_indexes(db))
+
+    expected = [model.document["name"] for model in INDEX_REGISTRY["spare_parts"]]
+    assert created["spare_parts"] == [name for name in expected if name != "vendor_sku"]
+    assert set(created) == set(INDEX_REGISTRY)
+    for collection, models in INDEX_REGISTRY.items():
+        if collection != "spare_parts":
+            assert created[collection] == [model.document["name"] for model in models]
+
+
+def test_index_names_are_unique_per_collection():
+    for collection, models in INDEX_REGISTRY.items():
+        names = [model.document["name"] for model in models]
+        assert len(names) == len(set(names)), collection
+
+
+def test_query_shapes_name_registered_collections():
+    assert {shape["collection"] for shape in QUERY_SHAPES.values()} <= set(INDEX_REGISTRY)
+
+
+def test_startup_does_not_wait_for_index_builds(monkeypatch):
+    slow = IndexDB(**{name: IndexCollection(delay=10) for name in INDEX_REGISTRY})
+    monkeypatch.setattr(server, "db", slow)
+
+    async def scenario():
+        build = server.start_index_build()
+        await asyncio.sleep(0.01)
+        assert not build.done()
+        build.cancel()
+        await asyncio.gather(build, return_exceptions=True)
+        assert build.cancelled()
+
+    asyncio.run(scenario())
+
+
+def test_index_build_can_be_left_to_the_release_tool(monkeypatch):
+    monkeypatch.setattr(server, "ENSURE_INDEXES", "off")
+    assert server.start_index_build() is None
@@ -0,0 +1,67 @@
+"""Stock reservation rollback and the stale hold sweeper."""
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from fakes import FakeDB, FakeCollection
+from inventory import InsufficientStock, StockHoldSweeper, clear_holds, reserve_stock
+
+
+def make_db(parts, orders=()):
+    db = FakeDB()
+    db.spare_parts, db.orders = FakeCollection(parts), FakeCollection(orders)
+    return db
+
+
+def test_reserve_stock_rolls_back_when_one_line_is_short():
+    db = make_db([
+        {"id": "a", "quantity": 5},
+        {"id": "b", "quantity": 1},
+        {"id": "c", "quantity": 3},
+    ])
+
+    with pytest.raises(InsufficientStock) as excinfo:
+        asyncio.run(reserve_stock(db, "order-1", {"a": 2, "b": 2, "c": 3}))
+
+    assert excinfo.value.part_ids == ["b"]
+    assert [db.spare_parts.get(p)["quantity"] for p in "abc"] == [5, 1, 3]
+    assert not any(doc.get("stock_holds") for doc in db.spare_parts.docs)
+
+
+def test_reserve_stock_tags_parts_until_cleared():
+    db = make_db([{"id": "a", "quantity": 5}, {"id": "b", "quantity": 2}])
+
+    asyncio.run(reserve_stock(db, "order-1", {"a": 2, "b": 2}))
+    assert [db.spare_parts.get(p)["quantity"] for p in "ab"] == [3, 0]
+    assert db.spare_parts.get("a")["stock_holds"][0]["quantity"] == 2
+
+    asyncio.run(clear_holds(db, "order-1"))
+    assert not any(doc.get("stock_holds") for doc in db.spare_parts.docs)
+
+
+def test_sweeper_restores_stale_holds_without_an_order():
+    stale = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+    fresh = datetime.now(timezone.utc).isoformat()
+    db = make_db(
+        [
+            {"id": "a", "quantity": 3, "stock_holds": [
+                {"order_id": "lost", "quantity": 2, "held_at": stale},
+                {"order_id": "placed", "quantity": 1, "held_at": stale},
+            ]},
+            {"id": "b", "quantity": 0, "stock_holds": [
+                {"order_id": "in-flight", "quantity": 4, "held_at": fresh},
+            ]},
+        ],
+        orders=[{"id": "placed"}],
+    )
+    sweeper = StockHoldSweeper(db, max_age_minutes=15)
+
+    asyncio.run(sweeper.run_once())
+
+    part_a = db.spare_parts.get("a")
+    assert part_a["quantity"] == 5
+    assert part_a["stock_holds"] == []
+    assert db.spare_parts.get("b")["quantity"] == 0
+    assert [hold["order_id"] for hold in db.spare_parts.get("b")["stock_holds"]] == ["in-flight"]
+    assert sweeper.stats() == {"restored": 1}
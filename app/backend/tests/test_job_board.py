@@ -0,0 +1,92 @@
+"""Job board claims, lease expiry and release."""
+import asyncio
+import math
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from fakes import FakeDB
+from job_board import MAX_LEASE_SECONDS, JobBoard, lease_deadline
+
+DISPATCHER_1 = {"id": "d1", "full_name": "First"}
+DISPATCHER_2 = {"id": "d2", "full_name": "Second"}
+
+
+def make_db(*orders):
+    db = FakeDB()
+    for order_id, created_at, status in orders:
+        asyncio.run(db.orders.insert_one({
+            "id": order_id, "status": status, "dispatcher_id": None, "created_at": created_at,
+        }))
+    return db
+
+
+def test_claims_take_the_oldest_job_once():
+    db = make_db(("new", "2026-01-02", "paid"), ("old", "2026-01-01", "paid"), ("open", "2026-01-01", "pending"))
+    board = JobBoard(db)
+
+    before, after = asyncio.run(board.claim_next(DISPATCHER_1))
+    assert before["id"] == "old" and before["status"] == "paid"
+    assert after["dispatcher_id"] == "d1" and after["status"] == "assigned"
+
+    second = asyncio.run(board.claim_next(DISPATCHER_2))
+    assert second[0]["id"] == "new"
+    assert asyncio.run(board.claim_next(DISPATCHER_1)) is None
+    assert board.stats()["claimed"] == 2
+
+
+def test_expired_leases_go_back_on_the_board():
+    db = make_db(("o1", "2026-01-01", "paid"), ("o2", "2026-01-02", "paid"))
+    released = []
+
+    async def on_release(order):
+        released.append(order["id"])
+
+    board = JobBoard(db, lease_seconds=600, on_release=on_release)
+    asyncio.run(board.claim_next(DISPATCHER_1))
+    asyncio.run(board.claim_next(DISPATCHER_2))
+    expired = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+    asyncio.run(db.orders.update_one({"id": "o1"}, {"$set": {"lease_expires_at": expired}}))
+
+    assert asyncio.run(board.release_expired()) == 1
+    assert released == ["o1"]
+    order = db.orders.get("o1")
+    assert (order["status"], order["dispatcher_id"]) == ("paid", None)
+    assert "lease_expires_at" not in order
+    assert db.orders.get("o2")["dispatcher_id"] == "d2"
+
+    claim = asyncio.run(board.claim_next(DISPATCHER_2))
+    assert claim[0]["id"] == "o1"
+
+
+def test_waiting_dispatcher_is_woken_by_notify():
+    db = make_db()
+    board = JobBoard(db)
+
+    async def scenario():
+        waiter = asyncio.create_task(board.wait_for_job(DISPATCHER_1, timeout=5))
+        await asyncio.sleep(0.01)
+        assert board.waiting == 1
+        await db.orders.insert_one({"id": "o1", "status": "paid", "dispatcher_id": None, "created_at": "2026-01-01"})
+        board.notify()
+        return await asyncio.wait_for(waiter, 1)
+
+    before, _ = asyncio.run(scenario())
+    assert before["id"] == "o1"
+    assert board.waiting == 0
+
+
+def test_wait_times_out_empty():
+    board = JobBoard(make_db())
+    assert asyncio.run(board.wait_for_job(DISPATCHER_1, timeout=0.01)) is None
+
+
+@pytest.mark.parametrize("lease_seconds", [0, -5, math.nan, None])
+def test_no_lease(lease_seconds):
+    assert lease_deadline(lease_seconds) is None
+
+
+@pytest.mark.parametrize("lease_seconds", [1e12, math.inf, MAX_LEASE_SECONDS * 2])
+def test_lease_is_clamped(lease_seconds):
+    deadline = datetime.fromisoformat(lease_deadline(lease_seconds))
+    assert deadline - datetime.now(timezone.utc) <= timedelta(seconds=MAX_LEASE_SECONDS)
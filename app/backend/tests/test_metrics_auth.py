@@ -0,0 +1,57 @@
+"""/api/metrics is only served to the metrics token or an admin."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from fakes import FakeDB
+from user_cache import UserCache
+
+
+@pytest.fixture
+def users(monkeypatch):
+    db = FakeDB()
+    for user_id, role in (("admin", "admin"), ("client", "client")):
+        asyncio.run(db.users.insert_one({"id": user_id, "role": role, "full_name": user_id}))
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "user_cache", UserCache())
+    monkeypatch.setattr(server, "metrics_components", lambda: {})
+    monkeypatch.setattr(server, "METRICS_TOKEN", "scrape-secret")
+
+
+def scrape(authorization=None):
+    headers = {"authorization": authorization} if authorization else {}
+    return asyncio.run(server.metrics(SimpleNamespace(headers=headers)))
+
+
+def bearer(user_id):
+    return f"Bearer {server.create_access_token({'sub': user_id})}"
+
+
+@pytest.mark.parametrize("authorization", ["Bearer scrape-secret", "admin"])
+def test_allowed(users, authorization):
+    if authorization == "admin":
+        authorization = bearer("admin")
+    assert scrape(authorization).status_code == 200
+
+
+@pytest.mark.parametrize("authorization, status", [
+    (None, 401), ("Bearer wrong", 401), ("client", 403),
+])
+def test_refused(users, authorization, status):
+    if authorization == "client":
+        authorization = bearer("client")
+    with pytest.raises(HTTPException) as excinfo:
+        scrape(authorization)
+    assert excinfo.value.status_code == status
+
+
+def test_without_a_token_only_admins(users, monkeypatch):
+    monkeypatch.setattr(server, "METRICS_TOKEN", "")
+    with pytest.raises(HTTPException):
+        scrape()
+    with pytest.raises(HTTPException):
+        scrape("Bearer ")
+    assert scrape(bearer("admin")).status_code == 200
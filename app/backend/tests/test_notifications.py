@@ -0,0 +1,82 @@
+"""Notification publishing order and stream authentication."""
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from fakes import FakeDB
+from notifications import NotificationDispatcher, build_notification, unread_count
+from user_cache import UserCache
+
+
+def test_notifications_are_published_after_they_are_stored():
+    db = FakeDB()
+    stored_when_published = []
+
+    def on_written(docs):
+        stored_when_published.extend(
+            any(row["id"] == doc["id"] for row in db.notifications.docs) for doc in docs
+        )
+
+    async def scenario():
+        dispatcher = NotificationDispatcher(db, on_written=on_written)
+        dispatcher.start()
+        await dispatcher.submit([build_notification("u1", "Hi", "one"), build_notification("u1", "Hi", "two")])
+        assert stored_when_published == []
+        await dispatcher.stop()
+        assert await unread_count(db, "u1") == 2
+
+    asyncio.run(scenario())
+    assert stored_when_published == [True, True]
+
+
+@pytest.fixture
+def user(monkeypatch):
+    db = FakeDB()
+    asyncio.run(db.users.insert_one({"id": "u1", "role": "client", "full_name": "User"}))
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "user_cache", UserCache())
+    return "u1"
+
+
+def request_with(headers=None):
+    return SimpleNamespace(headers=headers or {})
+
+
+def stream_token(user_id):
+    return server.create_access_token(
+        {"sub": user_id, "scope": server.STREAM_SCOPE}, expires_delta=timedelta(seconds=60)
+    )
+
+
+def test_streams_take_stream_tokens_in_the_query(user):
+    found = asyncio.run(server.get_stream_user(request_with(), stream_token(user)))
+    assert found["id"] == user
+
+
+def test_access_tokens_are_refused_in_the_query(user):
+    access = server.create_access_token({"sub": user})
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.get_stream_user(request_with(), access))
+    assert excinfo.value.status_code == 401
+
+    # The Authorization header still takes the access token
+    found = asyncio.run(server.get_stream_user(request_with({"authorization": f"Bearer {access}"}), None))
+    assert found["id"] == user
+
+
+def test_stream_tokens_are_refused_everywhere_else(user):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.get_user_from_token(stream_token(user)))
+    assert excinfo.value.status_code == 401
+
+
+def test_expired_stream_tokens_are_refused(user):
+    expired = server.create_access_token(
+        {"sub": user, "scope": server.STREAM_SCOPE}, expires_delta=timedelta(seconds=-1)
+    )
+    with pytest.raises(HTTPException):
+        asyncio.run(server.get_stream_user(request_with(), expired))
@@ -0,0 +1,166 @@
+"""Order state machine: role transitions, multi-vendor confirmation and assignment."""
+import asyncio
+
+import pytest
+
+from fakes import FakeDB
+from order_states import (
+    ORDER_STATUSES, OrderNotFound, TransitionConflict, TransitionForbidden, apply_transition,
+)
+from vendor_orders import build_vendor_orders, vendor_view
+
+CLIENT = {"id": "c1", "role": "client", "full_name": "Client"}
+ADMIN = {"id": "a1", "role": "admin", "full_name": "Admin"}
+VENDOR_A = {"id": "v1", "role": "vendor", "full_name": "Vendor A"}
+VENDOR_B = {"id": "v2", "role": "vendor", "full_name": "Vendor B"}
+DISPATCHER = {"id": "d1", "role": "dispatcher", "full_name": "Dispatcher"}
+
+
+def line(vendor_id, price=10.0):
+    return {"part_id": f"part-{vendor_id}", "vendor_id": vendor_id, "vendor_name": vendor_id,
+            "quantity": 1, "unit_price": price, "total_price": price}
+
+
+def make_order(db, order_id="o1", status="pending", vendors=("v1",), **fields):
+    items = [line(vendor_id) for vendor_id in vendors]
+    order = {"id": order_id, "client_id": "c1", "client_name": "Client", "items": items,
+             "total_amount": sum(item["total_price"] for item in items), "status": status,
+             "dispatcher_id": None, "created_at": "2026-01-01T00:00:00+00:00", **fields}
+    asyncio.run(db.orders.insert_one(order))
+    return order
+
+
+def transition(db, order_id, new_status, user, **kwargs):
+    return asyncio.run(apply_transition(db, order_id, new_status, user, **kwargs))
+
+
+def test_allowed_transition_returns_before_and_after():
+    db = FakeDB()
+    make_order(db)
+
+    before, after = transition(db, "o1", "confirmed", ADMIN)
+
+    assert before["status"] == "pending"
+    assert after["status"] == "confirmed"
+    assert db.orders.get("o1")["status"] == "confirmed"
+
+
+@pytest.mark.parametrize("user, status, error", [
+    (CLIENT, "delivered", TransitionForbidden),
+    (DISPATCHER, "confirmed", TransitionForbidden),
+    ({"id": "c2", "role": "client"}, "cancelled", TransitionForbidden),
+    (ADMIN, "delivered", TransitionConflict),
+])
+def test_refusals(user, status, error):
+    db = FakeDB()
+    make_order(db)
+
+    with pytest.raises(error):
+        transition(db, "o1", status, user)
+    assert db.orders.get("o1")["status"] == "pending"
+
+
+def test_unknown_order():
+    with pytest.raises(OrderNotFound):
+        transition(FakeDB(), "missing", "cancelled", ADMIN)
+
+
+def test_single_vendor_confirmation_moves_the_order():
+    db = FakeDB()
+    make_order(db)
+
+    before, after = transition(db, "o1", "confirmed", VENDOR_A)
+
+    assert (before["status"], after["status"]) == ("pending", "confirmed")
+
+
+def test_multi_vendor_order_waits_for_every_vendor():
+    db = FakeDB()
+    make_order(db, vendors=("v1", "v2"))
+
+    before, after = transition(db, "o1", "confirmed", VENDOR_A)
+    assert before["status"] == after["status"] == "pending"
+    assert db.orders.get("o1")["confirmed_vendor_ids"] == ["v1"]
+
+    # Confirming twice changes nothing
+    transition(db, "o1", "confirmed", VENDOR_A)
+    assert db.orders.get("o1")["status"] == "pending"
+
+    before, after = transition(db, "o1", "confirmed", VENDOR_B)
+    assert (before["status"], after["status"]) == ("pending", "confirmed")
+
+
+def test_confirmation_that_loses_the_race_is_still_a_success():
+    db = FakeDB()
+    # v1's confirmation is recorded, but v2's call moved the order in between
+    make_order(db, vendors=("v1", "v2"), status="pending", confirmed_vendor_ids=["v2"])
+    original = db.orders.find_one_and_update
+
+    async def racing(query, update, **kwargs):
+        if "$set" in update and update["$set"].get("status") == "confirmed":
+            await original({"id": "o1"}, {"$set": {"status": "confirmed"}})
+        return await original(query, update, **kwargs)
+
+    db.orders.find_one_and_update = racing
+
+    before, after = transition(db, "o1", "confirmed", VENDOR_A)
+
+    assert before["status"] == after["status"] == "confirmed"
+
+
+def test_vendor_cannot_confirm_someone_elses_order():
+    db = FakeDB()
+    make_order(db, vendors=("v2",))
+
+    with pytest.raises(TransitionForbidden):
+        transition(db, "o1", "confirmed", VENDOR_A)
+    assert "confirmed_vendor_ids" not in db.orders.get("o1")
+
+
+def test_vendor_cancels_only_orders_made_of_their_own_lines():
+    db = FakeDB()
+    make_order(db, "own", vendors=("v1", "v1"))
+    make_order(db, "shared", vendors=("v1", "v2"))
+
+    transition(db, "own", "cancelled", VENDOR_A)
+    assert db.orders.get("own")["status"] == "cancelled"
+
+    with pytest.raises(TransitionForbidden, match="client or an admin"):
+        transition(db, "shared", "cancelled", VENDOR_A)
+    transition(db, "shared", "cancelled", CLIENT)
+    assert db.orders.get("shared")["status"] == "cancelled"
+
+
+def test_assigned_needs_a_dispatcher():
+    db = FakeDB()
+    make_order(db, status="paid")
+
+    assert "assigned" in ORDER_STATUSES
+    with pytest.raises(TransitionForbidden):
+        transition(db, "o1", "assigned", ADMIN)
+
+    changes = {"dispatcher_id": "d1", "dispatcher_name": "Dispatcher"}
+    transition(db, "o1", "assigned", DISPATCHER, changes=changes, owner={}, precondition={"dispatcher_id": None})
+    assert db.orders.get("o1")["dispatcher_id"] == "d1"
+
+    # A second dispatcher loses the claim
+    with pytest.raises(TransitionConflict):
+        transition(db, "o1", "assigned", {**DISPATCHER, "id": "d2"}, changes={**changes, "dispatcher_id": "d2"},
+                   owner={}, precondition={"dispatcher_id": None})
+
+    # The assigned dispatcher moves it on; admins may reassign
+    transition(db, "o1", "picked_up", DISPATCHER)
+    with pytest.raises(TransitionConflict):
+        transition(db, "o1", "assigned", ADMIN, changes=changes, owner={})
+
+
+def test_vendor_view_holds_only_that_vendors_lines():
+    order = {"id": "o1", "client_id": "c1", "status": "confirmed",
+             "items": [line("v1", 10.0), line("v2", 25.0)], "total_amount": 35.0}
+
+    view = vendor_view(order, "v1")
+
+    assert [item["vendor_id"] for item in view["items"]] == ["v1"]
+    assert view["total_amount"] == 10.0
+    assert view["status"] == "confirmed"
+    assert len(build_vendor_orders(order)) == 2
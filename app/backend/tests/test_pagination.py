@@ -0,0 +1,80 @@
+"""Keyset cursor round-trips over fetch_page."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Response
+
+from fakes import FakeCollection
+from pagination import NEXT_CURSOR_HEADER, apply_cursor, decode_cursor, encode_cursor, fetch_page
+
+
+def make_collection(count=25):
+    # Several documents share each timestamp, so the id tie-break matters
+    return FakeCollection(
+        {"id": f"doc-{i:02d}", "created_at": f"2026-01-01T00:00:{i // 3:02d}+00:00", "owner": "u1" if i % 2 else "u2"}
+        for i in range(count)
+    )
+
+
+def newest_first(collection, query=None):
+    docs = [doc for doc in collection.docs if not query or all(doc.get(k) == v for k, v in query.items())]
+    return [doc["id"] for doc in sorted(docs, key=lambda d: (d["created_at"], d["id"]), reverse=True)]
+
+
+def walk(collection, query, limit):
+    pages, cursor = [], None
+    while True:
+        response = Response()
+        docs = asyncio.run(fetch_page(collection, query, {"_id": 0}, limit, cursor, response))
+        pages.append([doc["id"] for doc in docs])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [1, 4, 7, 25, 50])
+def test_pages_cover_every_document_once_in_order(limit):
+    collection = make_collection()
+
+    pages = walk(collection, {}, limit)
+
+    assert [doc_id for page in pages for doc_id in page] == newest_first(collection)
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_pages_respect_the_base_query():
+    collection = make_collection()
+
+    pages = walk(collection, {"owner": "u1"}, 3)
+
+    assert [doc_id for page in pages for doc_id in page] == newest_first(collection, {"owner": "u1"})
+
+
+def test_last_full_page_has_no_cursor():
+    response = Response()
+    asyncio.run(fetch_page(make_collection(6), {}, {"_id": 0}, 6, None, response))
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_cursor_round_trip():
+    doc = {"created_at": "2026-01-01T00:00:00+00:00", "id": "a/b+c="}
+    cursor = encode_cursor(doc)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (doc["created_at"], doc["id"])
+
+
+def test_newer_returns_only_documents_after_the_cursor():
+    collection = make_collection()
+    ordered = newest_first(collection)
+    pivot = next(doc for doc in collection.docs if doc["id"] == ordered[10])
+
+    newer = asyncio.run(collection.find(apply_cursor({}, encode_cursor(pivot), newer=True)).to_list(None))
+
+    assert sorted(doc["id"] for doc in newer) == sorted(ordered[:10])
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm90IGpzb24", encode_cursor({"created_at": "x", "id": "y"})[:-3]])
+def test_invalid_cursors_are_a_400(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,106 @@
+"""PaystackGateway retries and circuit breaker, against an httpx mock transport."""
+import asyncio
+
+import httpx
+import pytest
+
+from payments import CircuitBreaker, PaymentGatewayError, PaymentGatewayUnavailable, PaystackGateway
+
+
+def make_gateway(handler, breaker=None, max_retries=2):
+    gateway = PaystackGateway("sk_test", max_retries=max_retries, backoff_base=0, breaker=breaker)
+    gateway._client = httpx.AsyncClient(base_url="https://paystack.test", transport=httpx.MockTransport(handler))
+    return gateway
+
+
+def open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    return breaker
+
+
+def test_idempotent_calls_retry_and_count_one_failure():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(503)
+
+    breaker = CircuitBreaker(failure_threshold=5)
+    gateway = make_gateway(handler, breaker)
+
+    with pytest.raises(PaymentGatewayError):
+        asyncio.run(gateway.verify("ref"))
+    assert len(calls) == 3
+    assert breaker.failures == 1
+
+    with pytest.raises(PaymentGatewayError):
+        asyncio.run(gateway.initialize("a@example.com", 100, "ref", {}))
+    assert len(calls) == 4
+
+
+def test_half_open_lets_one_trial_through():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def handler(request):
+            await gate.wait()
+            return httpx.Response(200, json={"status": True})
+
+        breaker = open_breaker()
+        gateway = make_gateway(handler, breaker)
+        trial = asyncio.create_task(gateway.verify("ref"))
+        await asyncio.sleep(0)
+        with pytest.raises(PaymentGatewayUnavailable):
+            await gateway.verify("other")
+        gate.set()
+        assert await trial == {"status": True}
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_call_without_the_trial_does_not_release_it():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def handler(request):
+            await gate.wait()
+            return httpx.Response(200, json={"status": True})
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        gateway = make_gateway(handler, breaker)
+        # Started while closed, still running when the circuit opens and a trial begins
+        straggler = asyncio.create_task(gateway.verify("old"))
+        await asyncio.sleep(0)
+        breaker.record_failure()
+        assert breaker.before_call() is True
+
+        straggler.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await straggler
+        with pytest.raises(PaymentGatewayUnavailable):
+            await gateway.verify("second")
+
+        breaker.release()
+        gate.set()
+        assert await gateway.verify("third") == {"status": True}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_trial_frees_the_slot():
+    async def scenario():
+        async def handler(request):
+            await asyncio.sleep(10)
+
+        breaker = open_breaker()
+        gateway = make_gateway(handler, breaker)
+        trial = asyncio.create_task(gateway.verify("ref"))
+        await asyncio.sleep(0)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert breaker.before_call() is True
+
+    asyncio.run(scenario())
@@ -0,0 +1,65 @@
+"""mark_order_paid keeps the live stats counters equal to a recompute."""
+import asyncio
+
+import pytest
+
+import server
+from fakes import FakeDB
+from job_board import JobBoard
+from stats import STATS_ID, StatsCounters
+
+COUNTED = ("total_orders", "pending_orders", "paid_orders")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "stats_counters", StatsCounters(db))
+    monkeypatch.setattr(server, "job_board", JobBoard(db))
+
+    async def no_notification(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(server, "create_notification_internal", no_notification)
+    return db
+
+
+def place(db, order_id, status, reference):
+    asyncio.run(db.orders.insert_one({
+        "id": order_id, "client_id": "c1", "status": status, "items": [],
+        "payment_reference": reference, "payment_status": "pending",
+    }))
+
+
+def live_and_recomputed(db):
+    live = asyncio.run(db.counters.find_one({"_id": STATS_ID}))
+    recomputed = asyncio.run(server.stats_counters.recompute())
+    return {k: live[k] for k in COUNTED}, {k: recomputed[k] for k in COUNTED}
+
+
+@pytest.mark.parametrize("status", ["cancelled", "in_transit"])
+def test_late_payment_keeps_counters_in_step(db, status):
+    place(db, "o1", status, "ref-1")
+    place(db, "o2", "pending", "ref-2")
+    asyncio.run(server.stats_counters.recompute())
+
+    assert asyncio.run(server.mark_order_paid("ref-1")) is None
+    order = db.orders.get("o1")
+    assert (order["status"], order["payment_status"]) == (status, "success")
+
+    live, recomputed = live_and_recomputed(db)
+    assert live == recomputed
+    assert live["paid_orders"] == 1
+
+
+def test_payment_is_counted_once(db):
+    place(db, "o1", "pending", "ref-1")
+    asyncio.run(server.stats_counters.recompute())
+
+    assert asyncio.run(server.mark_order_paid("ref-1"))["status"] == "pending"
+    assert asyncio.run(server.mark_order_paid("ref-1")) is None
+    assert db.orders.get("o1")["status"] == "paid"
+
+    live, recomputed = live_and_recomputed(db)
+    assert live == recomputed == {"total_orders": 1, "pending_orders": 0, "paid_orders": 1}
@@ -0,0 +1,107 @@
+"""UserCache coalescing, cancellation and invalidation during a load."""
+import asyncio
+
+import pytest
+
+from user_cache import UserCache
+
+
+class Loader:
+    """Returns {"id", "version"}, pausing each call until released."""
+
+    def __init__(self):
+        self.calls = 0
+        self.version = 1
+        self.gates = []
+
+    async def __call__(self, user_id):
+        self.calls += 1
+        gate = asyncio.Event()
+        self.gates.append(gate)
+        version = self.version
+        await gate.wait()
+        return {"id": user_id, "version": version}
+
+    def release(self):
+        for gate in self.gates:
+            gate.set()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_misses_share_one_load():
+    async def scenario():
+        cache, loader = UserCache(), Loader()
+        tasks = [asyncio.create_task(cache.get("u1", loader)) for _ in range(5)]
+        await settle()
+        loader.release()
+        users = await asyncio.gather(*tasks)
+        assert loader.calls == 1
+        assert all(user == {"id": "u1", "version": 1} for user in users)
+        assert await cache.get("u1", loader) == {"id": "u1", "version": 1}
+        assert cache.stats()["hits"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_loader_does_not_cancel_waiters():
+    async def scenario():
+        cache, loader = UserCache(), Loader()
+        leader = asyncio.create_task(cache.get("u1", loader))
+        await settle()
+        waiter = asyncio.create_task(cache.get("u1", loader))
+        await settle()
+
+        leader.cancel()
+        await settle()
+        loader.release()
+        await settle()
+        loader.release()
+
+        assert await waiter == {"id": "u1", "version": 1}
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert loader.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_during_load_is_not_served_to_waiters():
+    async def scenario():
+        cache, loader = UserCache(), Loader()
+        leader = asyncio.create_task(cache.get("u1", loader))
+        await settle()
+        waiter = asyncio.create_task(cache.get("u1", loader))
+        await settle()
+
+        # The user changes while the first load is in flight
+        loader.version = 2
+        cache.invalidate("u1")
+        loader.release()
+        await settle()
+        loader.release()
+        await settle()
+        loader.release()
+
+        assert await waiter == {"id": "u1", "version": 2}
+        assert await leader == {"id": "u1", "version": 2}
+        assert (await cache.get("u1", loader))["version"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_loader_errors_reach_waiters():
+    async def failing(user_id):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("down")
+
+    async def scenario():
+        cache = UserCache()
+        results = await asyncio.gather(cache.get("u1", failing), cache.get("u1", failing), return_exceptions=True)
+        assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+        assert cache.stats()["size"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+"""Build the vendor_orders projection from existing orders.
+
+Creates the indexes, then writes one document per (order, vendor) for every
+order. Documents are replaced by (id, vendor_id), so the tool is safe to
+rerun, e.g. after a failed projection sync, and it repairs documents
+written before payment_reference and lease_expires_at were synced.
+
+Usage:
+    MONGO_URL=mongodb://... python tools/backfill_vendor_orders.py --db spareparts_hub
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from indexes import ensure_indexes  # noqa: E402
+from vendor_orders import backfill_vendor_orders  # noqa: E402
+
+
+async def main(args) -> None:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[args.db]
+    await ensure_indexes(db)
+    start = time.perf_counter()
+    written = await backfill_vendor_orders(db, batch_size=args.batch_size)
+    print(f"Wrote {written} vendor order documents in {time.perf_counter() - start:.1f}s")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=os.environ.get("DB_NAME", "spareparts_hub"))
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
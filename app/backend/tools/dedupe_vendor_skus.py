@@ -0,0 +1,43 @@
+"""Remove duplicate (vendor_id, sku) parts and make the vendor_sku index unique.
+
+Catalog imports upsert on (vendor_id, sku). Older releases backed that with
+a non-unique index, so concurrent imports could insert the same SKU twice.
+This keeps the oldest part of every duplicate group, deletes the others,
+replaces a non-unique vendor_sku index and then ensures all indexes. Safe
+to rerun.
+
+Usage:
+    MONGO_URL=mongodb://... python tools/dedupe_vendor_skus.py --db spareparts_hub
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from catalog_import import dedupe_vendor_skus  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+
+async def main(args) -> None:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[args.db]
+    deleted = await dedupe_vendor_skus(db)
+    print(f"Deleted {deleted} duplicate parts")
+    existing = (await db.spare_parts.index_information()).get("vendor_sku")
+    if existing is not None and not existing.get("unique"):
+        await db.spare_parts.drop_index("vendor_sku")
+        print("Dropped non-unique vendor_sku index")
+    created = await ensure_indexes(db)
+    print(f"Indexes ensured: {created['spare_parts']}")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=os.environ.get("DB_NAME", "spareparts_hub"))
+    asyncio.run(main(parser.parse_args()))
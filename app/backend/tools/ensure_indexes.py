@@ -0,0 +1,41 @@
+"""Create every index in the registry, as a one-off release step.
+
+The API builds missing indexes in the background after it starts (see
+ENSURE_INDEXES in server.py). Deployments that set ENSURE_INDEXES=off run
+this once per release instead, before or alongside the rollout. Existing
+indexes are left alone, and an index that cannot be created is logged and
+skipped, so the tool is safe to rerun.
+
+Usage:
+    MONGO_URL=mongodb://... python tools/ensure_indexes.py --db spareparts_hub
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from indexes import ensure_indexes  # noqa: E402
+
+
+async def main(args) -> None:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    start = time.perf_counter()
+    created = await ensure_indexes(client[args.db])
+    for collection, names in created.items():
+        print(f"{collection}: {', '.join(names) or '-'}")
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+    client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=os.environ.get("DB_NAME", "spareparts_hub"))
+    asyncio.run(main(parser.parse_args()))
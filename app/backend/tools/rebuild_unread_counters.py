@@ -0,0 +1,38 @@
+"""Recount every user's unread notifications into notification_counters.
+
+Run once after upgrading to populate the counters, or later to repair a
+counter that drifted after a failed update. Counts are set, not added, so
+the tool is safe to rerun.
+
+Usage:
+    MONGO_URL=mongodb://... python tools/rebuild_unread_counters.py --db spareparts_hub
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from indexes import ensure_indexes  # noqa: E402
+from notifications import rebuild_unread_counters  # noqa: E402
+
+
+async def main(args) -> None:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[args.db]
+    await ensure_indexes(db)
+    start = time.perf_counter()
+    written = await rebuild_unread_counters(db)
+    print(f"Rebuilt unread counters for {written} users in {time.perf_counter() - start:.1f}s")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=os.environ.get("DB_NAME", "spareparts_hub"))
+    asyncio.run(main(parser.parse_args()))
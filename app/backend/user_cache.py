@@ -0,0 +1,159 @@
+"""In-process LRU/TTL cache of user documents for request authentication.
+
+get_current_user runs on nearly every request, so the user lookup is served
+from here. Entries expire after `ttl` seconds and the least recently used
+entry is evicted once `maxsize` is reached. Concurrent misses for the same
+user share a single database query. A waiter never inherits the loader's
+cancellation, nor a document loaded before an invalidate(); it reloads.
+
+The cache is per process: writes to a user must call invalidate() so the
+change is visible immediately in this worker. Other workers only see it
+once their entry expires (up to `ttl` seconds, e.g. a deactivated user
+keeps access that long) unless a UserCacheInvalidator is running. It tails
+updates to the users collection with a change stream and evicts the
+changed user in every worker (requires a replica set).
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Result handed to coalesced waiters whose load was cancelled or invalidated
+_RETRY = object()
+MAX_LOAD_ATTEMPTS = 3
+
+
+class UserCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get(self, user_id: str, loader: Callable[[str], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        """Return the cached user, calling `loader` once on a miss."""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry[1])
+
+        for attempt in range(MAX_LOAD_ATTEMPTS):
+            pending = self._inflight.get(user_id)
+            if pending is not None:
+                self.coalesced += 1
+                user = await asyncio.shield(pending)
+                if user is _RETRY:
+                    continue
+                return dict(user) if user is not None else None
+            self.misses += 1
+            user, current = await self._load(user_id, loader)
+            if current or attempt == MAX_LOAD_ATTEMPTS - 1:
+                return dict(user) if user is not None else None
+        # Every load joined was invalidated or cancelled; read without coalescing
+        user = await loader(user_id)
+        return dict(user) if user is not None else None
+
+    async def _load(self, user_id: str, loader) -> Tuple[Optional[dict], bool]:
+        """Run `loader` as the shared load for `user_id`.
+
+        Returns (user, current). The in-flight future doubles as the load's
+        version: invalidate() removes it, so a load it no longer matches
+        started before the invalidation. Its result is neither cached nor
+        handed to waiters, who reload instead.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            user = await loader(user_id)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not logged
+            future.exception()
+            raise
+        except BaseException:
+            # This caller was cancelled; the requests waiting on it were not
+            future.set_result(_RETRY)
+            raise
+        else:
+            current = self._inflight.get(user_id) is future
+            if not current:
+                future.set_result(_RETRY)
+            else:
+                future.set_result(user)
+                if user is not None:
+                    self._store(user_id, user)
+            return user, current
+        finally:
+            if self._inflight.get(user_id) is future:
+                del self._inflight[user_id]
+
+    def _store(self, user_id: str, user: dict) -> None:
+        self._entries[user_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+        self._inflight.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+class UserCacheInvalidator:
+    """Evicts users from `cache` whenever their document changes on any worker."""
+
+    def __init__(self, db, cache: UserCache):
+        self.db = db
+        self.cache = cache
+        self._task: Optional[asyncio.Task] = None
+
+    async def _watch(self) -> None:
+        pipeline = [
+            {"$match": {"operationType": {"$in": ["update", "replace"]}}},
+            {"$project": {"fullDocument.id": 1}},
+        ]
+        while True:
+            try:
+                async with self.db.users.watch(pipeline, full_document="updateLookup") as stream:
+                    async for change in stream:
+                        user_id = (change.get("fullDocument") or {}).get("id")
+                        if user_id:
+                            self.cache.invalidate(user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"User change stream failed, retrying: {e}")
+                # Entries may have missed evictions while the stream was down
+                self.cache.clear()
+                await asyncio.sleep(5)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
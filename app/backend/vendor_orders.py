@@ -0,0 +1,85 @@
+"""Per-vendor projection of orders.
+
+Each order is also stored in `vendor_orders` as one document per vendor,
+with that vendor's lines only and their subtotal in `total_amount`. The
+documents have the same shape as orders, so vendor listings can use the
+same response model. Vendors then page through a narrow collection indexed
+on vendor_id instead of scanning the multikey items.vendor_id index of
+full orders, and they never see other vendors' lines.
+
+The fields that change after placement (status, dispatcher and job board
+lease, payment reference and status) are copied over by sync_vendor_orders()
+whenever the order changes.
+backfill_vendor_orders() rebuilds the projection from existing orders and
+is safe to rerun.
+"""
+import logging
+from typing import Dict, List
+
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+# Order fields that can change after placement and are mirrored to the projection
+SYNCED_FIELDS = (
+    "status", "dispatcher_id", "dispatcher_name", "lease_expires_at",
+    "payment_reference", "payment_status", "updated_at",
+)
+
+SHARED_FIELDS = (
+    "id", "client_id", "client_name", "delivery_address", "delivery_phone", "notes", "created_at",
+) + SYNCED_FIELDS
+
+
+def build_vendor_orders(order: dict) -> List[dict]:
+    """Split an order into one projection document per vendor."""
+    lines: Dict[str, List[dict]] = {}
+    for item in order["items"]:
+        lines.setdefault(item["vendor_id"], []).append(item)
+    return [
+        {
+            **{field: order.get(field) for field in SHARED_FIELDS},
+            "vendor_id": vendor_id,
+            "vendor_name": items[0].get("vendor_name"),
+            "items": items,
+            "total_amount": sum(item["total_price"] for item in items),
+            "order_total": order["total_amount"],
+        }
+        for vendor_id, items in lines.items()
+    ]
+
+
+def vendor_view(order: dict, vendor_id: str) -> dict:
+    """The projection document `vendor_id` sees for `order`, built without a read."""
+    return next(doc for doc in build_vendor_orders(order) if doc["vendor_id"] == vendor_id)
+
+
+async def sync_vendor_orders(db, order_id: str, changes: dict) -> None:
+    """Copy changed order fields onto the order's vendor documents."""
+    fields = {k: v for k, v in changes.items() if k in SYNCED_FIELDS}
+    if not fields:
+        return
+    try:
+        await db.vendor_orders.update_many({"id": order_id}, {"$set": fields})
+    except Exception as e:
+        # The order itself is already updated; a backfill repairs the projection
+        logger.error(f"Failed to sync vendor orders for {order_id}: {e}")
+
+
+async def backfill_vendor_orders(db, batch_size: int = 500) -> int:
+    """Rebuild vendor_orders from orders; returns the number of documents written."""
+    written = 0
+    ops = []
+    async for order in db.orders.find({}, {"_id": 0}).batch_size(batch_size):
+        ops.extend(
+            ReplaceOne({"id": doc["id"], "vendor_id": doc["vendor_id"]}, doc, upsert=True)
+            for doc in build_vendor_orders(order)
+        )
+        if len(ops) >= batch_size:
+            await db.vendor_orders.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+    if ops:
+        await db.vendor_orders.bulk_write(ops, ordered=False)
+        written += len(ops)
+    return written
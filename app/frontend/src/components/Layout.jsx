@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Link, useLocation, useNavigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
 import { useCart } from '../context/CartContext';
@@ -31,6 +31,9 @@ import {
   Settings,
 } from 'lucide-react';
 
+// Wait before reopening a notification stream the browser gave up on
+const STREAM_RETRY_MS = 3000;
+
 const roleNavItems = {
   client: [
     { to: '/dashboard', label: 'Dashboard', icon: LayoutDashboard },
@@ -64,25 +67,78 @@ export default function Layout({ children }) {
   const [notifications, setNotifications] = useState([]);
   const [unreadCount, setUnreadCount] = useState(0);
   const [mobileOpen, setMobileOpen] = useState(false);
+  // Ids already counted, so events replayed after a reconnect do not bump the badge again
+  const seenIds = useRef(new Set());
 
   useEffect(() => {
     if (user) {
+      seenIds.current = new Set();
       fetchNotifications();
-      const interval = setInterval(fetchNotifications, 30000);
-      return () => clearInterval(interval);
+      let source = null;
+      let retry = null;
+      let stopped = false;
+      let lastEventId = null;
+
+      // New notifications are pushed by the server. EventSource reconnects on its own with
+      // the same URL; once the stream token has expired that fails, so fetch a new one
+      const connect = async () => {
+        try {
+          const response = await notificationsAPI.getStreamToken();
+          if (stopped) return;
+          source = new EventSource(notificationsAPI.streamUrl(response.data.token, lastEventId));
+        } catch (error) {
+          console.error('Failed to open notification stream:', error);
+          if (!stopped) retry = setTimeout(connect, STREAM_RETRY_MS);
+          return;
+        }
+        // Fires on every (re)connection: resync the badge with the server's counter
+        source.addEventListener('open', fetchUnreadCount);
+        source.addEventListener('notification', (event) => {
+          lastEventId = event.lastEventId || lastEventId;
+          const notification = JSON.parse(event.data);
+          setNotifications(prev => [notification, ...prev.filter(n => n.id !== notification.id)].slice(0, 50));
+          if (!seenIds.current.has(notification.id)) {
+            seenIds.current.add(notification.id);
+            if (!notification.is_read) {
+              setUnreadCount(prev => prev + 1);
+            }
+          }
+        });
+        source.addEventListener('error', (event) => {
+          if (event.target.readyState === EventSource.CLOSED && !stopped) {
+            retry = setTimeout(connect, STREAM_RETRY_MS);
+          }
+        });
+      };
+      connect();
+
+      return () => {
+        stopped = true;
+        clearTimeout(retry);
+        if (source) source.close();
+      };
     }
   }, [user]);
 
   const fetchNotifications = async () => {
     try {
       const response = await notificationsAPI.getAll();
+      response.data.forEach(n => seenIds.current.add(n.id));
       setNotifications(response.data);
-      setUnreadCount(response.data.filter(n => !n.is_read).length);
     } catch (error) {
       console.error('Failed to fetch notifications:', error);
     }
   };
 
+  const fetchUnreadCount = async () => {
+    try {
+      const response = await notificationsAPI.getUnreadCount();
+      setUnreadCount(response.data.unread_count);
+    } catch (error) {
+      console.error('Failed to fetch unread count:', error);
+    }
+  };
+
   const handleMarkAllRead = async () => {
     try {
       await notificationsAPI.markAllRead();
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { ordersAPI } from '../lib/api';
+import { ordersAPI, dispatchAPI } from '../lib/api';
 import { useAuth } from '../context/AuthContext';
 import { formatPrice, formatDate, ORDER_STATUS_COLORS } from '../lib/utils';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
@@ -125,6 +125,7 @@ export function VendorOrders() {
 export function Deliveries() {
   const { user } = useAuth();
   const [orders, setOrders] = useState([]);
+  const [availableOrders, setAvailableOrders] = useState([]);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -133,8 +134,9 @@ export function Deliveries() {
 
   const fetchOrders = async () => {
     try {
-      const response = await ordersAPI.getAll();
-      setOrders(response.data);
+      const [ordersResponse, jobsResponse] = await Promise.all([ordersAPI.getAll(), dispatchAPI.getJobs()]);
+      setOrders(ordersResponse.data);
+      setAvailableOrders(jobsResponse.data);
     } catch (error) {
       console.error('Failed to fetch orders:', error);
     } finally {
@@ -163,7 +165,6 @@ export function Deliveries() {
   };
 
   const myDeliveries = orders.filter((o) => o.dispatcher_id === user?.id);
-  const availableOrders = orders.filter((o) => o.status === 'paid' && !o.dispatcher_id);
 
   return (
     <div className= "container mx-auto px-4 py-8 ">
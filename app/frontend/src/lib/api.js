@@ -57,6 +57,12 @@ export const ordersAPI = {
   assignDispatcher: (id) => api.put(`/orders/${id}/assign`),
 };
 
+// Dispatch job board APIs
+export const dispatchAPI = {
+  getJobs: (params) => api.get('/dispatch/jobs', { params }),
+  claimNext: (wait = 0) => api.post('/dispatch/jobs/claim', null, { params: { wait } }),
+};
+
 // Location APIs
 export const locationAPI = {
   update: (data) => api.put('/location', data),
@@ -69,6 +75,10 @@ export const notificationsAPI = {
   getAll: () => api.get('/notifications'),
   markRead: (id) => api.put(`/notifications/${id}/read`),
   markAllRead: () => api.put('/notifications/read-all'),
+  getUnreadCount: () => api.get('/notifications/unread-count'),
+  // EventSource cannot send headers, so a short-lived stream token goes in the query string
+  getStreamToken: () => api.post('/auth/stream-token'),
+  streamUrl: (token, since) => `${API_URL}/notifications/stream?token=${encodeURIComponent(token)}${since ? `&since=${encodeURIComponent(since)}` : ''}`,
 };
 
 // Payment APIs
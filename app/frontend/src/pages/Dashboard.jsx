@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
-import { ordersAPI, partsAPI, adminAPI, locationAPI } from '../lib/api';
+import { ordersAPI, partsAPI, adminAPI, locationAPI, dispatchAPI } from '../lib/api';
 import { formatPrice, formatDate, ORDER_STATUS_COLORS } from '../lib/utils';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Button } from '../components/ui/button';
@@ -290,6 +290,7 @@ function VendorDashboard() {
 
 function DispatcherDashboard() {
   const [orders, setOrders] = useState([]);
+  const [availableOrders, setAvailableOrders] = useState([]);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -298,8 +299,9 @@ function DispatcherDashboard() {
 
   const fetchOrders = async () => {
     try {
-      const response = await ordersAPI.getAll();
-      setOrders(response.data);
+      const [ordersResponse, jobsResponse] = await Promise.all([ordersAPI.getAll(), dispatchAPI.getJobs()]);
+      setOrders(ordersResponse.data);
+      setAvailableOrders(jobsResponse.data);
     } catch (error) {
       console.error('Failed to fetch orders:', error);
     } finally {
@@ -308,7 +310,6 @@ function DispatcherDashboard() {
   };
 
   const myDeliveries = orders.filter(o => o.dispatcher_id);
-  const availableOrders = orders.filter(o => o.status === 'paid' && !o.dispatcher_id);
 
   return (
     <div className= "space-y-6 " data-testid= "dispatcher-dashboard ">